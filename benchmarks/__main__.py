@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+
+from subprocess import check_output
+
+from benchmarks.generate import RepoShape, generate
+from benchmarks.workloads import WORKLOADS, run
+
+ALL_WORKLOADS = ['mount'] + sorted(WORKLOADS)
+
+
+def _options(args):
+    return dict(hash_trees=args.hash_trees, no_ref_symlinks=args.no_ref_symlinks,
+                no_cache=args.no_cache)
+
+
+def _version():
+    try:
+        from importlib.metadata import version
+        return version('repofs')
+    except Exception:
+        return 'unknown'
+
+
+def _generate(args):
+    shape = RepoShape(**dict((k, getattr(args, k)) for k in RepoShape().as_dict()))
+    refs = generate(args.path, shape)
+    sys.stderr.write("Created %s with %d commits and %d refs\n" % (
+        args.path, shape.commits, refs))
+
+
+def _run(args):
+    repo = os.path.abspath(args.repo)
+    results = []
+    for workload in args.workload or ALL_WORKLOADS:
+        # Each workload runs in a process of its own: the first pass is
+        # then truly cold and the peak RSS is the workload's own
+        command = [sys.executable, '-m', 'benchmarks', 'workload', repo, workload]
+        command += [o for o in ('--hash-trees', '--no-ref-symlinks', '--no-cache')
+                    if getattr(args, o[2:].replace('-', '_'))]
+        results.append(json.loads(check_output(command).decode('utf-8')))
+        sys.stderr.write("%s done\n" % workload)
+
+    report = dict(
+        repofs_version=_version(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        date=datetime.datetime.utcnow().isoformat(),
+        repo=repo,
+        options=_options(args),
+        workloads=results,
+    )
+    text = json.dumps(report, indent=1, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+def _workload(args):
+    result = run(args.repo, args.workload, _options(args))
+    sys.stdout.write(json.dumps(result) + "\n")
+
+
+def _add_mount_options(parser):
+    parser.add_argument("--hash-trees", action="store_true", default=False)
+    parser.add_argument("--no-ref-symlinks", action="store_true", default=False)
+    parser.add_argument("--no-cache", action="store_true", default=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RepoFS benchmarks")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    gen = commands.add_parser('generate', help="Create a synthetic repository.")
+    gen.add_argument("path", help="Directory to create.")
+    defaults = RepoShape()
+    for name, value in sorted(defaults.as_dict().items()):
+        gen.add_argument("--" + name.replace('_', '-'), type=int, default=value,
+                         help="(default %d)" % value)
+    gen.set_defaults(func=_generate)
+
+    bench = commands.add_parser('run', help="Run workloads, printing JSON.")
+    bench.add_argument("repo", help="Git repository to run the workloads on.")
+    bench.add_argument("--workload", action="append", choices=ALL_WORKLOADS,
+                       help="Workload to run; may be repeated (default: all).")
+    bench.add_argument("--output", help="File to write the results to.")
+    _add_mount_options(bench)
+    bench.set_defaults(func=_run)
+
+    one = commands.add_parser('workload', help="Run one workload in this process.")
+    one.add_argument("repo")
+    one.add_argument("workload", choices=ALL_WORKLOADS)
+    _add_mount_options(one)
+    one.set_defaults(func=_workload)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import math
+import os
+import random
+
+from subprocess import Popen, PIPE, check_call
+
+# The latest commit date, 2020-01-01 00:00:00 UTC
+END_TIME = 1577836800
+YEAR = 365 * 24 * 3600
+
+
+class RepoShape(object):
+    """ The parameters of a synthetic repository. """
+
+    def __init__(self, commits=1000, branches=4, depth=3, width=4, files=8,
+                 changes=4, min_blob=16, max_blob=64 * 1024, large_files=2,
+                 large_size=8 * 1024 * 1024, years=5, refs=100, seed=0):
+        self.commits = commits
+        # Branches commits are spread over; all but master fork from master
+        self.branches = branches
+        # Levels of directories below the root, and directories per level
+        self.depth = depth
+        self.width = width
+        # Files in every directory
+        self.files = files
+        # Files changed by every commit after the first
+        self.changes = changes
+        # Blob sizes are distributed log-uniformly in [min_blob, max_blob]
+        self.min_blob = min_blob
+        self.max_blob = max_blob
+        # Files of large_size bytes at the root of the tree
+        self.large_files = large_files
+        self.large_size = large_size
+        # Years the commit dates span
+        self.years = years
+        # Additional branches, under refs/heads/bench/
+        self.refs = refs
+        self.seed = seed
+
+    def paths(self):
+        """ Return the paths of the regular files of the tree. """
+        dirs = [""]
+        level = [""]
+        for _ in range(self.depth):
+            level = [os.path.join(d, "d%d" % i) for d in level for i in range(self.width)]
+            dirs.extend(level)
+        return [os.path.join(d, "f%d" % i) for d in dirs for i in range(self.files)]
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def _blob(rng, size):
+    return rng.getrandbits(8 * size).to_bytes(size, 'little') if size else b""
+
+
+def _data(out, data):
+    out.write(b"data %d\n" % len(data))
+    out.write(data)
+    out.write(b"\n")
+
+
+def generate(path, shape):
+    """ Create a repository of the specified shape at path, which must
+    not exist.  The history is written through git fast-import, so that
+    repositories with many thousands of commits and refs take seconds.
+    Returns the number of refs created. """
+    rng = random.Random(shape.seed)
+    os.makedirs(path)
+    check_call(['git', 'init', '-q', path])
+    check_call(['git', '-C', path, 'symbolic-ref', 'HEAD', 'refs/heads/master'])
+    proc = Popen(['git', '--git-dir', os.path.join(path, '.git'), 'fast-import',
+                  '--quiet'], stdin=PIPE)
+    out = proc.stdin
+
+    paths = shape.paths()
+    start = END_TIME - shape.years * YEAR
+    step = float(shape.years * YEAR) / max(shape.commits, 1)
+    # The mark of the latest commit of each branch
+    tips = {}
+    marks = []
+    for i in range(shape.commits):
+        mark = i + 1
+        branch = 0 if i == 0 else rng.randrange(shape.branches)
+        timestamp = int(start + i * step)
+        ident = b"repofs <repofs@repofs.com> %d +0000\n" % timestamp
+
+        out.write(b"commit refs/heads/%s\n" % (b"master" if branch == 0 else
+                                               b"branch%d" % branch))
+        out.write(b"mark :%d\n" % mark)
+        out.write(b"author " + ident)
+        out.write(b"committer " + ident)
+        _data(out, b"Commit %d" % i)
+        if branch in tips:
+            out.write(b"from :%d\n" % tips[branch])
+        elif i:
+            out.write(b"from :%d\n" % rng.choice(marks))
+
+        if i == 0:
+            changed = paths
+            for n in range(shape.large_files):
+                out.write(b"M 100644 inline large%d.bin\n" % n)
+                _data(out, _blob(rng, shape.large_size))
+        else:
+            changed = rng.sample(paths, min(shape.changes, len(paths)))
+        for p in changed:
+            size = int(math.exp(rng.uniform(math.log(shape.min_blob),
+                                            math.log(shape.max_blob))))
+            out.write(b"M 100644 inline %s\n" % p.encode('utf-8'))
+            _data(out, _blob(rng, size))
+        out.write(b"\n")
+        tips[branch] = mark
+        marks.append(mark)
+
+    for n in range(shape.refs):
+        out.write(b"reset refs/heads/bench/b%05d\n" % n)
+        out.write(b"from :%d\n\n" % rng.choice(marks))
+
+    out.close()
+    if proc.wait():
+        raise Exception("git fast-import failed")
+    check_call(['git', '-C', path, 'pack-refs', '--all'])
+    return len(tips) + shape.refs
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import datetime
+import gc
+import hashlib
+import json
+import re
+import sys
+import tracemalloc
+
+from time import perf_counter
+
+from pygit2 import GIT_FILEMODE_TREE, GIT_FILEMODE_BLOB, GIT_FILEMODE_LINK
+
+from repofs import utils
+from repofs.ref_index import RefIndex
+from repofs.handlers.commit_date import CommitDateHandler
+from repofs.handlers.commit_hash import CommitHashHandler
+from repofs.handlers.ref import RefHandler, BRANCH_REFS, TAG_REFS
+from repofs.handlers.root import RootHandler
+
+# Seconds each case is timed for
+MIN_TIME = 0.2
+
+# The tree of every commit: path -> (mode, contents)
+TREE = {
+    'd0': (GIT_FILEMODE_TREE, None),
+    'd0/f0': (GIT_FILEMODE_BLOB, b'x' * 100),
+    'f0': (GIT_FILEMODE_BLOB, b'y' * 1000),
+    'link': (GIT_FILEMODE_LINK, b'f0'),
+}
+
+
+class FakeGitOperations(object):
+    """
+    An in-memory stand-in for GitOperations with the specified numbers
+    of branches and commits, each commit having the same small tree.
+    It answers the queries the handlers make without running git, so
+    that only the cost of the handlers themselves is measured.
+    """
+
+    def __init__(self, nrefs=100, ncommits=100):
+        self.commits = [hashlib.sha1(b"%d" % i).hexdigest() for i in range(ncommits)]
+        self._numbers = dict((c, i) for i, c in enumerate(self.commits))
+        start = datetime.date(2015, 1, 1)
+        self.dates = {}
+        for i, commit in enumerate(self.commits):
+            date = start + datetime.timedelta(days=i * 5 * 365 // max(ncommits, 1))
+            self.dates.setdefault((date.year, date.month, date.day), []).append(commit)
+        self.years = sorted(set(y for y, m, d in self.dates))
+        self._refs = ["%s refs/heads/bench/b%05d" % (self.commits[i % ncommits], i)
+                      for i in range(nrefs)]
+        self._refs += ["%s refs/heads/master" % self.commits[-1],
+                       "%s refs/tags/v1.0" % self.commits[0]]
+        self._ref_commits = dict((r.split(" ")[1][5:], r.split(" ")[0])
+                                 for r in self._refs)
+        self._matching = {}
+        self._indexes = {}
+        self.cache = True
+
+    def refs(self, patterns):
+        key = tuple(patterns)
+        if key not in self._matching:
+            self._matching[key] = [r for r in self._refs
+                                   if any(r.split(" ")[1].startswith(p) for p in patterns)]
+        return self._matching[key]
+
+    def ref_index(self, patterns):
+        key = tuple(patterns)
+        if key not in self._indexes:
+            self._indexes[key] = RefIndex(self.refs(patterns))
+        return self._indexes[key]
+
+    def commit_of_ref(self, ref):
+        return self._ref_commits.get(ref, "")
+
+    def all_commits(self, prefix=""):
+        if not prefix:
+            return iter(self.commits)
+        return iter([c for c in self.commits if c.startswith(prefix)])
+
+    def is_commit(self, commit):
+        return commit in self._numbers
+
+    def commits_by_date(self, y, m, d):
+        return iter(self.dates.get((y, m, d), []))
+
+    def commit_parents(self, commit):
+        i = self._numbers[commit]
+        return self.commits[i - 1:i] if i else []
+
+    def commit_descendants(self, commit):
+        i = self._numbers[commit]
+        return self.commits[i + 1:i + 2]
+
+    def commit_names(self, commit):
+        return [r.split(" ")[1][5:].replace("/", "_") for r in self._refs
+                if r.startswith(commit)]
+
+    def author(self, commit):
+        return "repofs"
+
+    def author_email(self, commit):
+        return "repofs@repofs.com"
+
+    def get_commit_time(self, commit):
+        return 0
+
+    def get_author_time(self, commit):
+        return 0
+
+    def commit_times(self, commits):
+        return dict((c, (0, 0)) for c in commits)
+
+    def _children(self, path):
+        prefix = path + "/" if path else ""
+        return [p[len(prefix):] for p in sorted(TREE)
+                if p.startswith(prefix) and "/" not in p[len(prefix):]]
+
+    def is_dir(self, commit, path):
+        return not path or TREE.get(path, (None,))[0] == GIT_FILEMODE_TREE
+
+    def is_symlink(self, commit, path):
+        return TREE.get(path, (None,))[0] == GIT_FILEMODE_LINK
+
+    def file_contents(self, commit, path):
+        return TREE[path][1]
+
+    def file_size(self, commit, path):
+        return len(TREE[path][1])
+
+    def directory_contents(self, commit, path):
+        return self._children(path)
+
+    def directory_entries(self, commit, path):
+        prefix = path + "/" if path else ""
+        return [(name, TREE[prefix + name][0], len(TREE[prefix + name][1] or b""))
+                for name in self._children(path)]
+
+
+def cases(oper):
+    """ Return (name, function) pairs, each running one handler method
+    or path routing function on an existing entry. """
+    commit = oper.commits[len(oper.commits) // 2]
+    y, m, d = [k for k, v in oper.dates.items() if commit in v][0]
+    date = "%d/%02d/%02d" % (y, m, d)
+    branch = "heads/bench/b%05d" % (len(oper._refs) // 2)
+    refs = oper.refs(BRANCH_REFS)
+
+    def ref(path):
+        return RefHandler(path, oper, BRANCH_REFS, False)
+    def ref_tree(path):
+        return RefHandler(path, oper, BRANCH_REFS, True)
+    def by_hash(path):
+        return CommitHashHandler(path, oper, False)
+    def by_date(path):
+        return CommitDateHandler(path, oper)
+
+    return [
+        ('utils.get_full_ref', lambda: utils.get_full_ref(branch + "/d0/f0", refs)),
+        ('utils.demux_ref_path', lambda: utils.demux_ref_path(branch + "/d0/f0", refs)),
+        ('utils.demux_ref_path/index',
+         lambda: utils.demux_ref_path(branch + "/d0/f0", oper.ref_index(BRANCH_REFS))),
+        ('utils.demux_commits_by_hash_path',
+         lambda: utils.demux_commits_by_hash_path(commit + "/d0/f0", False)),
+        ('utils.demux_commits_by_date_path',
+         lambda: utils.demux_commits_by_date_path(date + "/" + commit + "/d0/f0")),
+        ('RootHandler()', RootHandler),
+        ('RefHandler()', lambda: ref(branch)),
+        ('RefHandler()/tags', lambda: RefHandler("tags/v1.0", oper, TAG_REFS, False)),
+        ('RefHandler._get_refs', lambda: ref("heads/bench")._get_refs()),
+        ('RefHandler.is_dir', lambda: ref(branch).is_dir()),
+        ('RefHandler.is_symlink', lambda: ref(branch).is_symlink()),
+        ('RefHandler.get_commit', lambda: ref(branch).get_commit()),
+        ('RefHandler.readdir', lambda: ref("heads").readdir()),
+        ('RefHandler.file_size/no-symlinks',
+         lambda: ref_tree(branch + "/d0/f0").file_size()),
+        ('RefHandler.readdir_entries/no-symlinks',
+         lambda: ref_tree(branch).readdir_entries()),
+        ('CommitHashHandler()', lambda: by_hash(commit + "/f0")),
+        ('CommitHashHandler.is_dir', lambda: by_hash(commit + "/d0").is_dir()),
+        ('CommitHashHandler.is_symlink', lambda: by_hash(commit + "/link").is_symlink()),
+        ('CommitHashHandler.file_size', lambda: by_hash(commit + "/f0").file_size()),
+        ('CommitHashHandler.readdir_entries',
+         lambda: by_hash(commit).readdir_entries()),
+        ('CommitHashHandler.readdir/metadata',
+         lambda: by_hash(commit + "/.git-parents").readdir()),
+        ('CommitDateHandler()', lambda: by_date(date + "/" + commit + "/f0")),
+        ('CommitDateHandler._days_per_month', lambda: by_date("")._days_per_month(y)),
+        ('CommitDateHandler.is_dir/day', lambda: by_date(date).is_dir()),
+        ('CommitDateHandler.is_dir', lambda: by_date(date + "/" + commit + "/d0").is_dir()),
+        ('CommitDateHandler.file_size',
+         lambda: by_date(date + "/" + commit + "/f0").file_size()),
+        ('CommitDateHandler.readdir_entries/day',
+         lambda: by_date(date).readdir_entries()),
+        ('CommitDateHandler.readdir_entries',
+         lambda: by_date(date + "/" + commit).readdir_entries()),
+    ]
+
+
+def measure(function, min_time=MIN_TIME):
+    """ Return the mean nanoseconds per call of function, and the bytes
+    and blocks one call allocates, as traced by tracemalloc. """
+    function()
+    n = 1
+    while True:
+        start = perf_counter()
+        for _ in range(n):
+            function()
+        elapsed = perf_counter() - start
+        if elapsed >= min_time:
+            break
+        n *= 2 if elapsed < min_time / 10 else 1 + int(min_time / elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, 'filename')
+                 if s.count_diff > 0)
+    return dict(ns_per_op=elapsed * 1e9 / n, bytes_per_op=peak, blocks_per_op=blocks)
+
+
+def run(sizes, pattern=None, min_time=MIN_TIME):
+    """ Measure every case for each size, the number of refs and of
+    commits alike.  Returns {case: {size: measurement}}. """
+    results = {}
+    for size in sizes:
+        for name, function in cases(FakeGitOperations(size, size)):
+            if pattern and not re.search(pattern, name):
+                continue
+            results.setdefault(name, {})[size] = measure(function, min_time)
+    return results
+
+
+def format_results(results, sizes):
+    """ Return the ns/op of each case at each size; with two or more
+    sizes the growth between the first and the last is also shown, which
+    is near 1 for work independent of the number of refs and commits. """
+    header = "%-42s" % "case"
+    header += "".join(" %12s" % ("ns/op@%d" % s) for s in sizes)
+    header += " %10s %8s" % ("bytes/op", "growth")
+    lines = [header]
+    for name in sorted(results):
+        row = results[name]
+        line = "%-42s" % name
+        line += "".join(" %12.0f" % row[s]['ns_per_op'] for s in sizes)
+        line += " %10d" % row[sizes[-1]]['bytes_per_op']
+        growth = row[sizes[-1]]['ns_per_op'] / row[sizes[0]]['ns_per_op']
+        line += " %8.1f" % growth if len(sizes) > 1 else " %8s" % "-"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the handlers against an in-memory repository.")
+    parser.add_argument("--sizes", default="100,10000",
+                        help="Comma-separated numbers of refs and commits to run "
+                             "with (default 100,10000).")
+    parser.add_argument("--filter", help="Run only the cases matching this regex.")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME,
+                        help="Seconds each case is timed for (default %.1f)." % MIN_TIME)
+    parser.add_argument("--json", action="store_true", default=False,
+                        help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = run(sizes, args.filter, args.min_time)
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=1, sort_keys=True) + "\n")
+    else:
+        sys.stdout.write(format_results(results, sizes))
+
+if __name__ == '__main__':
+    main()
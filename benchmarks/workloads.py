@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import resource
+import sys
+
+from stat import S_ISDIR
+from subprocess import check_output
+from time import perf_counter
+
+from repofs.repofs import RepoFS
+
+# Bytes requested by each read, as the kernel does with large reads
+READ_SIZE = 128 * 1024
+
+
+class _FileInfo(object):
+    keep_cache = 0
+    direct_io = 0
+
+
+class Session(object):
+    """ A RepoFS instance driven directly, as a mount would drive it,
+    counting the operations issued. """
+
+    def __init__(self, repo, options):
+        self.repo = repo
+        start = perf_counter()
+        self.fs = RepoFS(repo, '/mnt', options.get('hash_trees', False),
+                         options.get('no_ref_symlinks', False),
+                         options.get('no_cache', False))
+        self.fs.preload()
+        self.mount_time = perf_counter() - start
+        self.ops = 0
+        self.bytes = 0
+
+    def call(self, op, path, *args):
+        self.ops += 1
+        return self.fs(op, path, *args)
+
+    def walk(self, path, depth=None):
+        """ List path recursively, getting the attributes of every entry,
+        as ls -lR and find do, descending at most depth levels. """
+        for entry in self.call('readdir', path, None):
+            name = entry[0] if isinstance(entry, tuple) else entry
+            if name in ('.', '..'):
+                continue
+            child = os.path.join(path, name)
+            st = self.call('getattr', child, None)
+            if S_ISDIR(st['st_mode']) and depth != 1:
+                self.walk(child, None if depth is None else depth - 1)
+
+    def cat(self, path):
+        self.call('open', path, _FileInfo())
+        offset = 0
+        while True:
+            data = self.call('read', path, READ_SIZE, offset, None)
+            if not data:
+                break
+            offset += len(data)
+        self.bytes += offset
+
+    def close(self):
+        self.fs.destroy('/')
+
+
+def _tip(repo):
+    return check_output(['git', '-C', repo, 'rev-parse', 'master']).decode().strip()
+
+
+def ls_by_date(session):
+    """ ls -lR commits-by-date, down to the commit directories """
+    session.walk('/commits-by-date', 4)
+
+def find_commit(session):
+    """ find over the tree of the master tip """
+    session.walk('/commits-by-hash/' + _tip(session.repo))
+
+def cat_large(session):
+    """ cat the large files at the root of the master tip """
+    root = '/commits-by-hash/' + _tip(session.repo)
+    for entry in session.call('readdir', root, None):
+        name = entry[0] if isinstance(entry, tuple) else entry
+        if name.startswith('large'):
+            session.cat(os.path.join(root, name))
+
+def list_branches(session):
+    """ ls -l of every branch """
+    session.walk('/branches/heads')
+
+WORKLOADS = {
+    'ls-by-date': ls_by_date,
+    'find-commit': find_commit,
+    'cat-large': cat_large,
+    'branches': list_branches,
+}
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _pass(session, workload):
+    ops, nbytes = session.ops, session.bytes
+    start = perf_counter()
+    WORKLOADS[workload](session)
+    seconds = perf_counter() - start
+    ops, nbytes = session.ops - ops, session.bytes - nbytes
+    return dict(ops=ops, seconds=seconds, bytes=nbytes,
+                ops_per_second=ops / seconds if seconds else 0.0)
+
+
+def run(repo, workload, options):
+    """ Run a workload on a new RepoFS instance, first cold, as just
+    mounted, and then warm, and return its measurements.  The 'mount'
+    workload measures the time to mount, cold and warm.  Meant to run
+    in a process of its own, so that its peak RSS is its own. """
+    result = dict(workload=workload)
+    session = Session(repo, options)
+    try:
+        if workload == 'mount':
+            warm = Session(repo, options)
+            warm.close()
+            result.update(cold=dict(seconds=session.mount_time),
+                          warm=dict(seconds=warm.mount_time))
+        else:
+            result.update(mount_seconds=session.mount_time,
+                          cold=_pass(session, workload),
+                          warm=_pass(session, workload))
+    finally:
+        session.close()
+    result.update(peak_rss_kb=peak_rss_kb(),
+                  git_peak_rss_kb=peak_rss_kb(resource.RUSAGE_CHILDREN))
+    return result
@@ -25,6 +25,14 @@ from fuse import FUSE
 fuse.fuse_python_api = (0, 1)
 
 from repofs.repofs import RepoFS
+from repofs.cache_policy import CACHE_TIMEOUT
+from repofs.trace import TraceRecorder
+from repofs.memory import parse_size, IDLE_TIMEOUT
+from repofs.warm import Warmer, WARM_JOBS
+from repofs.git_settings import GitSettings
+from repofs.diffstat import DIFFSTAT_JOBS
+from repofs.profiler import Profiler, SlowOpLog, PROFILE_MODES, DETERMINISTIC, \
+        PROFILE_WINDOW
 
 def main():
     parser = argparse.ArgumentParser()
@@ -50,6 +58,153 @@ def main():
         action="store_true",
         default=False
     )
+    parser.add_argument(
+        "--no-prefetch",
+        help="Do not read ahead the files of directories read recursively.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--ref-ttl",
+        help="Re-read branches and tags at most every REF_TTL seconds. " \
+            "By default they are read once, when they are first accessed.",
+        type=float,
+        default=None
+    )
+    parser.add_argument(
+        "--cache-timeout",
+        help="Seconds the kernel may cache attributes of immutable " \
+            "content (default %d)." % CACHE_TIMEOUT,
+        type=float,
+        default=CACHE_TIMEOUT
+    )
+    parser.add_argument(
+        "--profile",
+        help="Profile the file system operations from the start. " \
+            "Profiling can also be turned on and off by writing profile on " \
+            "or profile off to .repofs/control under the mount point.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Directory where profiles and the slow operation log are written " \
+            "(default: a new temporary directory).",
+        default=None
+    )
+    parser.add_argument(
+        "--profile-mode",
+        help="Profile every call (deterministic) or sample the stack " \
+            "(sampling) (default %s)." % DETERMINISTIC,
+        choices=PROFILE_MODES,
+        default=DETERMINISTIC
+    )
+    parser.add_argument(
+        "--profile-window",
+        help="Seconds covered by each profile file (default %d)." % PROFILE_WINDOW,
+        type=float,
+        default=PROFILE_WINDOW
+    )
+    parser.add_argument(
+        "--slow-op-ms",
+        help="Log the operations taking longer than SLOW_OP_MS milliseconds " \
+            "together with the calls they made.",
+        type=float,
+        default=None
+    )
+    parser.add_argument(
+        "--trace",
+        help="Record every operation served to TRACE, for replay with " \
+            "repofs-replay.  A name ending in .gz is compressed.",
+        default=None
+    )
+    parser.add_argument(
+        "--memory-limit",
+        help="Evict cached data once the caches take more than MEMORY_LIMIT " \
+            "bytes; a K, M or G suffix may be used.",
+        type=parse_size,
+        default=None
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        help="Empty the caches of repository contents after IDLE_TIMEOUT " \
+            "seconds without file system operations, 0 to never " \
+            "(default %d)." % IDLE_TIMEOUT,
+        type=float,
+        default=IDLE_TIMEOUT
+    )
+    parser.add_argument(
+        "--write-commit-graph",
+        help="Write the repository's commit-graph file, with changed path " \
+            "filters, before mounting, so that parents, commit times and " \
+            "ancestry are read without inflating commits.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--git-cache",
+        help="Bytes of commits and trees libgit2 keeps inflated.  By default " \
+            "a sixteenth of the size of the packs, within the memory available.",
+        type=parse_size,
+        default=None
+    )
+    parser.add_argument(
+        "--mwindow-size",
+        help="Bytes of a pack libgit2 maps at a time (default enough for " \
+             "the largest pack, within the available memory).",
+        type=parse_size,
+        default=None
+    )
+    parser.add_argument(
+        "--mapped-limit",
+        help="Bytes of packs libgit2 maps in total.  By default enough for all " \
+            "packs, within the memory available, and at least 8G.",
+        type=parse_size,
+        default=None
+    )
+    parser.add_argument(
+        "--warm",
+        help="Before mounting, cache the trees of WARM, a ref such as " \
+            "heads/master, a commit or a range such as tags/v1.0..heads/master.  " \
+            "May be given more than once.",
+        action="append",
+        default=[]
+    )
+    parser.add_argument(
+        "--warm-blobs",
+        help="Also cache the contents of the files of the warmed commits, " \
+            "as far as the blob cache holds them.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--warm-jobs",
+        help="Number of threads reading the files of the warmed commits " \
+             "(default %d)." % WARM_JOBS,
+        type=int,
+        default=WARM_JOBS
+    )
+    parser.add_argument(
+        "--file-mtimes",
+        help="Give the files of a commit the time of the last commit that " \
+            "changed them, rather than the commit's time.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Keep the diffstats of commits and the last commits that " \
+            "changed their files in CACHE_DIR, so that they are computed " \
+            "once across mounts.",
+        default=None
+    )
+    parser.add_argument(
+        "--diffstat-jobs",
+        help="Number of git processes computing diffstats ahead of " \
+            "readers (default %d)." % DIFFSTAT_JOBS,
+        type=int,
+        default=DIFFSTAT_JOBS
+    )
     args = parser.parse_args()
 
     if not os.path.exists(os.path.join(args.repo, '.git')):
@@ -59,6 +214,19 @@ def main():
     if sys.argv[0].endswith("repofs"):
         foreground = False
 
+    profile_dir = None
+    if args.profile_dir:
+        profile_dir = os.path.abspath(args.profile_dir)
+        if not os.path.isdir(profile_dir):
+            os.makedirs(profile_dir)
+    profiler = Profiler(profile_dir, args.profile_mode, args.profile_window)
+    slow_ops = None
+    if args.slow_op_ms is not None:
+        logfile = None
+        if profile_dir:
+            logfile = os.path.join(profile_dir, "slow-ops.log")
+        slow_ops = SlowOpLog(args.slow_op_ms / 1000.0, logfile)
+
     sys.stderr.write("Examining repository.  Please wait..\n")
     start = datetime.datetime.now()
     repo = RepoFS(
@@ -66,13 +234,42 @@ def main():
         mount=os.path.abspath(args.mount),
         hash_trees=args.hash_trees,
         no_ref_symlinks=args.no_ref_symlinks,
-        no_cache=args.no_cache
+        no_cache=args.no_cache,
+        ref_ttl=args.ref_ttl,
+        cache_timeout=args.cache_timeout,
+        profiler=profiler,
+        slow_ops=slow_ops,
+        trace=TraceRecorder(os.path.abspath(args.trace)) if args.trace else None,
+        memory_limit=args.memory_limit,
+        idle_timeout=args.idle_timeout or None,
+        prefetch=not args.no_prefetch,
+        git_settings=GitSettings(args.git_cache, args.mwindow_size, args.mapped_limit),
+        cache_dir=os.path.abspath(args.cache_dir) if args.cache_dir else None,
+        diffstat_jobs=args.diffstat_jobs,
+        file_mtimes=args.file_mtimes,
+        profile=args.profile
     )
+    if args.write_commit_graph:
+        repo._git.write_commit_graph()
+    elif not len(repo._git.commit_graph()):
+        sys.stderr.write("The repository has no commit-graph; mounting with " \
+            "--write-commit-graph speeds up history navigation.\n")
+    repo.preload()
+    if args.warm:
+        warmer = Warmer(repo, args.warm_jobs, args.warm_blobs)
+        for name in args.warm:
+            try:
+                report = warmer.warm(name)
+            except ValueError as e:
+                parser.error(str(e))
+            sys.stderr.write("Warmed %s\n" % Warmer.format(report))
+        sys.stderr.write(repo.memory.text())
     end = datetime.datetime.now()
     sys.stderr.write("Ready! Repository mounted in %s\n" % (end - start))
     sys.stderr.write("Repository %s is now visible at %s\n" % (args.repo,
                                                                args.mount))
-    FUSE(repo, os.path.abspath(args.mount), nothreads=True, foreground=foreground)
+    FUSE(repo, os.path.abspath(args.mount), nothreads=True, foreground=foreground,
+         raw_fi=True, use_ino=True, **repo.policy.fuse_options())
 
 if __name__ == '__main__':
     main()
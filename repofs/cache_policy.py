@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from time import time
+
+# Seconds the kernel may keep attributes and names of immutable content
+CACHE_TIMEOUT = 3600
+
+REF_NAMESPACES = ['/branches', '/tags', '/history']
+
+
+class CachePolicy(object):
+    """
+    Decides how long the kernel and RepoFS may cache what they have
+    seen under each namespace.  Everything under a commit of
+    commits-by-hash or commits-by-date can never change.  Branches, tags
+    and the histories of their paths change when refs are updated; they
+    are re-read at most every ref_ttl seconds, or never if ref_ttl is
+    None.
+    """
+
+    def __init__(self, hash_trees, ref_ttl=None, cache_timeout=CACHE_TIMEOUT,
+                 cache=True):
+        self.hash_trees = hash_trees
+        self.ref_ttl = ref_ttl
+        self.cache_timeout = cache_timeout
+        self.cache = cache
+        self._refreshed = time()
+
+    def is_immutable(self, path):
+        """ Return true if path lies under a specific commit or object. """
+        elements = path.split("/")[1:]
+        if elements[0] in ("commits-by-hash", "objects"):
+            depth = 4 if self.hash_trees else 1
+        elif elements[0] == "commits-by-date":
+            depth = 4
+        else:
+            return False
+        return len(elements) > depth and elements[depth] != ""
+
+    def is_ref_path(self, path):
+        for ns in REF_NAMESPACES:
+            if path == ns or path.startswith(ns + "/"):
+                return True
+        return False
+
+    def keep_cache(self, path):
+        """ Return true if the kernel may keep the pages of path
+        across opens. """
+        return self.is_immutable(path)
+
+    def refs_expired(self):
+        if self.ref_ttl is None:
+            return False
+        return time() - self._refreshed >= self.ref_ttl
+
+    def refreshed(self):
+        self._refreshed = time()
+
+    def fuse_options(self):
+        """
+        Return the kernel cache timeouts to mount with.
+        The high level FUSE API applies a single timeout to all entries,
+        so the long one is used only when refs are never refreshed;
+        otherwise the ref TTL bounds how stale branches and tags can get.
+        """
+        if self.ref_ttl is not None:
+            timeout = self.ref_ttl
+        elif self.cache:
+            timeout = self.cache_timeout
+        else:
+            return {}
+        return dict(entry_timeout=timeout, attr_timeout=timeout)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+
+from contextlib import contextmanager
+from queue import Queue, Empty
+from subprocess import Popen, PIPE
+
+# Queries, and bytes of queries, written before their answers are
+# read.  Keeps the request pipe well below its buffer size, so that
+# writing a batch never blocks on git writing its answers.
+BATCH_SIZE = 512
+BATCH_BYTES = 32 * 1024
+
+# Number of processes kept for each kind of query
+POOL_SIZE = 2
+
+BATCH = '--batch'
+BATCH_CHECK = '--batch-check'
+
+
+class CatFileError(Exception):
+    pass
+
+
+class CatFile(object):
+    """
+    A long-lived git cat-file process answering object queries.
+    In --batch-check mode only the object headers are read, so the cost
+    of a query does not depend on the size of the object; in --batch
+    mode the object contents follow each header.
+    Queries are pipelined: a whole batch is written before the answers
+    are read back.
+    """
+
+    def __init__(self, gitrepo, mode=BATCH_CHECK):
+        self._gitrepo = gitrepo
+        self.mode = mode
+        self._proc = None
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._stop()
+        self._proc = Popen(['git', '--git-dir', self._gitrepo,
+                            'cat-file', self.mode],
+                           stdin=PIPE, stdout=PIPE)
+
+    def _stop(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except IOError:
+                # Unflushed queries to a process that has exited
+                pass
+            self._proc.stdout.close()
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+        self._proc = None
+
+    def is_alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _read_answer(self):
+        header = self._proc.stdout.readline()
+        if not header:
+            raise CatFileError("git cat-file exited")
+
+        # Missing names, which may hold spaces, are echoed back as
+        # "<name> missing", so the header is parsed from the right
+        fields = header.decode('utf-8').rstrip('\n').rsplit(' ', 2)
+        if len(fields) != 3 or not fields[2].isdigit():
+            return None
+
+        size = int(fields[2])
+        if self.mode == BATCH_CHECK:
+            return (fields[1], size, None)
+
+        data = self._proc.stdout.read(size + 1)
+        if len(data) != size + 1:
+            raise CatFileError("git cat-file returned a short object")
+        return (fields[1], size, data[:size])
+
+    @staticmethod
+    def _batches(names):
+        """ Split the encoded names into batches of at most BATCH_SIZE
+        names and, unless a name is longer, BATCH_BYTES bytes. """
+        batch = []
+        nbytes = 0
+        for name in names:
+            line = (name + "\n").encode('utf-8')
+            if batch and (len(batch) == BATCH_SIZE or nbytes + len(line) > BATCH_BYTES):
+                yield batch
+                batch = []
+                nbytes = 0
+            batch.append(line)
+            nbytes += len(line)
+        if batch:
+            yield batch
+
+    def _query(self, names):
+        result = []
+        for batch in self._batches(names):
+            self._proc.stdin.write(b"".join(batch))
+            self._proc.stdin.flush()
+            result.extend([self._read_answer() for _ in batch])
+        return result
+
+    def query(self, names):
+        """
+        Returns a (type, size, contents) triple for each of the specified
+        object names, or None for objects that do not exist.  The contents
+        are None in --batch-check mode.  A process that has died is
+        restarted and the query is retried once.
+        """
+        names = [str(name) for name in names]
+        if not names:
+            return []
+
+        with self._lock:
+            for attempt in range(2):
+                if not self.is_alive():
+                    if self._proc is not None:
+                        self.restarts += 1
+                    self._start()
+                try:
+                    return self._query(names)
+                except (IOError, CatFileError) as e:
+                    # Discard the process; its pipe may hold stale answers
+                    self._stop()
+                    self.restarts += 1
+                    error = e
+            raise CatFileError("git cat-file failed: %s" % str(error))
+
+    def headers(self, oids):
+        """
+        Returns a (type, size) pair for each of the specified object ids,
+        or None for objects that do not exist
+        """
+        return [a[:2] if a else None for a in self.query(oids)]
+
+    def sizes(self, oids):
+        """
+        Returns the size of each of the specified objects, or None
+        for objects that do not exist
+        """
+        return [a[1] if a else None for a in self.query(oids)]
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def __del__(self):
+        self.close()
+
+
+class CatFilePool(object):
+    """
+    A pool of long-lived git cat-file processes of each mode.
+    Concurrent callers are each given a process of their own, so that
+    their pipelined queries do not interleave.
+    """
+
+    def __init__(self, gitrepo, size=POOL_SIZE):
+        self._gitrepo = gitrepo
+        self.size = size
+        self._idle = {BATCH: Queue(), BATCH_CHECK: Queue()}
+        self._all = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _checkout(self, mode):
+        try:
+            catfile = self._idle[mode].get_nowait()
+        except Empty:
+            with self._lock:
+                created = sum(1 for c in self._all if c.mode == mode)
+                catfile = None
+                if created < self.size:
+                    catfile = CatFile(self._gitrepo, mode)
+                    self._all.append(catfile)
+            if catfile is None:
+                catfile = self._idle[mode].get()
+        try:
+            yield catfile
+        finally:
+            self._idle[mode].put(catfile)
+
+    def headers(self, oids):
+        with self._checkout(BATCH_CHECK) as catfile:
+            return catfile.headers(oids)
+
+    def sizes(self, oids):
+        with self._checkout(BATCH_CHECK) as catfile:
+            return catfile.sizes(oids)
+
+    def contents(self, names):
+        """
+        Returns the contents of each of the specified objects, which may
+        be object ids or <rev>:<path> names, or None for objects that do
+        not exist
+        """
+        with self._checkout(BATCH) as catfile:
+            return [a[2] if a else None for a in catfile.query(names)]
+
+    def health(self):
+        """ Returns (mode, alive, restarts) for each process started. """
+        with self._lock:
+            return [(c.mode, c.is_alive(), c.restarts) for c in self._all]
+
+    def close(self):
+        with self._lock:
+            for catfile in self._all:
+                catfile.close()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import mmap
+import os
+import struct
+
+from bisect import bisect_right
+
+SIGNATURE = b'CGPH'
+VERSION = 1
+
+# Parent positions in the CDAT chunk: no parent, and the flag marking
+# an index into the EDGE chunk, whose last entry is also flagged
+NO_PARENT = 0x70000000
+EXTRA_EDGES = 0x80000000
+
+# Hash versions of the file, mapped to the size of an object id
+HASH_SIZES = {1: 20, 2: 32}
+
+# The changed-path filters: the bytes of the BDAT header, the seeds of
+# the two murmur3 hashes combined into the keys of a path, and the
+# versions of the hash, of which version 1 treats bytes as signed
+BLOOM_HEADER = 12
+BLOOM_SEEDS = (0x293ae76f, 0x7e646e2c)
+BLOOM_VERSIONS = (1, 2)
+
+MASK32 = 0xffffffff
+
+
+def _rotl(x, r):
+    return ((x << r) | (x >> (32 - r))) & MASK32
+
+
+def _mix(k):
+    k = (k * 0xcc9e2d51) & MASK32
+    return (_rotl(k, 15) * 0x1b873593) & MASK32
+
+
+def murmur3(seed, data, version=2):
+    """ Return the 32 bit murmur3 hash of the bytes data, as git
+    computes it for the filters of the specified version. """
+    if version == 1:
+        data = [b | 0xffffff00 if b & 0x80 else b for b in data]
+    h = seed
+    whole = len(data) // 4 * 4
+    for i in range(0, whole, 4):
+        k = (data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24) & MASK32
+        h ^= _mix(k)
+        h = (_rotl(h, 13) * 5 + 0xe6546b64) & MASK32
+    k = 0
+    for j, b in enumerate(data[whole:]):
+        k ^= b << (8 * j)
+    if len(data) > whole:
+        h ^= _mix(k & MASK32)
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & MASK32
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & MASK32
+    return h ^ (h >> 16)
+
+
+class _Layer(object):
+    """ A commit-graph file, mapped into memory; the commits of a chain
+    of files are numbered after those of the files before them. """
+
+    def __init__(self, filename, base):
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = self._map[:8]
+        if header[:4] != SIGNATURE or header[4] != VERSION or header[5] not in HASH_SIZES:
+            self._map.close()
+            raise ValueError("unsupported commit-graph: %s" % filename)
+        self.hash_size = HASH_SIZES[header[5]]
+        self.base = base
+        self.chunks = {}
+        table = [struct.unpack('>4sQ', self._map[8 + 12 * i:20 + 12 * i])
+                 for i in range(header[6] + 1)]
+        for (name, start), (_, end) in zip(table, table[1:]):
+            self.chunks[name] = (start, end)
+        for name in (b'OIDF', b'OIDL', b'CDAT'):
+            if name not in self.chunks:
+                self._map.close()
+                raise ValueError("commit-graph without %s: %s" % (name, filename))
+        self.count = self._word(self.chunks[b'OIDF'][0] + 255 * 4)
+        # Hash version, hashes per key and bits per path of the filters
+        self.bloom_settings = None
+        if b'BIDX' in self.chunks and b'BDAT' in self.chunks:
+            start = self.chunks[b'BDAT'][0]
+            self.bloom_settings = struct.unpack('>III', self._map[start:start + BLOOM_HEADER])
+
+    def _word(self, offset):
+        return struct.unpack('>I', self._map[offset:offset + 4])[0]
+
+    def chunk(self, name):
+        """ Return the contents of a chunk, or None if it is missing. """
+        if name not in self.chunks:
+            return None
+        start, end = self.chunks[name]
+        return self._map[start:end]
+
+    def oid(self, i):
+        start = self.chunks[b'OIDL'][0] + i * self.hash_size
+        return self._map[start:start + self.hash_size]
+
+    def find(self, raw):
+        """ Return the number of the commit in this file or -1. """
+        fanout = self.chunks[b'OIDF'][0]
+        lo = self._word(fanout + (raw[0] - 1) * 4) if raw[0] else 0
+        hi = self._word(fanout + raw[0] * 4)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.oid(mid)
+            if found < raw:
+                lo = mid + 1
+            elif found > raw:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def data(self, i):
+        """ Return the first parent, second parent and the generation
+        and time word of commit i. """
+        start = self.chunks[b'CDAT'][0] + i * (self.hash_size + 16) + self.hash_size
+        return struct.unpack('>IIQ', self._map[start:start + 16])
+
+    def tree(self, i):
+        start = self.chunks[b'CDAT'][0] + i * (self.hash_size + 16)
+        return self._map[start:start + self.hash_size]
+
+    def bloom(self, i):
+        """ Return the changed-path filter of commit i, which is empty
+        if git did not compute one. """
+        if self.bloom_settings is None:
+            return b''
+        index = self.chunks[b'BIDX'][0]
+        start = self._word(index + (i - 1) * 4) if i else 0
+        end = self._word(index + i * 4)
+        data = self.chunks[b'BDAT'][0] + BLOOM_HEADER
+        return self._map[data + start:data + end]
+
+    def extra_parents(self, i):
+        result = []
+        start = self.chunks[b'EDGE'][0] + i * 4
+        while True:
+            edge = self._word(start)
+            result.append(edge & ~EXTRA_EDGES)
+            if edge & EXTRA_EDGES:
+                return result
+            start += 4
+
+    def close(self):
+        self._map.close()
+
+
+class CommitGraph(object):
+    """
+    The commit-graph files git writes with git commit-graph write, read
+    without inflating any commit.  Commits are identified by their
+    position in the graph.  Besides the parents and commit times it
+    holds the topological level of each commit, one more than the
+    highest level of its parents, which lets ancestry walks stop at
+    commits too low to reach the commit sought.  A graph written with
+    --split is read as the chain of its files.  A graph written with
+    --changed-paths also holds for each commit a Bloom filter of the
+    paths it changed, which tells that a path was not changed without
+    comparing any trees.
+    """
+
+    def __init__(self, gitrepo):
+        self.layers = []
+        info = os.path.join(gitrepo, 'objects', 'info')
+        chain = os.path.join(info, 'commit-graphs', 'commit-graph-chain')
+        if os.path.isfile(chain):
+            with open(chain) as f:
+                names = [os.path.join(info, 'commit-graphs', 'graph-%s.graph' % line.strip())
+                         for line in f if line.strip()]
+        else:
+            names = [os.path.join(info, 'commit-graph')]
+
+        base = 0
+        for name in names:
+            try:
+                layer = _Layer(name, base)
+            except (ValueError, OSError):
+                # A chain is only usable up to a missing or bad file
+                break
+            self.layers.append(layer)
+            base += layer.count
+        self._bases = [layer.base for layer in self.layers]
+        # Like git, use the filters only if every file has the same kind
+        settings = set(layer.bloom_settings for layer in self.layers)
+        self.bloom_settings = None
+        if len(settings) == 1:
+            self.bloom_settings = settings.pop()
+            if self.bloom_settings and self.bloom_settings[0] not in BLOOM_VERSIONS:
+                self.bloom_settings = None
+
+    def __len__(self):
+        return sum(layer.count for layer in self.layers)
+
+    def _layer(self, pos):
+        layer = self.layers[bisect_right(self._bases, pos) - 1]
+        return layer, pos - layer.base
+
+    def index(self, commit):
+        """ Return the position of the specified hex commit id or -1. """
+        try:
+            raw = bytes.fromhex(commit)
+        except (TypeError, ValueError):
+            return -1
+        for layer in self.layers:
+            if len(raw) == layer.hash_size:
+                i = layer.find(raw)
+                if i != -1:
+                    return layer.base + i
+        return -1
+
+    def hex(self, pos):
+        layer, i = self._layer(pos)
+        return layer.oid(i).hex()
+
+    def tree(self, pos):
+        """ Return the hex id of the root tree of a commit. """
+        layer, i = self._layer(pos)
+        return layer.tree(i).hex()
+
+    def parents(self, pos):
+        layer, i = self._layer(pos)
+        first, second, word = layer.data(i)
+        if first == NO_PARENT:
+            return []
+        if second == NO_PARENT:
+            return [first]
+        if second & EXTRA_EDGES:
+            return [first] + layer.extra_parents(second & ~EXTRA_EDGES)
+        return [first, second]
+
+    def commit_time(self, pos):
+        layer, i = self._layer(pos)
+        return layer.data(i)[2] & 0x3ffffffff
+
+    def generation(self, pos):
+        layer, i = self._layer(pos)
+        return layer.data(i)[2] >> 34
+
+    def is_ancestor(self, ancestor, descendant):
+        """ Return True if the commit at position ancestor can be reached
+        from the one at descendant through parents. """
+        level = self.generation(ancestor)
+        pending = [descendant]
+        seen = set(pending)
+        while pending:
+            pos = pending.pop()
+            if pos == ancestor:
+                return True
+            # The levels of a commit's ancestors are all below its own
+            if self.generation(pos) <= level:
+                continue
+            for parent in self.parents(pos):
+                if parent not in seen:
+                    seen.add(parent)
+                    pending.append(parent)
+        return False
+
+    def path_keys(self, path):
+        """ Return the keys of path and of the directories leading to
+        it in the changed-path filters, or None if there are none. """
+        if not self.bloom_settings or not path:
+            return None
+        version, hashes = self.bloom_settings[:2]
+        keys = []
+        elements = path.split("/")
+        for i in range(len(elements), 0, -1):
+            data = "/".join(elements[:i]).encode('utf-8')
+            h0, h1 = (murmur3(seed, data, version) for seed in BLOOM_SEEDS)
+            keys.append([(h0 + j * h1) & MASK32 for j in range(hashes)])
+        return keys
+
+    def changed(self, pos, keys):
+        """ Return False if the filter of the commit at pos shows it left
+        the path of keys as its first parent had it, True if it may
+        have changed it. """
+        if keys is None:
+            return True
+        layer, i = self._layer(pos)
+        data = layer.bloom(i)
+        if not data:
+            return True
+        bits = len(data) * 8
+        for key in keys:
+            for h in key:
+                bit = h % bits
+                if not data[bit >> 3] & (1 << (bit & 7)):
+                    return False
+        return True
+
+    def close(self):
+        for layer in self.layers:
+            layer.close()
+        self.layers = []
+        self._bases = []
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+OID_SIZE = 20
+
+# git log format producing one line per commit for CommitTable.parse
+LOG_FORMAT = '--pretty=%H%x00%P%x00%ct%x00%at%x00%an%x00%ae'
+
+
+class _OidView(object):
+    """ The sorted object ids of a table as a sequence, for bisect. """
+    def __init__(self, oids):
+        self._oids = oids
+
+    def __len__(self):
+        return len(self._oids) // OID_SIZE
+
+    def __getitem__(self, i):
+        return self._oids[i * OID_SIZE:(i + 1) * OID_SIZE]
+
+
+class CommitTable(object):
+    """
+    Metadata of all commits kept in flat arrays.  Commits are numbered
+    by the order of their binary object id, so that an id is found by
+    binary search and a commit number maps back to its id by offset.
+    Parents are stored as commit numbers, the parents of commit i being
+    parents[parent_start[i]:parent_start[i + 1]]; -1 stands for a parent
+    missing from the table.  Author names and emails are interned.
+    """
+
+    def __init__(self):
+        self.oids = b''
+        self.commit_time = array('q')
+        self.author_time = array('q')
+        self.parent_start = array('l', [0])
+        self.parents = array('l')
+        self.author = array('l')
+        self.email = array('l')
+        self.names = []
+        self.emails = []
+
+    @classmethod
+    def parse(cls, output):
+        """ Build a table from the output of git log with LOG_FORMAT. """
+        rows = []
+        for line in output.splitlines():
+            fields = line.split('\0')
+            if len(fields) != 6:
+                continue
+            rows.append((bytes.fromhex(fields[0]), fields[1].split(),
+                         int(fields[2]), int(fields[3]), fields[4], fields[5]))
+        rows.sort(key=lambda r: r[0])
+
+        table = cls()
+        table.oids = b''.join(r[0] for r in rows)
+        numbers = dict((r[0], i) for i, r in enumerate(rows))
+        name_ids = {}
+        email_ids = {}
+        for oid, parents, commit_time, author_time, name, email in rows:
+            table.commit_time.append(commit_time)
+            table.author_time.append(author_time)
+            for p in parents:
+                table.parents.append(numbers.get(bytes.fromhex(p), -1))
+            table.parent_start.append(len(table.parents))
+            table.author.append(cls._intern(name, name_ids, table.names))
+            table.email.append(cls._intern(email, email_ids, table.emails))
+        return table
+
+    @staticmethod
+    def _intern(value, ids, values):
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def __len__(self):
+        return len(self.commit_time)
+
+    def index(self, commit):
+        """ Return the number of the specified hex commit id or -1. """
+        try:
+            oid = bytes.fromhex(commit)
+        except (TypeError, ValueError):
+            return -1
+        if len(oid) != OID_SIZE:
+            return -1
+
+        view = _OidView(self.oids)
+        i = bisect_left(view, oid)
+        if i < len(view) and view[i] == oid:
+            return i
+        return -1
+
+    def prefix_range(self, prefix):
+        """ Return the range of the numbers of the commits whose hex id
+        starts with prefix, which is empty for a prefix that isn't hex. """
+        hex_size = 2 * OID_SIZE
+        try:
+            low = bytes.fromhex((prefix + '0' * hex_size)[:hex_size])
+            high = bytes.fromhex((prefix + 'f' * hex_size)[:hex_size])
+        except (TypeError, ValueError):
+            return range(0)
+        if len(prefix) > hex_size:
+            return range(0)
+
+        view = _OidView(self.oids)
+        return range(bisect_left(view, low), bisect_right(view, high))
+
+    def hex(self, i):
+        return self.oids[i * OID_SIZE:(i + 1) * OID_SIZE].hex()
+
+    def get_parents(self, i):
+        return self.parents[self.parent_start[i]:self.parent_start[i + 1]]
+
+    def get_author(self, i):
+        return self.names[self.author[i]]
+
+    def get_email(self, i):
+        return self.emails[self.email[i]]
+
+    def nbytes(self):
+        """ Return the memory held by the table's columns. """
+        columns = [self.commit_time, self.author_time, self.parent_start,
+                   self.parents, self.author, self.email]
+        return (len(self.oids) + sum(c.itemsize * len(c) for c in columns) +
+                sum(len(s) for s in self.names) + sum(len(s) for s in self.emails))
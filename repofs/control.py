@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+from repofs.git_settings import NAMES
+from repofs.memory import parse_size
+from repofs.warm import Warmer
+
+USAGE = """\
+commands, one per line:
+  drop all|CACHE...      empty caches
+  limit SIZE|none        set the memory limit
+  blob-cache SIZE        set the bytes of file contents kept
+  git-cache SIZE|auto    set the size of the libgit2 object cache
+  mwindow-size SIZE|auto set the size of each libgit2 pack window
+  mapped-limit SIZE|auto set the bytes of packs libgit2 maps at once
+  ref-ttl SECONDS|none   set how often refs are re-read
+  idle-timeout SECONDS|none
+                         set the idle time after which caches are emptied
+  refresh                re-read refs now
+  warm REF|COMMIT|RANGE...
+                         cache the trees of refs, commits or ranges
+  prefetch on|off        turn reading ahead of recursive scans on or off
+  profile on|off         turn the profiler on or off
+"""
+
+
+def _number(text, convert=float):
+    return None if text == "none" else convert(text)
+
+
+class Control(object):
+    """
+    The .repofs/control file, through which a live mount is tuned.
+    Each line written is a command; reading the file shows the current
+    settings, the caches and the outcome of the last command.
+    """
+
+    def __init__(self, fs):
+        self.fs = fs
+        self.last = ""
+
+    def status(self):
+        fs = self.fs
+        lines = [
+            "limit %s" % fs.memory.limit,
+            "blob-cache %d" % fs._git.blob_cache_size,
+        ] + fs.git_settings.status() + [
+            "ref-ttl %s" % fs.policy.ref_ttl,
+            "idle-timeout %s" % fs.memory.idle_timeout,
+            "prefetch %s" % (fs.prefetcher.status() if fs.prefetcher else "none"),
+            "profile %s" % ("on" if fs.profiler.enabled else "off"),
+            "caches %s" % " ".join(fs.memory.names()),
+        ]
+        if self.last:
+            lines.append("last %s" % self.last)
+        return "\n".join(lines).replace("None", "none") + "\n\n" + USAGE
+
+    def write(self, data):
+        for line in data.splitlines():
+            words = line.split()
+            if words:
+                self.last = self.command(words[0], words[1:]) or line.strip()
+
+    def command(self, name, args):
+        """ Run a command; bad commands raise ValueError. """
+        fs = self.fs
+        if name == "drop" and args:
+            names = fs.memory.names() if args == ["all"] else args
+            for cache in names:
+                fs.memory.drop(cache)
+        elif name == "limit" and len(args) == 1:
+            fs.memory.limit = _number(args[0], parse_size)
+            fs.memory.enforce()
+            fs.git_settings.apply(os.path.join(fs.repo, '.git'), fs.memory.limit)
+        elif name == "blob-cache" and len(args) == 1:
+            fs._git.resize_blob_cache(parse_size(args[0]))
+        elif name in NAMES and len(args) == 1:
+            size = None if args[0] == "auto" else parse_size(args[0])
+            fs.git_settings.set(name, size, os.path.join(fs.repo, '.git'), fs.memory.limit)
+        elif name == "ref-ttl" and len(args) == 1:
+            fs.policy.ref_ttl = _number(args[0])
+        elif name == "idle-timeout" and len(args) == 1:
+            fs.memory.idle_timeout = _number(args[0]) or None
+        elif name == "refresh" and not args:
+            fs.refresh_refs()
+        elif name == "warm" and args:
+            warmer = Warmer(fs)
+            return "; ".join(Warmer.format(warmer.warm(ref)) for ref in args)
+        elif name == "prefetch" and args in (["on"], ["off"]) and fs.prefetcher:
+            fs.prefetcher.enabled = args == ["on"]
+        elif name == "profile" and len(args) == 1:
+            fs.profiler.toggle(args[0])
+        else:
+            raise ValueError("bad command: %s" % name)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, PIPE
+from time import perf_counter
+
+from repofs.disk_cache import DiskCache
+from repofs.stats import Stats
+
+# Commits diffed by each git diff-tree process
+BATCH_SIZE = 64
+
+# Processes diffing batches at the same time; each batch beyond the one
+# read is diffed ahead of the reader
+DIFFSTAT_JOBS = min(8, os.cpu_count() or 1)
+
+# Ancestors examined for each commit diffed ahead
+WALK_FACTOR = 4
+
+
+class DiffstatError(Exception):
+    pass
+
+
+class Diffstats(object):
+    """
+    The lines added and deleted in each file by a commit against its
+    first parent, or against the empty tree for a root commit, as git
+    diff-tree --numstat lists them.  Commits are diffed in batches by
+    git diff-tree --stdin processes run by a pool of jobs threads.  When
+    a commit is missing, the ancestors that follow it are diffed in the
+    same batch and in the batches that are run alongside it, so that a
+    reader going through the history finds them ready.  With cache_dir
+    the results are also kept in files named after the commit, which
+    outlive the mount.
+    """
+
+    def __init__(self, gitrepo, parents, cache_dir=None, jobs=DIFFSTAT_JOBS,
+                 stats=None):
+        self._gitrepo = gitrepo
+        self._parents = parents
+        self._disk = DiskCache(cache_dir, 'diffstat')
+        self.jobs = max(1, jobs)
+        self.stats = stats or Stats()
+        self.cache = True
+        self._texts = {}
+        self._bytes = 0
+        # Commits being diffed -> the future of their batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs)
+
+    def nbytes(self):
+        return self._bytes
+
+    def evict(self, nbytes):
+        with self._lock:
+            self._texts = {}
+            self._bytes = 0
+
+    def _keep(self, commit, text):
+        if self.cache and commit not in self._texts:
+            self._texts[commit] = text
+            self._bytes += len(commit) + len(text)
+
+    def _is_known(self, commit):
+        return commit in self._texts or commit in self._pending or commit in self._disk
+
+    def _line(self, commit):
+        """ Return the line asking git diff-tree for commit. """
+        parents = self._parents(commit)
+        return commit + (" " + parents[0] if parents else "") + "\n"
+
+    def _diff(self, commits, lines):
+        """ Diff the commits with a single git diff-tree; return a dict
+        mapping each to its text. """
+        start = perf_counter()
+        proc = Popen(['git', '--git-dir', self._gitrepo, 'diff-tree', '--stdin',
+                      '--always', '--root', '-r', '--numstat', '--no-renames'],
+                     stdin=PIPE, stdout=PIPE)
+        out = proc.communicate("".join(lines).encode('utf-8'))[0]
+        self.stats.record_command('diff-tree', perf_counter() - start)
+        if proc.returncode != 0:
+            raise DiffstatError("git diff-tree exited with %d" % proc.returncode)
+
+        # Each commit's lines follow a line with its id and no tab
+        result = dict((commit, []) for commit in commits)
+        current = []
+        for line in out.splitlines(True):
+            if b'\t' in line:
+                current.append(line)
+            elif line.strip():
+                current = result.setdefault(line.split()[0].decode('utf-8'), [])
+        return dict((commit, b"".join(result[commit])) for commit in commits)
+
+    def _run(self, commits, lines):
+        texts = {}
+        try:
+            texts = self._diff(commits, lines)
+        finally:
+            with self._lock:
+                for commit, text in texts.items():
+                    self._keep(commit, text)
+                for commit in commits:
+                    self._pending.pop(commit, None)
+        for commit, text in texts.items():
+            self._disk.save(commit, text)
+        return texts
+
+    def _ahead(self, commit):
+        """ Return up to jobs batches of commits to diff: commit and the
+        ancestors that follow it, in breadth-first order, skipping those
+        already diffed or being diffed. """
+        wanted = BATCH_SIZE * self.jobs
+        found = [commit]
+        queue = [commit]
+        seen = set(queue)
+        examined = 0
+        while queue and len(found) < wanted and examined < wanted * WALK_FACTOR:
+            current = queue.pop(0)
+            for parent in self._parents(current):
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                queue.append(parent)
+                examined += 1
+                if not self._is_known(parent):
+                    found.append(parent)
+        return [found[i:i + BATCH_SIZE] for i in range(0, len(found), BATCH_SIZE)]
+
+    def get(self, commit):
+        """ Return the numstat lines of commit as bytes. """
+        with self._lock:
+            if commit in self._texts:
+                self.stats.cache_hit('diffstats')
+                return self._texts[commit]
+            future = self._pending.get(commit)
+        if future is None:
+            text = self._disk.load(commit)
+            if text is not None:
+                self.stats.cache_hit('diffstats')
+                with self._lock:
+                    self._keep(commit, text)
+                return text
+        self.stats.cache_miss('diffstats')
+
+        with self._lock:
+            future = self._pending.get(commit)
+            if future is None:
+                for batch in self._ahead(commit):
+                    lines = [self._line(c) for c in batch]
+                    f = self._executor.submit(self._run, batch, lines)
+                    for c in batch:
+                        self._pending[c] = f
+                future = self._pending[commit]
+        try:
+            return future.result()[commit]
+        except OSError as e:
+            raise DiffstatError(str(e))
+
+    def close(self):
+        with self._lock:
+            futures = set(self._pending.values())
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
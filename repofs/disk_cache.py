@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import tempfile
+
+
+class DiskCache(object):
+    """
+    Values derived from immutable objects, such as the diffstat of a
+    commit, kept in files named after their keys under kind in
+    directory, so that they outlive the mount and can be shared by
+    mounts of the same repository.  Without a directory nothing is kept.
+    """
+
+    def __init__(self, directory, kind):
+        self.directory = os.path.join(directory, kind) if directory else None
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def __contains__(self, key):
+        return self.directory is not None and os.path.exists(self.path(key))
+
+    def load(self, key):
+        """ Return the bytes kept for key, or None. """
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def save(self, key, data):
+        """ Keep data for key, writing it atomically, so that concurrent
+        mounts never read a partial file. """
+        if self.directory is None:
+            return
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except (IOError, OSError):
+            # The directory is only a cache
+            pass
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+from pygit2 import settings, GIT_OBJ_COMMIT, GIT_OBJ_TREE
+
+# The defaults of libgit2 on 64-bit platforms
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+MWINDOW_MAPPED_LIMIT = 8 * 1024 * 1024 * 1024
+
+# Smallest window sized automatically; the libgit2 default on 32-bit
+# platforms
+MWINDOW_MIN = 32 * 1024 * 1024
+# Windows sized automatically are whole multiples of this
+MWINDOW_UNIT = 1024 * 1024
+
+# Largest commits and trees kept in the object cache.  The default of
+# 4096 bytes leaves out trees of more than about a hundred entries,
+# which are then inflated again on every path lookup.
+OBJECT_LIMIT = 1024 * 1024
+
+# Settings that can be given, in the order they are reported
+NAMES = ['git-cache', 'mwindow-size', 'mapped-limit']
+
+
+def available_memory():
+    """ Return the bytes of memory available to the process, or None
+    if they can't be found. """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def pack_sizes(gitrepo):
+    """ Return the sizes of the packs of a repository. """
+    packdir = os.path.join(gitrepo, 'objects', 'pack')
+    if not os.path.isdir(packdir):
+        return []
+    return [os.path.getsize(os.path.join(packdir, name))
+            for name in os.listdir(packdir) if name.endswith('.pack')]
+
+
+def pack_bytes(gitrepo):
+    """ Return the total size of the packs of a repository. """
+    return sum(pack_sizes(gitrepo))
+
+
+class GitSettings(object):
+    """
+    The size of libgit2's object cache and of the windows through which
+    it maps packs.  These are global to the process.  Settings that are
+    not given are sized from the packs of the repository, the memory
+    available and the memory limit of the mount:  the object cache gets
+    a sixteenth of the pack size, but no more than an eighth of the
+    available memory or a quarter of the memory limit; a window maps
+    the largest pack whole, within a quarter of the available memory,
+    so that lookups in it don't remap windows; the mapped limit covers
+    all packs, within the available memory.
+    """
+
+    def __init__(self, cache_size=None, mwindow_size=None, mapped_limit=None):
+        self.requested = {'git-cache': cache_size, 'mwindow-size': mwindow_size,
+                          'mapped-limit': mapped_limit}
+        self.values = {}
+        self.packs = 0
+        self.largest_pack = 0
+
+    def _auto(self, name, memory, memory_limit):
+        if name == 'git-cache':
+            size = max(CACHE_MAX_SIZE, self.packs // 16)
+            if memory is not None:
+                size = min(size, memory // 8)
+            if memory_limit is not None:
+                size = min(size, memory_limit // 4)
+            return size
+        elif name == 'mwindow-size':
+            size = -(-self.largest_pack // MWINDOW_UNIT) * MWINDOW_UNIT
+            if memory is not None:
+                size = min(size, memory // 4 // MWINDOW_UNIT * MWINDOW_UNIT)
+            return max(MWINDOW_MIN, size)
+        else:
+            size = self.packs
+            if memory is not None:
+                size = min(size, memory)
+            return max(MWINDOW_MAPPED_LIMIT, size)
+
+    def apply(self, gitrepo, memory_limit=None):
+        """ Size the settings not given for the repository and set them
+        all in libgit2. """
+        sizes = pack_sizes(gitrepo)
+        self.packs = sum(sizes)
+        self.largest_pack = max(sizes, default=0)
+        memory = available_memory()
+        for name in NAMES:
+            size = self.requested[name]
+            if size is None:
+                size = self._auto(name, memory, memory_limit)
+            self.values[name] = size
+        settings.cache_max_size(self.values['git-cache'])
+        settings.mwindow_size = self.values['mwindow-size']
+        settings.mwindow_mapped_limit = self.values['mapped-limit']
+        settings.cache_object_limit(GIT_OBJ_COMMIT, OBJECT_LIMIT)
+        settings.cache_object_limit(GIT_OBJ_TREE, OBJECT_LIMIT)
+
+    def set(self, name, size, gitrepo, memory_limit=None):
+        """ Change a setting; a size of None sizes it automatically. """
+        if name not in NAMES:
+            raise ValueError("no such setting: %s" % name)
+        self.requested[name] = size
+        self.apply(gitrepo, memory_limit)
+
+    def status(self):
+        """ Return a line for each setting, marking those sized
+        automatically. """
+        return ["%s %d%s" % (name, self.values[name],
+                             " auto" if self.requested[name] is None else "")
+                for name in NAMES if name in self.values]
+
+    def gauges(self):
+        """ Return the settings and the bytes cached, for the stats. """
+        cached, limit = settings.cached_memory
+        return {
+            'libgit2_cached_bytes': cached,
+            'libgit2_cache_max_bytes': limit,
+            'libgit2_mwindow_size_bytes': settings.mwindow_size,
+            'libgit2_mwindow_mapped_limit_bytes': settings.mwindow_mapped_limit,
+            'pack_bytes': self.packs,
+        }
@@ -16,31 +16,156 @@
 #
 
 import datetime
+import hashlib
+import json
 import os
 import re
 import sys
+import threading
+
+from collections import OrderedDict
+from time import perf_counter
 try:
     from StringIO import StringIO # Python 2
 except ImportError:
     from io import StringIO # Python 3
 
 from subprocess import check_output, CalledProcessError, call
-from pygit2 import Repository, Commit, GIT_OBJ_TREE, GIT_FILEMODE_LINK
+from repofs.catfile import CatFilePool, CatFileError
+from repofs.ref_index import RefIndex
+from repofs.commit_table import CommitTable, LOG_FORMAT
+from repofs.commit_graph import CommitGraph
+from repofs.diffstat import Diffstats, DiffstatError, DIFFSTAT_JOBS
+from repofs.disk_cache import DiskCache
+from repofs.stats import Stats
+from repofs.memory import MemoryManager, TREE_ENTRY, SIZE_ENTRY, REF_ENTRY, \
+        REF_INDEX_ENTRY, COMMAND_ENTRY, BLOB_ENTRY, HISTORY_ENTRY, CHANGES_ENTRY, \
+        LAST_CHANGE_ENTRY, TREE_SIZE_ENTRY
+from pygit2 import Repository, Commit, GitError, Oid, GIT_OBJ_TREE, GIT_FILEMODE_LINK, \
+        GIT_FILEMODE_TREE, GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE
+
+# Bytes of blob contents kept for reads, whatever the memory limit
+BLOB_CACHE_SIZE = 64 * 1024 * 1024
+
+# The type bits of a tree entry's mode, which tell files from symbolic
+# links and submodules
+FILEMODE_TYPE = 0o170000
 
 
 class GitOperations(object):
-    def __init__(self, repo, no_cache=False):
+    def __init__(self, repo, no_cache=False, stats=None, memory=None, cache_dir=None,
+                 diffstat_jobs=DIFFSTAT_JOBS):
         self.repo = repo
+        self.stats = stats or Stats()
+        self.memory = memory or MemoryManager()
         self._gitrepo = os.path.join(repo, '.git')
         self._pygit = Repository(repo)
         self._commands = {}
+        self._command_bytes = 0
+        self._blobs = OrderedDict()
+        self._blob_bytes = 0
+        self._blob_lock = threading.Lock()
+        self.blob_cache_size = BLOB_CACHE_SIZE
         self._trees = {}
         self._trees_filled = {}
         self._sizes = {}
+        self._object_sizes = {}
+        self._catfile = CatFilePool(self._gitrepo)
         self._refs = {}
+        self._ref_indexes = {}
+        self._table = None
+        self._graph = None
+        self._histories = {}
+        self._changes = {}
+        self._last_changes = {}
+        # Total size of the blobs under each tree, by tree id
+        self._tree_sizes = {}
+        self._last_changes_disk = DiskCache(cache_dir, 'last-changes')
         self._commits_iterator = None
         self.cache = not no_cache
+        self._diffstats = Diffstats(self._gitrepo, self.commit_parents, cache_dir,
+                                    diffstat_jobs, self.stats)
+        self._diffstats.cache = self.cache
         self.years = range(self._first_year(), self._last_year() + 1)
+        # Told of the files read, to read ahead those of a scan
+        self.prefetcher = None
+        self._register_caches()
+
+    def _register_caches(self):
+        """ Account for the caches with the memory manager, those
+        cheapest to refill first. """
+        memory = self.memory
+        memory.register('blobs', lambda: self._blob_bytes + len(self._blobs) * BLOB_ENTRY,
+                        self._evict_blobs)
+        memory.register('commands', lambda: self._command_bytes, self._evict_commands)
+        memory.register('sizes', lambda: SIZE_ENTRY * (
+                            sum(len(s) for s in self._sizes.values()) +
+                            len(self._object_sizes)),
+                        self._evict_sizes)
+        memory.register('trees', lambda: TREE_ENTRY * (
+                            sum(len(t) for t in self._trees.values()) +
+                            sum(len(t) for t in self._trees_filled.values())),
+                        self._evict_trees)
+        memory.register('histories', lambda: HISTORY_ENTRY *
+                            sum(len(h) + 1 for h in self._histories.values()),
+                        self._evict_histories)
+        memory.register('changes', lambda: sum(CHANGES_ENTRY + len(c)
+                                                for c in self._changes.values()),
+                        self._evict_changes)
+        memory.register('last-changes', lambda: LAST_CHANGE_ENTRY *
+                            sum(len(c) + 1 for c in self._last_changes.values()),
+                        self._evict_last_changes)
+        memory.register('tree-sizes', lambda: TREE_SIZE_ENTRY * len(self._tree_sizes),
+                        self._evict_tree_sizes)
+        memory.register('diffstats', self._diffstats.nbytes, self._diffstats.evict)
+        memory.register('refs', lambda: REF_ENTRY * len(self._refs) + REF_INDEX_ENTRY *
+                            sum(len(i.refs) for i in self._ref_indexes.values()),
+                        self._evict_refs, idle=False)
+        memory.register('commits', lambda: self._table.nbytes() if self._table else 0,
+                        self._evict_table, idle=False)
+
+    def _evict_blobs(self, nbytes):
+        with self._blob_lock:
+            while nbytes > 0 and self._blobs:
+                oid, data = self._blobs.popitem(last=False)
+                self._blob_bytes -= len(data)
+                nbytes -= len(data) + BLOB_ENTRY
+
+    def _evict_commands(self, nbytes):
+        self._commands = {}
+        self._command_bytes = 0
+
+    def _evict_sizes(self, nbytes):
+        self._sizes = {}
+        self._object_sizes = {}
+
+    def _evict_trees(self, nbytes):
+        self._trees = {}
+        self._trees_filled = {}
+
+    def _evict_histories(self, nbytes):
+        self._histories = {}
+        self._changes = {}
+
+    def _evict_changes(self, nbytes):
+        self._changes = {}
+
+    def _evict_last_changes(self, nbytes):
+        self._last_changes = {}
+
+    def _evict_tree_sizes(self, nbytes):
+        self._tree_sizes = {}
+
+    def _evict_refs(self, nbytes):
+        self._refs = {}
+        self._ref_indexes = {}
+
+    def _evict_table(self, nbytes):
+        self._table = None
+
+    def _run(self, command):
+        """ Runs a git command and returns its output """
+        return check_output(command)
 
     def cached_command(self, list, return_exit_code=False, silent=False):
         """
@@ -55,11 +180,14 @@ class GitOperations(object):
         list = ['git', '--git-dir', self._gitrepo] + list
         command = " ".join(list)
         if command in self._commands:
+            self.stats.cache_hit('commands')
             return self._commands[command]
         else:
+            self.stats.cache_miss('commands')
+            start = perf_counter()
             try:
                 # print(command)
-                out = check_output(list).decode('utf-8')
+                out = self._run(list).decode('utf-8')
                 if return_exit_code:
                     out = True
             except CalledProcessError as e:
@@ -71,8 +199,12 @@ class GitOperations(object):
                     message = "Error calling %s: %s" % (command, str(e))
                     sys.stderr.write(message)
                     out = None
+            self.stats.record_command(list[3], perf_counter() - start)
             if self.cache:
                 self._commands[command] = out
+                self._command_bytes += COMMAND_ENTRY + len(command)
+                if isinstance(out, str):
+                    self._command_bytes += len(out)
             return out
 
     def _get_entry(self, commit, path=None, return_tree=False):
@@ -102,16 +234,18 @@ class GitOperations(object):
 
         self._trees[commit].update(trees)
 
-    def _get_tree(self, commit, path):
+    def _get_tree_object(self, commit, path):
         if not path:
-            tree = self._get_entry(commit, '')
-        else:
-            path += "/"
-            try:
-                tree = self._get_entry(commit, path)
-            except KeyError:
-                return []
+            return self._get_entry(commit, '')
 
+        path += "/"
+        try:
+            return self._get_entry(commit, path)
+        except KeyError:
+            return []
+
+    def _get_tree(self, commit, path):
+        tree = self._get_tree_object(commit, path)
         return [(c.name, c.type) for c in tree]
 
     def _cache_tree(self, commit, path):
@@ -145,14 +279,43 @@ class GitOperations(object):
                                          '--pretty=%ad']
                                          ))
 
+    def refresh_refs(self):
+        """
+        Forgets the cached refs and history listings, so that refs
+        updated after mounting become visible
+        """
+        self._refs = {}
+        self._ref_indexes = {}
+        self._table = None
+        self._close_graph()
+        self._commands = dict((command, out) for command, out in self._commands.items()
+                              if not (" for-each-ref " in command or " log " in command))
+        self._command_bytes = sum(COMMAND_ENTRY + len(command) +
+                                  (len(out) if isinstance(out, str) else 0)
+                                  for command, out in self._commands.items())
+        self.years = range(self._first_year(), self._last_year() + 1)
+
     def refs(self, refs):
         """
         Returns the specified refs in the form:
         <commit_hash> refs/{heads,remotes,tags}/<branchname>
         """
-        refs = self.cached_command(['for-each-ref',
+        return self.ref_index(refs).refs
+
+    def ref_index(self, refs):
+        """
+        Returns the specified refs as a RefIndex, built once per listing
+        """
+        key = tuple(refs)
+        if key in self._ref_indexes:
+            return self._ref_indexes[key]
+
+        out = self.cached_command(['for-each-ref',
                 '--format=%(objectname) %(refname)'] + refs).splitlines()
-        return [ref.strip() for ref in refs]
+        index = RefIndex([ref.strip() for ref in out])
+        if self.cache:
+            self._ref_indexes[key] = index
+        return index
 
     def _get_commits_iterator(self, command):
         return StringIO(self.cached_command(command))
@@ -182,15 +345,39 @@ class GitOperations(object):
         """
         Returns a list of all commit hashes
         """
-        command = ['log', '--all', '--pretty=%H']
-        commits = self._get_commits_iterator(command)
-
         if prefix:
-            commits = iter([c for c in commits if c.startswith(prefix)])
+            for commit in self.commits_with_prefix(prefix):
+                yield commit
+            return
 
-        for commit in commits:
+        command = ['log', '--all', '--pretty=%H']
+        for commit in self._get_commits_iterator(command):
             yield commit.strip()
 
+    def commits_with_prefix(self, prefix, limit=None):
+        """
+        Returns the hashes of the commits that start with prefix, at most
+        limit of them, found by binary search in the commit table
+        """
+        table = self.commit_table()
+        if table is None:
+            commits = [c for c in self.all_commits() if c.startswith(prefix)]
+            return commits[:limit]
+        numbers = table.prefix_range(prefix)
+        if limit is not None:
+            numbers = numbers[:limit]
+        return [table.hex(i) for i in numbers]
+
+    def is_commit(self, commit):
+        """
+        Returns True if commit is the hash of a commit reachable from a ref,
+        looked up in the commit table rather than by walking the history
+        """
+        table, i = self._commit_index(commit)
+        if table is not None:
+            return i != -1
+        return commit in self.all_commits()
+
     def _get_commit_from_ref(self, ref):
         commit = self._pygit.revparse_single(ref)
         if isinstance(commit, Commit):
@@ -216,13 +403,335 @@ class GitOperations(object):
 
         return self._refs[ref]
 
+    def commit_table(self):
+        """
+        Returns the metadata table of all commits, filled in a single pass
+        over the history on first use, or None when caching is disabled
+        """
+        if not self.cache:
+            return None
+
+        if self._table is None:
+            start = perf_counter()
+            try:
+                out = self._run(['git', '--git-dir', self._gitrepo, 'log',
+                                 '--all', LOG_FORMAT]).decode('utf-8')
+            except CalledProcessError:
+                out = ""
+            self.stats.record_command('log', perf_counter() - start)
+            self._table = CommitTable.parse(out)
+        return self._table
+
+    def commit_graph(self):
+        """
+        Returns the commit-graph of the repository, which has no commits
+        if git has not written one
+        """
+        if self._graph is None:
+            self._graph = CommitGraph(self._gitrepo)
+        return self._graph
+
+    def write_commit_graph(self):
+        """
+        Writes the commit-graph of all commits reachable from refs, with
+        the Bloom filters of the paths each commit changes
+        """
+        start = perf_counter()
+        self._run(['git', '--git-dir', self._gitrepo, 'commit-graph', 'write',
+                   '--reachable', '--changed-paths'])
+        self.stats.record_command('commit-graph', perf_counter() - start)
+        self._close_graph()
+
+    def _close_graph(self):
+        if self._graph is not None:
+            self._graph.close()
+            self._graph = None
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+        Returns True if ancestor can be reached from descendant through
+        parents, or is descendant itself.  Commits in the commit-graph are
+        walked there, skipping those whose generation is too low to reach
+        ancestor.
+        """
+        graph = self.commit_graph()
+        a, d = graph.index(ancestor), graph.index(descendant)
+        if a != -1 and d != -1:
+            return graph.is_ancestor(a, d)
+        if ancestor == descendant:
+            return True
+        try:
+            return self._pygit.descendant_of(descendant, ancestor)
+        except (KeyError, ValueError, GitError):
+            return False
+
+    def _commit_index(self, commit):
+        table = self.commit_table()
+        if table is None:
+            return None, -1
+        return table, table.index(commit)
+
     def commit_parents(self, commit):
         """
         Returns commit parents
         """
+        graph = self.commit_graph()
+        pos = graph.index(commit)
+        if pos != -1:
+            return [graph.hex(p) for p in graph.parents(pos)]
+
+        table, i = self._commit_index(commit)
+        if i != -1:
+            parents = table.get_parents(i)
+            if -1 not in parents:
+                return [table.hex(p) for p in parents]
+
         parents = self._get_entry(commit).parents
         return [str(p.id) for p in parents]
 
+    def path_history(self, commit, path):
+        """
+        Returns the commits reachable from commit that changed path, most
+        recent first.  As git log -- path does, a merge that left path as
+        one of its parents had it is followed through that parent only.
+        Commits in the commit-graph are walked by their position there,
+        and its changed-path filters tell most commits that left path as
+        their first parent had it without reading any tree.  The
+        histories are cached by commit and path.
+        """
+        key = (commit, path)
+        if key in self._histories:
+            self.stats.cache_hit('histories')
+            return self._histories[key]
+        self.stats.cache_miss('histories')
+
+        graph = self.commit_graph()
+        keys = graph.path_keys(path)
+        entries = {}
+
+        # Commits are graph positions, or hex ids if not in the graph
+        def node(c):
+            pos = graph.index(c)
+            return c if pos == -1 else pos
+
+        def parents(c):
+            if isinstance(c, int):
+                return graph.parents(c)
+            return [node(p) for p in self.commit_parents(c)]
+
+        # A path changes with its object or its mode, as git log sees it
+        def entry(c):
+            if c not in entries:
+                if isinstance(c, int):
+                    tree = self._pygit[graph.tree(c)]
+                else:
+                    tree = self._pygit[c].tree
+                try:
+                    e = tree[path]
+                    entries[c] = (e.id, e.filemode)
+                except KeyError:
+                    entries[c] = None
+            return entries[c]
+
+        changed = []
+        pending = [node(commit)]
+        seen = set(pending)
+        while pending:
+            c = pending.pop()
+            follow = parents(c)
+            if not follow:
+                if entry(c) is not None:
+                    changed.append(c)
+                continue
+            elif isinstance(c, int) and not graph.changed(c, keys):
+                follow = follow[:1]
+            else:
+                same = [p for p in follow if entry(p) == entry(c)]
+                if same:
+                    follow = same[:1]
+                else:
+                    changed.append(c)
+            for p in follow:
+                if p not in seen:
+                    seen.add(p)
+                    pending.append(p)
+
+        history = [graph.hex(c) if isinstance(c, int) else c for c in changed]
+        history.sort(key=self.get_commit_time, reverse=True)
+        if self.cache:
+            self._histories[key] = history
+        return history
+
+    def _commit_tree(self, commit):
+        graph = self.commit_graph()
+        pos = graph.index(commit)
+        if pos != -1:
+            return graph.tree(pos)
+        return str(self._get_entry(commit).tree_id)
+
+    def _diff_trees(self, old, new, prefix, changes):
+        """ Append to changes the (status, path) of each file that differs
+        between the trees old and new, either of which may be None,
+        without descending into subtrees both have. """
+        old = dict((e.name, e) for e in old) if old is not None else {}
+        new = dict((e.name, e) for e in new) if new is not None else {}
+        for name in set(old) | set(new):
+            a, b = old.get(name), new.get(name)
+            if a is not None and b is not None and a.id == b.id and a.filemode == b.filemode:
+                continue
+            a_tree = a is not None and a.filemode == GIT_FILEMODE_TREE
+            b_tree = b is not None and b.filemode == GIT_FILEMODE_TREE
+            if a_tree or b_tree:
+                self._diff_trees(self._pygit[a.id] if a_tree else None,
+                                 self._pygit[b.id] if b_tree else None,
+                                 prefix + name + "/", changes)
+            a_file = a is not None and not a_tree
+            b_file = b is not None and not b_tree
+            if a_file and b_file:
+                same_type = a.filemode & FILEMODE_TYPE == b.filemode & FILEMODE_TYPE
+                changes.append(('M' if same_type else 'T', prefix + name))
+            elif a_file:
+                changes.append(('D', prefix + name))
+            elif b_file:
+                changes.append(('A', prefix + name))
+
+    def commit_changes(self, commit, parent):
+        """
+        Returns the files added, modified and deleted by commit against
+        parent, one per line after A, M, D or T for a change of type, as
+        git diff-tree -r --name-status lists them without detecting
+        renames.  The differences are cached by the pair of trees, so
+        that they are computed once however the commits are reached.
+        """
+        key = (self._commit_tree(parent), self._commit_tree(commit))
+        if key in self._changes:
+            self.stats.cache_hit('changes')
+            return self._changes[key]
+        self.stats.cache_miss('changes')
+
+        changes = []
+        self._diff_trees(self._pygit[key[0]], self._pygit[key[1]], "", changes)
+        changes.sort(key=lambda c: c[1])
+        text = "".join("%s\t%s\n" % c for c in changes).encode('utf-8')
+        if self.cache:
+            self._changes[key] = text
+        return text
+
+    def _subtree(self, tree, path):
+        """ Returns the tree at path under the tree with the specified id,
+        or None if there is none """
+        tree = self._pygit[tree]
+        if not path:
+            return tree
+        try:
+            entry = tree[path]
+        except KeyError:
+            return None
+        if entry.filemode != GIT_FILEMODE_TREE:
+            return None
+        return self._pygit[entry.id]
+
+    def _walk_last_changes(self, commit, path):
+        """ Returns the last changes of the entries of directory path,
+        walking the first parents of commit until each entry is found to
+        differ from the parent's.  Commits in the commit-graph are walked
+        by their position there. """
+        graph = self.commit_graph()
+        keys = graph.path_keys(path)
+        c, pos = commit, graph.index(commit)
+        tree = self._subtree(self._commit_tree(commit), path)
+        if tree is None:
+            return {}
+        entries = dict((e.name, (e.id, e.filemode)) for e in tree)
+        pending = set(entries)
+        changes = {}
+        tree_id = tree.id
+        while pending:
+            known = self._last_changes.get((c, path)) if c != commit else None
+            if known is not None:
+                # Entries unchanged since c were last changed where they were then
+                changes.update((name, known[name]) for name in pending)
+                break
+            if pos != -1:
+                parents = graph.parents(pos)[:1]
+                parent_pos = parents[0] if parents else -1
+                parent = graph.hex(parent_pos) if parents else None
+                parent_root = graph.tree(parent_pos) if parents else None
+            else:
+                parents = self.commit_parents(c)[:1]
+                parent = parents[0] if parents else None
+                parent_pos = graph.index(parent) if parents else -1
+                parent_root = self._commit_tree(parent) if parents else None
+            if not parents:
+                changes.update((name, c) for name in pending)
+                break
+            if pos != -1 and not graph.changed(pos, keys):
+                c, pos = parent, parent_pos
+                continue
+            parent_tree = self._subtree(parent_root, path)
+            if parent_tree is None:
+                changes.update((name, c) for name in pending)
+                break
+            if parent_tree.id != tree_id:
+                for name in list(pending):
+                    try:
+                        entry = parent_tree[name]
+                        same = (entry.id, entry.filemode) == entries[name]
+                    except KeyError:
+                        same = False
+                    if not same:
+                        changes[name] = c
+                        pending.discard(name)
+            c, pos, tree_id = parent, parent_pos, parent_tree.id
+        return changes
+
+    def last_changes(self, commit, path):
+        """
+        Returns a dict mapping each entry of the directory path in the
+        tree of commit to the last commit, following first parents, that
+        changed it.  The walk starts from the commit that last changed
+        the directory itself, found among the last changes of the
+        directory containing it, and skips commits whose tree at path is
+        their parent's, or whose changed-path filter shows so.  The
+        results are cached and, with a cache directory, kept on disk.
+        """
+        key = (commit, path)
+        if key in self._last_changes:
+            self.stats.cache_hit('last-changes')
+            return self._last_changes[key]
+        disk_key = hashlib.sha1(("%s\0%s" % key).encode('utf-8')).hexdigest()
+        data = self._last_changes_disk.load(disk_key)
+        if data is not None:
+            self.stats.cache_hit('last-changes')
+            changes = json.loads(data.decode('utf-8'))
+        else:
+            self.stats.cache_miss('last-changes')
+            start = commit
+            if path:
+                parent_dir, _, name = path.rpartition("/")
+                start = self.last_changes(commit, parent_dir).get(name)
+            if start is None:
+                changes = {}
+            elif start != commit:
+                # The directory is as the commit that last changed it left it
+                changes = self.last_changes(start, path)
+            else:
+                changes = self._walk_last_changes(commit, path)
+            self._last_changes_disk.save(disk_key, json.dumps(changes).encode('utf-8'))
+        if self.cache:
+            self._last_changes[key] = changes
+        return changes
+
+    def diffstat(self, commit):
+        """
+        Returns the lines added and deleted in each file by commit, as
+        git diff-tree --numstat lists them against its first parent
+        """
+        try:
+            return self._diffstats.get(commit)
+        except DiffstatError as e:
+            raise GitOperError(str(e))
+
     def commit_descendants(self, commit):
         """
         Returns commit descendants
@@ -236,11 +745,30 @@ class GitOperations(object):
         return []
 
     def get_commit_time(self, commit):
+        graph = self.commit_graph()
+        pos = graph.index(commit)
+        if pos != -1:
+            return graph.commit_time(pos)
+
+        table, i = self._commit_index(commit)
+        if i != -1:
+            return table.commit_time[i]
         return self._get_entry(commit).commit_time
 
     def get_author_time(self, commit):
+        table, i = self._commit_index(commit)
+        if i != -1:
+            return table.author_time[i]
         return self._get_entry(commit).author.time
 
+    def commit_times(self, commits):
+        """
+        Returns a dict mapping each of the specified commits to its
+        (commit time, author time) pair
+        """
+        return dict((c, (self.get_commit_time(c), self.get_author_time(c)))
+                    for c in set(commits))
+
     def directory_contents(self, commit, path):
         """
         Returns the contents of the directory
@@ -250,6 +778,145 @@ class GitOperations(object):
         tree = self._get_tree(commit, path)
         return [c[0] for c in tree]
 
+    def directory_entries(self, commit, path):
+        """
+        Returns (name, filemode, size) for every entry of the directory
+        specified by `path`.  The tree is walked once and the
+        subdirectory and size caches are filled along the way, so that
+        subsequent lookups of the listed entries are free.
+        """
+
+        tree = self._get_tree_object(commit, path)
+        if not commit in self._sizes:
+            self._sizes[commit] = {}
+        sizes = self._sizes[commit]
+
+        tree = list(tree)
+        blobs = [c.id for c in tree
+                 if c.filemode in (GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE)]
+        blob_sizes = dict(zip(blobs, self.object_sizes(blobs)))
+
+        entries = []
+        subtrees = []
+        for c in tree:
+            subpath = os.path.join(path, c.name)
+            size = 0
+            if c.filemode == GIT_FILEMODE_TREE:
+                subtrees.append((subpath, GIT_OBJ_TREE))
+            elif c.filemode in (GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE):
+                size = sizes[subpath] = blob_sizes[c.id]
+            entries.append((c.name, c.filemode, size))
+
+        if commit in self._trees:
+            self._fill_trees(commit, subtrees)
+            self._trees_filled[commit].add(path)
+
+        return entries
+
+    def entry_id(self, commit, path):
+        """
+        Returns the id of the blob or tree at path in the tree of commit
+        """
+        return self._get_entry(commit, path, return_tree=True).id.hex
+
+    def object_attributes(self, commit, path):
+        """
+        Returns the id, type and filemode of the object at path in the
+        tree of commit; the empty path stands for the commit itself,
+        which has no filemode
+        """
+        if not path:
+            return commit, 'commit', None
+        obj = self._get_entry(commit, path, return_tree=True)
+        return obj.id.hex, obj.type_str, obj.filemode
+
+    def tree_size(self, oid):
+        """
+        Returns the total size of the blobs under the tree, or under the
+        tree of the commit, oid.  Sizes are kept per tree, so that only
+        the subtrees a commit changed are walked again.
+        """
+        obj = self._pygit[oid]
+        if obj.type_str == 'commit':
+            obj = obj.tree
+        oid = obj.id.hex
+        if oid in self._tree_sizes:
+            self.stats.cache_hit('tree-sizes')
+            return self._tree_sizes[oid]
+        self.stats.cache_miss('tree-sizes')
+
+        size = sum(self.object_sizes([c.id for c in obj if c.type_str == 'blob']))
+        size += sum(self.tree_size(c.id.hex) for c in obj if c.type_str == 'tree')
+        if self.cache:
+            self._tree_sizes[oid] = size
+        return size
+
+    def object_header(self, oid):
+        """
+        Returns the type and size of the object oid, read from its header
+        without inflating it, or None if there is no such object
+        """
+        start = perf_counter()
+        try:
+            header = self._catfile.headers([oid])[0]
+        except CatFileError as e:
+            raise GitOperError(str(e))
+        self.stats.record_command('cat-file', perf_counter() - start)
+        if header is not None:
+            self._object_sizes[Oid(hex=oid)] = header[1]
+        return header
+
+    def object_size(self, oid):
+        """
+        Returns the size of the object oid
+        """
+        return self.object_sizes([Oid(hex=oid)])[0]
+
+    def object_entry(self, oid, path):
+        """
+        Returns the id, type and filemode of the entry at path in the
+        tree oid
+        """
+        try:
+            obj = self._pygit[oid][path]
+        except (KeyError, ValueError, TypeError) as e:
+            raise GitOperError("pygit entry does not exist\n%s" % (str(e)))
+        return obj.id.hex, obj.type_str, obj.filemode
+
+    def object_contents(self, oid):
+        """
+        Returns the contents of the blob oid, through the blob cache
+        """
+        try:
+            return self.blob(Oid(hex=oid))
+        except (KeyError, ValueError, AttributeError) as e:
+            raise GitOperError("no such blob\n%s" % (str(e)))
+
+    def tree_entries(self, oid):
+        """
+        Returns (name, filemode, size) for every entry of the tree oid,
+        with the sizes of its blobs read in one batch
+        """
+        tree = list(self._pygit[oid])
+        blobs = [c.id for c in tree
+                 if c.filemode in (GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE)]
+        sizes = dict(zip(blobs, self.object_sizes(blobs)))
+        return [(c.name, c.filemode, sizes.get(c.id, 0)) for c in tree]
+
+    def tree_entry_ids(self, oid):
+        """
+        Returns a dict mapping the names of the entries of the tree oid
+        to their ids
+        """
+        return dict((c.name, c.id.hex) for c in self._pygit[oid])
+
+    def entry_ids(self, commit, path):
+        """
+        Returns a dict mapping the names of the entries of the directory
+        path in the tree of commit to their ids
+        """
+        return dict((c.name, c.id.hex) for c in self._get_tree_object(commit, path))
+
     def is_symlink(self, commit, path):
         # the root of the repository can't be a symlink
         if not path:
@@ -280,29 +947,170 @@ class GitOperations(object):
 
     def file_contents(self, commit, path):
         try:
-            return self._get_entry(commit, path).data
+            oid = self._get_entry(commit, path, return_tree=True).id
         except KeyError:
             return ""
+        if self.prefetcher:
+            self.prefetcher.reading(commit, path, oid)
+        return self.blob(oid)
+
+    def resize_blob_cache(self, size):
+        self.blob_cache_size = size
+        self._evict_blobs(self._blob_bytes - size)
+
+    def blob(self, oid):
+        """
+        Returns the contents of the specified blob.  The most recently
+        read blobs are kept, so that a file read in many pieces is
+        inflated once.
+        """
+        with self._blob_lock:
+            data = self._blobs.get(oid)
+            if data is not None:
+                self._blobs.move_to_end(oid)
+        if data is not None:
+            self.stats.cache_hit('blobs')
+            return data
+        self.stats.cache_miss('blobs')
+
+        data = self._pygit[oid].data
+        self._keep_blob(oid, data)
+        return data
+
+    def _keep_blob(self, oid, data):
+        if not self.cache or len(data) > self.blob_cache_size:
+            return
+        with self._blob_lock:
+            if oid not in self._blobs:
+                self._blobs[oid] = data
+                self._blob_bytes += len(data)
+        self._evict_blobs(self._blob_bytes - self.blob_cache_size)
+
+    def prefetch_blobs(self, oids):
+        """
+        Reads the specified blobs that are not cached in one batch from
+        the git cat-file pool and caches them.  Returns the number of
+        bytes read.  Concurrent callers are served by separate processes.
+        """
+        with self._blob_lock:
+            missing = [oid for oid in oids if oid not in self._blobs]
+        if not self.cache or not missing:
+            return 0
+        nbytes = 0
+        for oid, data in zip(missing, self.read_objects(missing)):
+            if data is not None:
+                self._keep_blob(oid, data)
+                nbytes += len(data)
+        return nbytes
+
+    def commit_blobs(self, commit, path=''):
+        """
+        Returns the (oid, size) pairs of the distinct blobs under path in
+        the tree of the specified commit, in the depth-first order a
+        recursive listing visits them, without reading their contents
+        """
+        oids = []
+        seen = set()
+        pending = [iter(self._get_tree_object(commit, path))]
+        while pending:
+            c = next(pending[-1], None)
+            if c is None:
+                pending.pop()
+                continue
+            if c.id in seen:
+                continue
+            seen.add(c.id)
+            if c.filemode == GIT_FILEMODE_TREE:
+                pending.append(iter(self._pygit[c.id]))
+            elif c.filemode in (GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE):
+                oids.append(c.id)
+        return list(zip(oids, self.object_sizes(oids)))
+
+    def commits_in_range(self, spec):
+        """
+        Returns the commits of a range such as v1.0..master, as listed
+        by git rev-list, or an empty list if the range is invalid
+        """
+        out = self.cached_command(['rev-list', spec], silent=True)
+        return out.split() if out else []
 
     def file_size(self, commit, path):
         if not commit in self._sizes:
             self._sizes[commit] = {}
 
         if path in self._sizes[commit]:
+            self.stats.cache_hit('sizes')
             return self._sizes[commit][path]
+        self.stats.cache_miss('sizes')
 
         try:
-            size = self._get_entry(commit, path).size
+            oid = self._get_entry(commit, path, return_tree=True).id
         except KeyError:
-            size = 0
+            oid = None
 
+        size = self.object_sizes([oid])[0] if oid else 0
         self._sizes[commit][path] = size
         return size
 
+    def object_sizes(self, oids):
+        """
+        Returns the sizes of the specified objects, read from the object
+        headers without inflating their contents.  Objects not seen
+        before are looked up in a single batch.
+        """
+        # The cache may be evicted by another thread while the batch runs
+        cached = self._object_sizes
+        found = {}
+        missing = []
+        for oid in set(oids):
+            size = cached.get(oid)
+            if size is None:
+                missing.append(oid)
+            else:
+                found[oid] = size
+        if missing:
+            start = perf_counter()
+            try:
+                sizes = self._catfile.sizes(missing)
+            except CatFileError as e:
+                raise GitOperError(str(e))
+            self.stats.record_command('cat-file', perf_counter() - start)
+            for oid, size in zip(missing, sizes):
+                found[oid] = size or 0
+            self._object_sizes.update((oid, found[oid]) for oid in missing)
+        return [found[oid] for oid in oids]
+
+    def read_objects(self, names):
+        """
+        Returns the contents of the specified objects, given as object ids
+        or <rev>:<path> names, read in one pipelined batch from a
+        long-lived git cat-file process rather than one git per object
+        """
+        start = perf_counter()
+        try:
+            return self._catfile.contents(names)
+        except CatFileError as e:
+            raise GitOperError(str(e))
+        finally:
+            self.stats.record_command('cat-file', perf_counter() - start)
+
+    def close(self):
+        if self.prefetcher:
+            self.prefetcher.close()
+        self._diffstats.close()
+        self._close_graph()
+        self._catfile.close()
+
     def author(self, commit):
+        table, i = self._commit_index(commit)
+        if i != -1:
+            return table.get_author(i)
         return self._get_entry(commit).author.name
 
     def author_email(self, commit):
+        table, i = self._commit_index(commit)
+        if i != -1:
+            return table.get_email(i)
         return self._get_entry(commit).author.email
 
 class GitOperError(Exception):
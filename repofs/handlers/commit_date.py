@@ -71,7 +71,7 @@ class CommitDateHandler(CommitHandler):
 
     def _verify_commit(self):
         if (self.path_data['commit'] \
-                and self.path_data['commit'] not in self.oper.all_commits()):
+                and not self.oper.is_commit(self.path_data['commit'])):
             self._not_exists()
 
     def is_dir(self):
@@ -98,7 +98,7 @@ class CommitDateHandler(CommitHandler):
 
     def file_contents(self):
         if self._is_metadata_file():
-            return self._get_metadata_file(self.path_data['commit_path'])
+            return self._get_metadata_file(self.path_data['commit'])
 
         return self.oper.file_contents(self.path_data['commit'], self.path_data['commit_path'])
 
@@ -107,7 +107,7 @@ class CommitDateHandler(CommitHandler):
 
     def file_size(self):
         if self._is_metadata_file():
-            return len(self._get_metadata_file(self.path_data['commit']))
+            return self._get_metadata_file_size(self.path_data['commit'])
 
         return self.oper.file_size(self.get_commit(), self.path_data['commit_path'])
 
@@ -139,3 +139,16 @@ class CommitDateHandler(CommitHandler):
         else:
             # /commits-by-date/yyyy/mm/dd/hash
             return self._get_commit_content()
+
+    def readdir_entries(self):
+        if len(self.path_data['date_path'].split("/")) < 3:
+            return super().readdir_entries()
+
+        self._verify_date_path()
+        self._verify_commit()
+        if not self.path_data['commit']:
+            elements = self._date_path_to_int()
+            return self._commit_list_entries(self.oper.commits_by_date(elements[0],
+                                                                       elements[1],
+                                                                       elements[2]))
+        return self._get_commit_entries()
@@ -15,13 +15,23 @@
 # limitations under the License.
 #
 
+from stat import S_IFDIR
+
 from repofs.handlers.handler_base import HandlerBase
 from repofs.gitoper import GitOperError
 
 class CommitHandler(HandlerBase):
+    def is_generated(self):
+        return self._is_generated_file()
+
+    def get_commit_path(self):
+        if not self.path_data['commit']:
+            return None
+        return self._tree_path()
+
     def _get_commit_content(self):
         # root isn't a commit hash
-        if self.path_data['commit'] not in self.oper.all_commits():
+        if not self.oper.is_commit(self.path_data['commit']):
             self._not_exists()
 
         if self._is_metadata_dir():
@@ -36,3 +46,19 @@ class CommitHandler(HandlerBase):
             dirents += self._get_metadata_names()
 
         return dirents
+
+    def _get_commit_entries(self):
+        if not self.oper.is_commit(self.path_data['commit']):
+            self._not_exists()
+
+        if self._is_metadata_dir():
+            return [(name, None, 0, None)
+                    for name in self._get_metadata_dir(self.path_data['commit'])]
+
+        try:
+            return self._tree_entries(self.path_data['commit'], self.path_data['commit_path'])
+        except GitOperError:
+            self._dir_not_exists()
+
+    def _commit_list_entries(self, commits):
+        return [(commit, S_IFDIR, 0, commit) for commit in commits]
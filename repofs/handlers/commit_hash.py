@@ -16,12 +16,16 @@
 #
 
 import os
+import re
 
 from itertools import product
 
 from repofs.handlers.commit_handler import CommitHandler
 from repofs import utils
 
+# Hashes abbreviated as git abbreviates them, from its minimum length
+ABBREVIATED_HASH = re.compile('^[0-9a-f]{4,39}$')
+
 class CommitHashHandler(CommitHandler):
     def __init__(self, path, oper, hash_trees):
         self.path = path
@@ -41,9 +45,20 @@ class CommitHashHandler(CommitHandler):
                 if elem not in self._hex:
                     self._not_exists()
 
+    def _abbreviated_commit(self):
+        """ Return the commit the path names by a unique abbreviation
+        of its hash, or "" if it names none, or more than one. """
+        commit = self.path_data['commit']
+        if self.path_data['commit_path'] or not ABBREVIATED_HASH.match(commit):
+            return ""
+        if not commit.startswith(self.path_data['htree_prefix'].replace("/", "")):
+            return ""
+        commits = self.oper.commits_with_prefix(commit, 2)
+        return commits[0] if len(commits) == 1 else ""
+
     def _verify_commit(self):
         if (self.path_data['commit'] \
-                and self.path_data['commit'] not in self.oper.all_commits()):
+                and not self.oper.is_commit(self.path_data['commit'])):
             self._not_exists()
 
     def is_dir(self):
@@ -51,6 +66,8 @@ class CommitHashHandler(CommitHandler):
             return True
 
         self._verify_hash_path()
+        if self._abbreviated_commit():
+            return False
         self._verify_commit()
 
         if not self.path_data['commit_path']:
@@ -62,7 +79,9 @@ class CommitHashHandler(CommitHandler):
         return self.oper.is_dir(self.path_data['commit'], self.path_data['commit_path'])
 
     def is_symlink(self):
-        if not self.path_data['commit_path'] or self._is_metadata_name():
+        if not self.path_data['commit_path']:
+            return bool(self._abbreviated_commit())
+        if self._is_metadata_name():
             return False
         if self.is_metadata_symlink():
             return True
@@ -74,15 +93,23 @@ class CommitHashHandler(CommitHandler):
         return self.oper.file_contents(self.path_data['commit'], self.path_data['commit_path'])
 
     def get_commit(self): #TODO TESTS
-        return self.path_data['commit']
+        return self._abbreviated_commit() or self.path_data['commit']
+
+    def get_commit_path(self):
+        if self._abbreviated_commit():
+            return None
+        return super().get_commit_path()
 
     def file_size(self):
         if self._is_metadata_file():
-            return len(self._get_metadata_file(self.path_data['commit']))
+            return self._get_metadata_file_size(self.path_data['commit'])
 
         return self.oper.file_size(self.get_commit(), self.path_data['commit_path'])
 
     def get_symlink_target(self):
+        abbreviated = self._abbreviated_commit()
+        if abbreviated:
+            return os.path.join(self.path_data['htree_prefix'], abbreviated)
         if not self.path_data['commit_path']:
             self._not_exists()
 
@@ -104,3 +131,16 @@ class CommitHashHandler(CommitHandler):
             return self.oper.all_commits()
 
         return self._get_commit_content()
+
+    def readdir_entries(self):
+        if self.hash_trees:
+            htree_elem = self.path_data['htree_prefix'].split("/")
+            if len(htree_elem) <= 2:
+                return super().readdir_entries()
+            elif len(htree_elem) == 3 and not self.path_data['commit']:
+                return self._commit_list_entries(self.oper.all_commits(''.join(htree_elem)))
+
+        if not self.path_data['commit']:
+            return self._commit_list_entries(self.oper.all_commits())
+
+        return self._get_commit_entries()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from repofs.handlers.handler_base import HandlerBase
+
+class DiagHandler(HandlerBase):
+    """ The hidden .repofs directory, whose files report the state of
+    the mount.  Their contents are generated when they are read; the
+    writable ones pass each write to their writer. """
+
+    def __init__(self, path, files, writers=None):
+        self.path = path
+        self.files = files
+        self.writers = writers or {}
+
+    def _file(self):
+        if self.path not in self.files:
+            self._not_exists()
+        return self.files[self.path]
+
+    def is_dir(self):
+        if not self.path:
+            return True
+        self._file()
+        return False
+
+    def is_symlink(self):
+        return False
+
+    def file_contents(self):
+        return self._file()().encode('utf-8')
+
+    def file_size(self):
+        return len(self.file_contents())
+
+    def is_generated(self):
+        return bool(self.path)
+
+    def is_writable(self):
+        return self.path in self.writers
+
+    def write(self, data):
+        if not self.is_writable():
+            self._not_exists()
+        self.writers[self.path](data)
+
+    def get_commit(self):
+        return ""
+
+    def readdir(self):
+        if self.path:
+            self._dir_not_exists()
+        return sorted(self.files)
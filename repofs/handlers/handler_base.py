@@ -17,9 +17,18 @@
 
 import errno
 
+from stat import S_IFDIR, S_IFREG
 from fuse import FuseOSError
+from pygit2 import GIT_FILEMODE_TREE, GIT_FILEMODE_BLOB, GIT_FILEMODE_BLOB_EXECUTABLE
 from repofs import utils
 
+# Entry types whose attributes can be derived from the tree being listed
+TREE_ENTRY_TYPES = {
+    GIT_FILEMODE_TREE: S_IFDIR,
+    GIT_FILEMODE_BLOB: S_IFREG,
+    GIT_FILEMODE_BLOB_EXECUTABLE: S_IFREG,
+}
+
 class HandlerBase:
     def __init__(self, *args, **kwargs):
         pass
@@ -36,9 +45,47 @@ class HandlerBase:
     def readdir(self, *args, **kwargs):
         raise NotImplementedError("readdir not implemented in child class")
 
+    def get_commit_path(self):
+        """Return the path in the tree of get_commit() that the handler's
+        path refers to, or None if it refers to no entry of a tree. """
+        return None
+
+    def is_generated(self):
+        """Return true if the handler's path is a file whose contents are
+        generated when it is read, so that its size isn't known before. """
+        return False
+
+    def get_object_attributes(self):
+        """Return the id, type and filemode of the object the handler's
+        path refers to by id, or None. """
+        return None
+
+    def _tree_path(self):
+        path = self.path_data['commit_path']
+        if path.split("/")[0] in utils.metadata_names():
+            return None
+        return path
+
+    def readdir_entries(self):
+        """Return the directory entries as (name, type, size, commit)
+        tuples.  The type is None for entries whose attributes can't be
+        computed in bulk; these are left to getattr. """
+        return [(name, None, 0, None) for name in self.readdir()]
+
+    def _tree_entries(self, commit, path):
+        entries = []
+        for name, mode, size in self.oper.directory_entries(commit, path):
+            entries.append((name, TREE_ENTRY_TYPES.get(mode), size, commit))
+
+        if not path:
+            entries += [(name, S_IFDIR, 0, commit) for name in utils.metadata_dirs]
+            entries += [(name, S_IFREG, 0, commit) if utils.is_generated_file(name)
+                        else (name, None, 0, None) for name in utils.metadata_files]
+        return entries
+
     def _get_metadata_dir(self, commit):
         metaname = self.path_data['commit_path']
-        if metaname == '.git-parents':
+        if metaname in ('.git-parents', '.git-changes'):
             return self.oper.commit_parents(commit)
         elif metaname == '.git-descendants':
             return self.oper.commit_descendants(commit)
@@ -53,9 +100,24 @@ class HandlerBase:
             return self.oper.author(commit)
         elif metaname == ".author-email":
             return self.oper.author_email(commit)
+        elif metaname == ".git-diffstat":
+            return self.oper.diffstat(commit)
+        elif metaname.startswith(".git-changes/"):
+            parent = metaname.split("/")[1]
+            if parent not in self.oper.commit_parents(commit):
+                self._not_exists()
+            return self.oper.commit_changes(commit, parent)
         else:
             self._not_exists()
 
+    def _get_metadata_file_size(self, commit):
+        if self._is_generated_file():
+            return 0
+        return len(self._get_metadata_file(commit))
+
+    def _is_generated_file(self):
+        return utils.is_generated_file(self.path_data['commit_path'] or '')
+
     def _is_metadata_dir(self):
         return utils.is_metadata_dir(self.path_data['commit_path'])
 
@@ -66,13 +128,21 @@ class HandlerBase:
         return self._is_metadata_dir() or self._is_metadata_file()
 
     def is_metadata_symlink(self):
-        return utils.is_metadata_symlink(self.path_data['commit_path'], self.oper.all_commits())
+        path = self.path_data['commit_path']
+        target = path.split("/")[-1:]
+        if not (utils.is_metadata_symlink(path, target)
+                and self.oper.is_commit(target[0])):
+            return False
+        # .git-ancestors can't be listed; it holds any ancestor looked up
+        if path.startswith('.git-ancestors/'):
+            return self.oper.is_ancestor(target[0], self.get_commit())
+        return True
 
     def _get_metadata_names(self):
         return utils.metadata_names()
 
     def _is_metadata_symlink(self):
-        return utils.is_metadata_symlink(self.path_data['commit_path'], self.oper.all_commits())
+        return self.is_metadata_symlink()
 
     def _not_exists(self):
         raise FuseOSError(errno.ENOENT)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import errno
+
+from repofs.handlers.handler_base import HandlerBase
+from repofs import utils
+from fuse import FuseOSError
+
+class HistoryHandler(HandlerBase):
+    """ Lists under history/<ref>/<path> the commits reachable from the
+    ref that changed path, as symbolic links to commits-by-hash, followed
+    by the entries of path in the ref's tree, whose histories are listed
+    below it. """
+
+    def __init__(self, path, oper, refs):
+        self.path = path
+        self.oper = oper
+        self.ref_index = self.oper.ref_index(refs)
+        self.path_data = utils.demux_ref_path(path, self.ref_index)
+
+    def _is_full_ref(self):
+        return self.ref_index.is_ref(self.path_data['ref'])
+
+    def _is_ref_prefix(self):
+        return self.ref_index.is_prefix(self.path_data['ref'])
+
+    def _history(self, path):
+        if not path:
+            return []
+        tip = self.oper.commit_of_ref(self.path_data['ref'])
+        if not tip:
+            return []
+        return self.oper.path_history(tip, path)
+
+    def _link_commit(self):
+        """ Return the commit the path links to, or "" """
+        if not self._is_full_ref():
+            return ""
+        dirname, _, name = self.path_data['commit_path'].rpartition("/")
+        if utils.OBJECT_ID.match(name) and name in self._history(dirname):
+            return name
+        return ""
+
+    def get_commit(self):
+        """ Return the commit linked to, the most recent commit that
+        changed the path, or the ref's commit at its root. """
+        if not self._is_full_ref():
+            return ""
+        commit = self._link_commit()
+        if commit:
+            return commit
+        if not self.path_data['commit_path']:
+            return self.oper.commit_of_ref(self.path_data['ref'])
+        history = self._history(self.path_data['commit_path'])
+        return history[0] if history else ""
+
+    def is_dir(self):
+        if not self.path or self._is_ref_prefix():
+            return True
+        if not self._is_full_ref():
+            return False
+        if not self.path_data['commit_path']:
+            return True
+        return not self._link_commit() and bool(self._history(self.path_data['commit_path']))
+
+    def is_symlink(self):
+        return bool(self._link_commit())
+
+    def is_metadata_symlink(self):
+        return False
+
+    def get_symlink_target(self):
+        commit = self._link_commit()
+        if not commit:
+            self._not_exists()
+        return commit
+
+    def file_contents(self):
+        self._not_exists()
+
+    def file_size(self):
+        self._not_exists()
+
+    def readdir(self):
+        if not self.path or self._is_ref_prefix():
+            return self.ref_index.next_elements(self.path_data['ref'])
+        if not self._is_full_ref():
+            raise FuseOSError(errno.ENOENT)
+
+        tip = self.oper.commit_of_ref(self.path_data['ref'])
+        path = self.path_data['commit_path']
+        if not path:
+            return self.oper.directory_contents(tip, path)
+        history = self._history(path)
+        if not history:
+            raise FuseOSError(errno.ENOENT)
+        if self.oper.is_dir(tip, path):
+            return history + self.oper.directory_contents(tip, path)
+        return list(history)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import errno
+import os
+
+from itertools import product
+
+from repofs.handlers.handler_base import HandlerBase, TREE_ENTRY_TYPES
+from repofs.gitoper import GitOperError
+from repofs import utils
+from fuse import FuseOSError
+from pygit2 import GIT_FILEMODE_LINK
+
+class ObjectHandler(HandlerBase):
+    """ Serves under objects/<oid> the blob oid as a file and the tree
+    oid as a directory, below three levels of hash directories with
+    hash_trees.  Objects are found by id, without going through a
+    commit; the directories are listed empty, as there is no cheap way
+    to enumerate the objects of a repository. """
+
+    def __init__(self, path, oper, hash_trees):
+        self.path = path
+        self.oper = oper
+        self.hash_trees = hash_trees
+        path_data = utils.demux_commits_by_hash_path(path, hash_trees)
+        self.oid = path_data['commit']
+        self.object_path = path_data['commit_path']
+        self.htree_prefix = path_data['htree_prefix']
+        self._hex = list(map(''.join, product('0123456789abcdef', repeat=2)))
+        self._attributes = None
+
+    def _prefix_elements(self):
+        return [e for e in self.htree_prefix.split("/") if e]
+
+    def _verify(self):
+        for elem in self._prefix_elements():
+            if elem not in self._hex:
+                self._not_exists()
+        if self.oid and not (utils.OBJECT_ID.match(self.oid)
+                             and self.oid.startswith(''.join(self._prefix_elements()))):
+            self._not_exists()
+
+    def get_object_attributes(self):
+        self._verify()
+        if not self.oid:
+            return None
+        if self._attributes is None:
+            if self.object_path:
+                try:
+                    self._attributes = self.oper.object_entry(self.oid, self.object_path)
+                except GitOperError:
+                    self._not_exists()
+            else:
+                header = self.oper.object_header(self.oid)
+                if header is None or header[0] not in ('blob', 'tree'):
+                    self._not_exists()
+                self._attributes = (self.oid, header[0], None)
+        return self._attributes
+
+    def is_dir(self):
+        attributes = self.get_object_attributes()
+        return attributes is None or attributes[1] == 'tree'
+
+    def is_symlink(self):
+        attributes = self.get_object_attributes()
+        return attributes is not None and attributes[2] == GIT_FILEMODE_LINK
+
+    def is_metadata_symlink(self):
+        return False
+
+    def file_size(self):
+        return self.oper.object_size(self.get_object_attributes()[0])
+
+    def file_contents(self):
+        return self.oper.object_contents(self.get_object_attributes()[0])
+
+    def get_symlink_target(self):
+        target = self.file_contents().decode('utf-8')
+        return os.path.join(self.htree_prefix, self.oid, os.path.dirname(self.object_path),
+                            target)
+
+    def readdir(self):
+        return [entry[0] for entry in self.readdir_entries()]
+
+    def readdir_entries(self):
+        attributes = self.get_object_attributes()
+        if attributes is None:
+            if self.hash_trees and len(self._prefix_elements()) < 3:
+                return [(name, None, 0, None) for name in self._hex]
+            return []
+        if attributes[1] != 'tree':
+            raise FuseOSError(errno.ENOTDIR)
+        return [(name, TREE_ENTRY_TYPES.get(mode), size, None)
+                for name, mode, size in self.oper.tree_entries(attributes[0])]
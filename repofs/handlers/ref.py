@@ -30,51 +30,38 @@ class RefHandler(HandlerBase):
         self.path = path
         self.oper = oper
         self.no_ref_symlinks = no_ref_symlinks
-        self.refs = self.oper.refs(refs)
-        self.path_data = utils.demux_ref_path(path, self.refs)
+        self.ref_index = self.oper.ref_index(refs)
+        self.refs = self.ref_index.refs
+        self.path_data = utils.demux_ref_path(path, self.ref_index)
         self.types = ['tags', 'heads', 'remotes']
 
     def _is_ref_prefix(self):
-        elements = self.path_data['ref'].split("/")
-        for ref in self.refs:
-            ref = ref.split('/')[1:]
-            if elements == ref[:len(elements)] and len(elements) < len(ref):
-                return True
-        return False
+        return self.ref_index.is_prefix(self.path_data['ref'])
 
     def _get_refs(self):
         """Return the ref elements that match the specified path and
         refs, e.g. refs/heads or refs/tags. """
-        ref_prefix = []
-        if self.path_data['ref']:
-            ref_prefix = self.path_data['ref'].split("/")
-        result = set()
-        # Find common prefix
-        for ref in self.refs:
-            ref = ref.split('/')[1:]
-            if ref_prefix == ref[:len(ref_prefix)]:
-                # Common prefix found
-                if len(ref) > len(ref_prefix):
-                    result.add(ref[len(ref_prefix)])
-
-        return list(result)
+        return self.ref_index.next_elements(self.path_data['ref'])
 
     def _is_full_ref(self):
         """Return true if the specified path (e.g. branches/master, or
         tags/V1.0) refers to one of the specified refs, (e.g.
         refs/heads or refs/tags). """
-        for ref in self.refs:
-            ref = ref.split('/')[1:]
-            # print('Check path [%s] == ref [%s]' % (path, ref))
-            if self.path_data['ref'] == "/".join(ref):
-                return True
-        return False
+        return self.ref_index.is_ref(self.path_data['ref'])
 
     def get_commit(self):
         if self._is_full_ref():
             return self.oper.commit_of_ref(self.path_data['ref'])
         return ""
 
+    def get_commit_path(self):
+        if not self.no_ref_symlinks or not self._is_full_ref():
+            return None
+        return self._tree_path()
+
+    def is_generated(self):
+        return self._is_generated_file()
+
     def is_dir(self):
         if not self.path_data['ref'] or self.path_data['ref'] in self.types:
             return True
@@ -99,17 +86,19 @@ class RefHandler(HandlerBase):
     def file_contents(self):
         commit = self.get_commit()
         if self._is_metadata_file():
-            return self._get_metadata_file(self.path_data['commit'])
+            return self._get_metadata_file(commit)
 
         return self.oper.file_contents(commit, self.path_data['commit_path'])
 
     def file_size(self):
         if self._is_metadata_file():
-            return len(self._get_metadata_file(self.path_data['commit']))
+            return self._get_metadata_file_size(self.get_commit())
 
         return self.oper.file_size(self.get_commit(), self.path_data['commit_path'])
 
     def get_symlink_target(self):
+        if self.is_metadata_symlink():
+            return self.path_data['commit_path'].split("/")[-1]
         return self.get_commit()
 
     def readdir(self):
@@ -132,3 +121,9 @@ class RefHandler(HandlerBase):
             return dirents
         else:
             raise FuseOSError(errno.ENOENT)
+
+    def readdir_entries(self):
+        if (self.path and self.no_ref_symlinks and self._is_full_ref()
+                and not self._is_ref_prefix() and not self._is_metadata_dir()):
+            return self._tree_entries(self.get_commit(), self.path_data['commit_path'])
+        return super().readdir_entries()
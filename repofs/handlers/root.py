@@ -19,7 +19,7 @@ from repofs.handlers.handler_base import HandlerBase
 
 class RootHandler(HandlerBase):
     def readdir(self):
-        return ['commits-by-date', 'commits-by-hash', 'branches', 'tags']
+        return ['commits-by-date', 'commits-by-hash', 'branches', 'tags', 'history', 'objects']
 
     def is_dir(self):
         return True
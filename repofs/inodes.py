@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import re
+
+from repofs.memory import INODE_ENTRY
+
+OID = re.compile(r'^[0-9a-f]{40}$')
+# Inode numbers are kept below 2^63, so that signed stat fields hold them
+INO_BITS = 63
+# Numbers the kernel reserves, or FUSE gives the root of the mount
+RESERVED = 2
+
+
+class Inodes(object):
+    """
+    Inode numbers derived from the names of objects, so that every
+    occurrence of a blob or tree in any commit has the same number and
+    tools that deduplicate hard links read it once.  Objects are named
+    by their id; entries that are not git objects, by a key such as
+    their path, which is hashed.  The numbers handed out are remembered,
+    so that two names whose numbers collide get distinct ones, the
+    later one the next free number.  The names that collided keep their
+    numbers for the life of the mount; the others may be forgotten, as
+    they get the same numbers again when they are next looked up.
+    """
+
+    def __init__(self):
+        # Names given their derived numbers
+        self._keys = {}
+        self._inos = {}
+        # Names that collided, which are never forgotten
+        self._pinned_keys = {}
+        self._pinned_inos = {}
+
+    def nbytes(self):
+        return INODE_ENTRY * (len(self._keys) + len(self._pinned_keys))
+
+    def evict(self, nbytes):
+        """ Forget the names given their derived numbers. """
+        self._keys = {}
+        self._inos = {}
+
+    @staticmethod
+    def derive(key):
+        """ Return the inode number key maps to before collisions. """
+        if not OID.match(key):
+            key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        ino = int(key[:16], 16) & ((1 << INO_BITS) - 1)
+        return max(ino, RESERVED)
+
+    def _holder(self, ino):
+        key = self._pinned_keys.get(ino)
+        return key if key is not None else self._keys.get(ino)
+
+    def _pin(self, key, ino):
+        self._keys.pop(ino, None)
+        self._inos.pop(key, None)
+        self._pinned_keys[ino] = key
+        self._pinned_inos[key] = ino
+
+    def ino(self, key):
+        """ Return the inode number of the object named key. """
+        ino = self._pinned_inos.get(key)
+        if ino is None:
+            ino = self._inos.get(key)
+        if ino is not None:
+            return ino
+        ino = self.derive(key)
+        holder = self._holder(ino)
+        if holder is None:
+            self._keys[ino] = key
+            self._inos[key] = ino
+            return ino
+        self._pin(holder, ino)
+        while self._holder(ino) is not None:
+            ino = ino + 1 if ino + 1 < (1 << INO_BITS) else RESERVED
+        self._pin(key, ino)
+        return ino
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from repofs.gitoper import GitOperations
+
+LOOKUPS = 'lookups'
+REVWALK = 'revwalk'
+SPAWNS = 'spawns'
+
+
+class _CountingRepository(object):
+    """ Forwards to a pygit2 Repository, counting object lookups. """
+
+    def __init__(self, repo, counts):
+        self._repo = repo
+        self._counts = counts
+
+    def __getitem__(self, key):
+        self._counts[LOOKUPS] += 1
+        return self._repo[key]
+
+    def __contains__(self, key):
+        self._counts[LOOKUPS] += 1
+        return key in self._repo
+
+    def get(self, key, default=None):
+        self._counts[LOOKUPS] += 1
+        return self._repo.get(key, default)
+
+    def revparse_single(self, spec):
+        self._counts[LOOKUPS] += 1
+        return self._repo.revparse_single(spec)
+
+    def walk(self, *args):
+        for commit in self._repo.walk(*args):
+            self._counts[REVWALK] += 1
+            yield commit
+
+    def __getattr__(self, name):
+        return getattr(self._repo, name)
+
+
+class InstrumentedGitOperations(GitOperations):
+    """
+    GitOperations counting the work done on the repository: objects
+    looked up through pygit2, commits read while walking the history,
+    and processes spawned, including the git cat-file ones.
+    Used to check that operations do a bounded amount of work whatever
+    the size of the history.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._counts = {LOOKUPS: 0, REVWALK: 0, SPAWNS: 0}
+        super().__init__(*args, **kwargs)
+        self._pygit = _CountingRepository(self._pygit, self._counts)
+
+    def _run(self, command):
+        self._counts[SPAWNS] += 1
+        return super()._run(command)
+
+    def _get_commits_iterator(self, command):
+        for line in super()._get_commits_iterator(command):
+            self._counts[REVWALK] += 1
+            yield line
+
+    def counts(self):
+        """ Return the work done so far as a dict. """
+        counts = dict(self._counts)
+        counts[SPAWNS] += sum(1 + restarts for mode, alive, restarts
+                              in self._catfile.health())
+        return counts
+
+    def work(self, function, *args):
+        """ Call function and return the work it did. """
+        before = self.counts()
+        function(*args)
+        after = self.counts()
+        return dict((k, after[k] - before[k]) for k in after)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import resource
+import threading
+
+from time import time, sleep
+
+# Estimated bytes taken by an entry of each kind of cache, measured with
+# tracemalloc on CPython 3 for typical paths and hashes
+TREE_ENTRY = 250
+SIZE_ENTRY = 100
+ATTRIBUTES_ENTRY = 400
+REF_ENTRY = 200
+REF_INDEX_ENTRY = 300
+COMMAND_ENTRY = 100
+BLOB_ENTRY = 100
+HISTORY_ENTRY = 100
+CHANGES_ENTRY = 200
+LAST_CHANGE_ENTRY = 150
+INODE_ENTRY = 200
+TREE_SIZE_ENTRY = 150
+
+# Seconds without operations after which the caches are shrunk
+IDLE_TIMEOUT = 300
+
+
+def rss():
+    """ Return the resident set size of this process in bytes, or 0
+    where it can't be read. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, ValueError, IndexError):
+        return 0
+
+
+def parse_size(text):
+    """ Return the bytes of a size such as 512M or 2G. """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class _Cache(object):
+    def __init__(self, name, size, evict, idle):
+        self.name = name
+        self.size = size
+        self.evict = evict
+        self.idle = idle
+        self.evictions = 0
+
+
+class MemoryManager(object):
+    """
+    Accounts for the memory taken by the caches of a mount.  Each cache
+    registers a function estimating its size in bytes and one evicting
+    its contents; evict is called with the number of bytes to free and
+    may free fewer or more.  Caches are evicted in the order they were
+    registered, so those cheapest to refill come first.  Eviction is
+    cooperative: it happens when enforce is called, between operations,
+    once the total exceeds the limit.  Caches registered as idle are
+    also emptied when no operation has been served for idle_timeout
+    seconds; the others, such as the commit table, are costly to refill
+    and are only emptied when dropped explicitly.  When they alone
+    exceed the limit, enforce counts the limit as unmet rather than
+    evicting them only to have them refilled by the next operation.
+    """
+
+    def __init__(self, limit=None, idle_timeout=IDLE_TIMEOUT):
+        self.limit = limit
+        self.idle_timeout = idle_timeout
+        self.last_used = time()
+        self.shrinks = 0
+        # Times enforce couldn't bring the caches within the limit
+        self.unmet = 0
+        self._caches = []
+
+    def register(self, name, size, evict, idle=True):
+        self._caches.append(_Cache(name, size, evict, idle))
+
+    def names(self):
+        return [c.name for c in self._caches]
+
+    def drop(self, name):
+        """ Empty the named cache. """
+        for cache in self._caches:
+            if cache.name == name:
+                cache.evict(cache.size())
+                cache.evictions += 1
+                return
+        raise ValueError("no such cache: %s" % name)
+
+    def usage(self):
+        """ Return (cache, bytes) pairs, in eviction order. """
+        return [(c.name, c.size()) for c in self._caches]
+
+    def total(self):
+        return sum(c.size() for c in self._caches)
+
+    def enforce(self):
+        """ Evict caches until their total is within the limit. """
+        if self.limit is None:
+            return
+        excess = self.total() - self.limit
+        for cache in self._caches:
+            if excess <= 0:
+                break
+            size = cache.size()
+            if not size or not cache.idle:
+                continue
+            cache.evict(excess)
+            cache.evictions += 1
+            excess -= size - cache.size()
+        if excess > 0:
+            self.unmet += 1
+
+    def touch(self):
+        """ Called on every operation. """
+        self.last_used = time()
+
+    def is_idle(self):
+        return (self.idle_timeout is not None
+                and time() - self.last_used >= self.idle_timeout)
+
+    def shrink(self):
+        """ Empty the caches registered as idle. """
+        for cache in self._caches:
+            if cache.idle and cache.size():
+                cache.evict(cache.size())
+                cache.evictions += 1
+        self.shrinks += 1
+
+    def start(self, lock):
+        """ Start a thread shrinking the caches, while holding lock,
+        once the mount has been idle for idle_timeout seconds.  The
+        timeout may be changed while the thread runs. """
+        def run():
+            shrunk = False
+            while True:
+                sleep(min(self.idle_timeout or 60, 60))
+                if not self.is_idle():
+                    shrunk = False
+                elif not shrunk:
+                    with lock:
+                        self.shrink()
+                    shrunk = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def text(self):
+        """ Return the breakdown shown in .repofs/memory """
+        lines = []
+        for cache in self._caches:
+            lines.append("%-16s %12d %6d" % (cache.name, cache.size(), cache.evictions))
+        lines.append("%-16s %12d" % ("total", self.total()))
+        lines.append("%-16s %12s" % ("limit", self.limit if self.limit is not None
+                                     else "none"))
+        lines.append("%-16s %12d" % ("rss", rss()))
+        lines.append("%-16s %12d" % ("idle-shrinks", self.shrinks))
+        lines.append("%-16s %12d" % ("limit-unmet", self.unmet))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import mmap
+import os
+import struct
+
+# Signature and version of the pack index files read
+IDX_SIGNATURE = b'\377tOc'
+IDX_VERSION = 2
+
+
+class _Index(object):
+    """ A version 2 pack index file, mapped into memory. """
+
+    def __init__(self, filename, hash_size):
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != IDX_SIGNATURE or \
+                struct.unpack('>I', self._map[4:8])[0] != IDX_VERSION:
+            self._map.close()
+            raise ValueError("unsupported pack index: %s" % filename)
+        self.hash_size = hash_size
+        self.count = struct.unpack('>I', self._map[8 + 255 * 4:8 + 256 * 4])[0]
+        self._oids = 8 + 256 * 4
+        self._offsets = self._oids + self.count * (hash_size + 4)
+        self._large = self._offsets + self.count * 4
+
+    def _fanout(self, byte):
+        if byte < 0:
+            return 0
+        start = 8 + byte * 4
+        return struct.unpack('>I', self._map[start:start + 4])[0]
+
+    def offset(self, raw):
+        """ Return the offset of the object with the raw id in the pack,
+        or None if it is not in it. """
+        lo, hi = self._fanout(raw[0] - 1), self._fanout(raw[0])
+        size = self.hash_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._oids + mid * size
+            found = self._map[start:start + size]
+            if found < raw:
+                lo = mid + 1
+            elif found > raw:
+                hi = mid
+            else:
+                start = self._offsets + mid * 4
+                offset = struct.unpack('>I', self._map[start:start + 4])[0]
+                if offset & 0x80000000:
+                    start = self._large + (offset & 0x7fffffff) * 8
+                    offset = struct.unpack('>Q', self._map[start:start + 8])[0]
+                return offset
+        return None
+
+    def close(self):
+        self._map.close()
+
+
+class PackIndex(object):
+    """
+    Locates objects in the packs of a repository by reading their index
+    files, so that objects can be read in the order they are stored.
+    Only version 2 indexes, the format git has written since 1.5.2,
+    are read; objects in other packs are treated as loose.
+    """
+
+    def __init__(self, gitrepo, hash_size=20):
+        self.hash_size = hash_size
+        self._packs = []
+        packdir = os.path.join(gitrepo, 'objects', 'pack')
+        names = sorted(os.listdir(packdir)) if os.path.isdir(packdir) else []
+        for name in names:
+            if name.endswith('.idx'):
+                try:
+                    self._packs.append(_Index(os.path.join(packdir, name), hash_size))
+                except (ValueError, OSError):
+                    pass
+
+    def __len__(self):
+        return len(self._packs)
+
+    def position(self, raw):
+        """ Return (pack, offset) for the object with the raw id; loose
+        objects come after all packs. """
+        for i, pack in enumerate(self._packs):
+            offset = pack.offset(raw)
+            if offset is not None:
+                return (i, offset)
+        return (len(self._packs), 0)
+
+    def sort(self, oids):
+        """ Return the oids, which have a raw attribute, in pack order. """
+        return sorted(oids, key=lambda oid: self.position(oid.raw))
+
+    def close(self):
+        for pack in self._packs:
+            pack.close()
+        self._packs = []
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import threading
+
+from repofs.gitoper import GitOperError
+from repofs.packs import PackIndex
+
+# Each chunk of a scan holds at most this fraction of the blob cache
+CHUNK_FRACTION = 4
+
+# Chunks prefetched beyond the one being read
+CHUNKS_AHEAD = 1
+
+# A scan is assumed once this many files of a commit are read in a row,
+# from at least SCAN_DIRECTORIES directories
+SCAN_FILES = 6
+SCAN_DIRECTORIES = 3
+
+
+def _under(directory, root):
+    return not root or directory == root or directory.startswith(root + "/")
+
+
+class _Scan(object):
+    """ The blobs of a subtree, split into chunks in the order a
+    recursive reader visits them, each sorted in pack order. """
+
+    def __init__(self, commit, root, chunks):
+        self.commit = commit
+        self.root = root
+        self.chunks = chunks
+        self.chunk_of = dict((oid, i) for i, chunk in enumerate(chunks) for oid in chunk)
+        # The chunk being read and the next one to prefetch
+        self.reader = 0
+        self.next = 0
+
+
+class _Reads(object):
+    """ The files of a commit read in a row outside a scan. """
+
+    def __init__(self, commit, directory):
+        self.commit = commit
+        self.root = directory
+        self.files = 0
+        self.directories = set()
+        self._last = None
+
+    def add(self, path, directory):
+        """ Note that path was read; return true once the reads look
+        like a recursive walk of root. """
+        # A file read in pieces counts once
+        if path != self._last:
+            self._last = path
+            self.files += 1
+        if len(self.directories) < SCAN_DIRECTORIES:
+            self.directories.add(directory)
+        self.root = os.path.commonpath([self.root, directory])
+        return self.files >= SCAN_FILES and len(self.directories) >= SCAN_DIRECTORIES
+
+
+class Prefetcher(object):
+    """
+    Reads ahead the blobs of a subtree being scanned by a recursive
+    reader, such as grep -r.  A scan is assumed once SCAN_FILES files of
+    a commit are read in a row from SCAN_DIRECTORIES directories or more,
+    so that opening a few files doesn't start one; the subtree is the
+    one containing them.  Its blobs are split into chunks in the order the
+    reader visits them, and each chunk is read by a background thread
+    from git cat-file in the order the blobs are stored in the packs,
+    so that their delta bases and pages are read once and in sequence.
+    Only the chunk being read and the next are kept in the blob cache.
+    """
+
+    def __init__(self, git, packs=None):
+        self.git = git
+        self.packs = packs
+        self.enabled = True
+        self.scans = 0
+        self.chunks = 0
+        self.bytes = 0
+        self._reads = None
+        self._pending = None
+        self._scan = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def reading(self, commit, path, oid):
+        """ Note that the blob oid, at path of commit, is being read. """
+        directory = os.path.dirname(path)
+        with self._cond:
+            scan = self._scan
+            if scan is not None and scan.commit == commit and _under(directory, scan.root):
+                chunk = scan.chunk_of.get(oid)
+                if chunk is not None and chunk > scan.reader:
+                    scan.reader = chunk
+                    self._cond.notify()
+                return
+            pending = self._pending
+            if pending is not None and pending[0] == commit and _under(directory, pending[1]):
+                return
+
+            if not self.enabled:
+                return
+            reads = self._reads
+            if reads is None or reads.commit != commit:
+                reads = self._reads = _Reads(commit, directory)
+            if not reads.add(path, directory):
+                return
+            self._reads = None
+            self._pending = (commit, reads.root)
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prefetch",
+                                                daemon=True)
+                self._thread.start()
+
+    def _plan(self, commit, root):
+        """ Return the scan of root in commit. """
+        if self.packs is None:
+            self.packs = PackIndex(self.git._gitrepo)
+        limit = self.git.blob_cache_size // CHUNK_FRACTION
+        chunks = []
+        chunk = []
+        nbytes = 0
+        for oid, size in self.git.commit_blobs(commit, root):
+            if size > limit:
+                continue
+            if nbytes + size > limit:
+                chunks.append(chunk)
+                chunk = []
+                nbytes = 0
+            chunk.append(oid)
+            nbytes += size
+        chunks.append(chunk)
+        return _Scan(commit, root, [self.packs.sort(chunk) for chunk in chunks if chunk])
+
+    def _work(self):
+        scan = self._scan
+        return (self._pending is not None or
+                (scan is not None and scan.next < len(scan.chunks) and
+                 scan.next <= scan.reader + CHUNKS_AHEAD))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._work():
+                    self._cond.wait()
+                if self._closed:
+                    if self.packs is not None:
+                        self.packs.close()
+                    return
+                pending = self._pending
+                if pending is None:
+                    scan = self._scan
+                    chunk = scan.chunks[scan.next]
+                    scan.next += 1
+
+            if pending is not None:
+                try:
+                    scan = self._plan(*pending)
+                except GitOperError:
+                    scan = None
+                except Exception as e:
+                    sys.stderr.write("Error planning prefetch of %s: %s\n" %
+                                     (pending[1] or "/", str(e)))
+                    scan = None
+                with self._cond:
+                    if self._pending == pending:
+                        self._pending = None
+                        self._scan = scan
+                        self.scans += 1
+                continue
+
+            try:
+                nbytes = self.git.prefetch_blobs(chunk)
+            except GitOperError:
+                continue
+            except Exception as e:
+                sys.stderr.write("Error prefetching blobs: %s\n" % str(e))
+                continue
+            with self._cond:
+                self.chunks += 1
+                self.bytes += nbytes
+
+    def status(self):
+        return "%s %d scans, %d chunks, %d bytes" % (
+            "on" if self.enabled else "off", self.scans, self.chunks, self.bytes)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            # Otherwise the thread closes the pack indexes as it exits
+            if self._thread is None and self.packs is not None:
+                self.packs.close()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import cProfile
+import os
+import sys
+import tempfile
+import threading
+
+from collections import deque
+from time import time, perf_counter, sleep
+
+DETERMINISTIC = 'deterministic'
+SAMPLING = 'sampling'
+PROFILE_MODES = [DETERMINISTIC, SAMPLING]
+
+# Seconds of profile data written to each output file
+PROFILE_WINDOW = 60
+# Seconds between stack samples in sampling mode
+SAMPLE_INTERVAL = 0.005
+# Slow operations kept for .repofs/slow-ops
+SLOW_OPS_KEPT = 100
+
+
+class Profiler(object):
+    """
+    Profiles the FUSE operations while enabled.  In deterministic mode
+    cProfile runs around each operation and every window is written as a
+    pstats file; in sampling mode a thread samples the stack of the
+    operation being served and every window is written as collapsed
+    stacks, one "frame;frame;... count" line per distinct stack.
+    When disabled the only cost is a flag test per operation.
+    """
+
+    def __init__(self, outdir=None, mode=DETERMINISTIC, window=PROFILE_WINDOW,
+                 interval=SAMPLE_INTERVAL):
+        self.outdir = outdir
+        self.mode = mode
+        self.window = window
+        self.interval = interval
+        self.enabled = False
+        self.files = []
+        self._profile = None
+        self._samples = {}
+        self._thread_id = None
+        self._window_start = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.enabled:
+            return
+        if self.outdir is None:
+            self.outdir = tempfile.mkdtemp(prefix='repofs-profile-')
+        if not os.path.isdir(self.outdir):
+            os.makedirs(self.outdir)
+
+        self._window_start = time()
+        self.enabled = True
+        if self.mode == DETERMINISTIC:
+            self._profile = cProfile.Profile()
+        else:
+            self._samples = {}
+            sampler = threading.Thread(target=self._sample, daemon=True)
+            sampler.start()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        # An operation being profiled finishes the profile on exit
+        if self._thread_id is None:
+            self._dump()
+
+    def enter(self):
+        """ Called before an operation is served. """
+        self._thread_id = threading.get_ident()
+        if self._profile:
+            self._profile.enable()
+
+    def exit(self):
+        """ Called after an operation is served. """
+        if self._profile:
+            self._profile.disable()
+        self._thread_id = None
+        if not self.enabled or time() - self._window_start >= self.window:
+            self._dump()
+
+    def _sample(self):
+        while self.enabled:
+            thread_id = self._thread_id
+            frame = sys._current_frames().get(thread_id) if thread_id else None
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("%s:%s" % (os.path.basename(code.co_filename),
+                                            code.co_name))
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    self._samples[key] = self._samples.get(key, 0) + 1
+            sleep(self.interval)
+
+    def _dump(self):
+        name = os.path.join(self.outdir, "repofs-%d" % int(self._window_start))
+        if self.mode == DETERMINISTIC:
+            name += ".pstats"
+            self._profile.dump_stats(name)
+            self._profile = cProfile.Profile() if self.enabled else None
+        else:
+            name += ".collapsed"
+            with self._lock:
+                samples, self._samples = self._samples, {}
+            with open(name, "w") as f:
+                for stack, count in sorted(samples.items()):
+                    f.write("%s %d\n" % (stack, count))
+        self.files.append(name)
+        self._window_start = time()
+
+    def status(self):
+        return "%s %s %s\n" % ("on" if self.enabled else "off", self.mode,
+                               self.outdir or "")
+
+    def toggle(self, command):
+        """ Turn the profiler on or off, as written to .repofs/control """
+        command = command.strip()
+        if command == "on":
+            self.start()
+        elif command == "off":
+            self.stop()
+        else:
+            raise ValueError(command)
+
+
+class _Traced(object):
+    """ Forwards attribute accesses to obj, timing its method calls
+    into recorder. """
+
+    def __init__(self, obj, recorder):
+        self._obj = obj
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        recorder = self._recorder
+        owner = type(self._obj).__name__
+        def traced(*args, **kwargs):
+            if recorder.calls is None:
+                return attr(*args, **kwargs)
+            call = [recorder.depth, "%s.%s" % (owner, name), args, 0]
+            recorder.calls.append(call)
+            recorder.depth += 1
+            start = perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                recorder.depth -= 1
+                call[3] = perf_counter() - start
+        return traced
+
+
+class SlowOpLog(object):
+    """
+    Records the operations taking longer than threshold seconds,
+    together with the handler and GitOperations calls they made.
+    Calls are recorded through the proxies returned by wrap.
+    """
+
+    def __init__(self, threshold, logfile=None):
+        self.threshold = threshold
+        self.logfile = logfile
+        self.calls = None
+        self.depth = 0
+        self.recent = deque(maxlen=SLOW_OPS_KEPT)
+
+    def wrap(self, obj):
+        return _Traced(obj, self)
+
+    def begin(self):
+        self.calls = []
+        self.depth = 0
+
+    def end(self, op, path, duration):
+        calls, self.calls = self.calls, None
+        if duration < self.threshold:
+            return
+
+        lines = ["%f %s %s %.6f" % (time(), op, path, duration)]
+        for depth, name, args, call_duration in calls:
+            lines.append("  %s%s%r %.6f" % ("  " * depth, name, args, call_duration))
+        entry = "\n".join(lines) + "\n"
+        self.recent.append(entry)
+        if self.logfile:
+            with open(self.logfile, "a") as f:
+                f.write(entry)
+
+    def text(self):
+        return "".join(self.recent)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+class RefIndex(object):
+    """
+    The refs returned by GitOperations.refs, in the form
+    <commit_hash> refs/<type>/<name>, indexed by the elements of their
+    <type>/<name> paths, so that a path is resolved in time that depends
+    on its length rather than on the number of refs.
+    """
+
+    def __init__(self, refs):
+        self.refs = refs
+        self.names = set()
+        # Path of every proper prefix of a ref -> its next elements
+        self.children = {}
+        for ref in refs:
+            elements = ref.split("/")[1:]
+            self.names.add("/".join(elements))
+            for i in range(len(elements)):
+                self.children.setdefault("/".join(elements[:i]), set()).add(elements[i])
+
+    def full_ref(self, path):
+        """ Return the ref the path starts with, or "" """
+        elements = path.split("/")
+        for i in range(1, len(elements) + 1):
+            name = "/".join(elements[:i])
+            if name in self.names:
+                return name
+            if name not in self.children:
+                break
+        return ""
+
+    def is_prefix(self, name):
+        """ Return True if name is a proper prefix of a ref """
+        return bool(name) and name in self.children
+
+    def is_ref(self, name):
+        return name in self.names
+
+    def next_elements(self, name):
+        """ Return the elements following name in the refs it prefixes """
+        return list(self.children.get(name, ()))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import json
+import os
+import sys
+
+from time import perf_counter, sleep
+from fuse import FuseOSError
+
+from repofs.repofs import RepoFS
+from repofs.trace import read_trace
+
+# Quantiles reported for each operation
+QUANTILES = [('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999)]
+
+
+class _FileInfo(object):
+    """ Stands for the fuse_file_info passed to open. """
+    keep_cache = 0
+    direct_io = 0
+
+
+def _arguments(entry):
+    """ Return the arguments RepoFS is called with for a trace entry,
+    or None for operations that are not replayed. """
+    if entry.op == 'getattr':
+        return (None,)
+    elif entry.op == 'readdir':
+        return (None,)
+    elif entry.op == 'read':
+        return (entry.size, entry.offset, None)
+    elif entry.op == 'open':
+        return (_FileInfo(),)
+    elif entry.op in ('readlink', 'listxattr'):
+        return ()
+    return None
+
+
+def quantile(values, q):
+    """ Return quantile q of the sorted values. """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Replayer(object):
+    """
+    Replays a trace against a RepoFS instance by calling its operations
+    directly, without a kernel or a mount.  With a speed of 0 operations
+    are issued back to back; otherwise the recorded gaps between them
+    are kept, divided by speed.  Operations are replayed in the order
+    recorded, from a single thread, as a mount serves them.
+    """
+
+    def __init__(self, fs, speed=0):
+        self.fs = fs
+        self.speed = speed
+        self.durations = {}
+        self.errors = {}
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    def replay(self, entries):
+        start = perf_counter()
+        for entry in entries:
+            args = _arguments(entry)
+            if args is None:
+                self.skipped += 1
+                continue
+
+            if self.speed:
+                delay = entry.time / self.speed - (perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+
+            op_start = perf_counter()
+            try:
+                self.fs(entry.op, entry.path, *args)
+            except FuseOSError:
+                self.errors[entry.op] = self.errors.get(entry.op, 0) + 1
+            self.durations.setdefault(entry.op, []).append(perf_counter() - op_start)
+        self.elapsed = perf_counter() - start
+
+    def _summary(self, durations, errors):
+        durations = sorted(durations)
+        result = dict(count=len(durations), errors=errors,
+                      total=sum(durations),
+                      max=durations[-1] if durations else 0.0)
+        for name, q in QUANTILES:
+            result[name] = quantile(durations, q)
+        return result
+
+    def report(self):
+        """ Return the throughput and latencies of the replay as a dict. """
+        everything = []
+        for durations in self.durations.values():
+            everything.extend(durations)
+        count = len(everything)
+        result = self._summary(everything, sum(self.errors.values()))
+        result.update(elapsed=self.elapsed, skipped=self.skipped,
+                      ops_per_second=count / self.elapsed if self.elapsed else 0.0)
+        result['ops'] = dict((op, self._summary(durations, self.errors.get(op, 0)))
+                             for op, durations in self.durations.items())
+        return result
+
+
+def format_report(report):
+    """ Return the report as a table, in milliseconds. """
+    header = "%-10s %8s %6s" % ("op", "count", "errors")
+    header += "".join(" %9s" % name for name, q in QUANTILES) + " %9s" % "max"
+    lines = ["%d operations in %.3fs, %.1f ops/s, %d skipped" % (
+        report['count'], report['elapsed'], report['ops_per_second'],
+        report['skipped']), header]
+    rows = sorted(report['ops'].items()) + [("all", report)]
+    for op, summary in rows:
+        line = "%-10s %8d %6d" % (op, summary['count'], summary['errors'])
+        line += "".join(" %9.3f" % (summary[name] * 1000) for name, q in QUANTILES)
+        line += " %9.3f" % (summary['max'] * 1000)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a trace recorded with repofs --trace.")
+    parser.add_argument("trace", help="Trace file to replay.")
+    parser.add_argument("repo", help="Git repository to replay the trace against.")
+    parser.add_argument(
+        "--mount",
+        help="Mount point symbolic links are resolved against (default /mnt).",
+        default="/mnt"
+    )
+    parser.add_argument(
+        "--speed",
+        help="Replay at SPEED times the recorded rate; 0, the default, " \
+            "replays as fast as possible.",
+        type=float,
+        default=0
+    )
+    parser.add_argument("--hash-trees", action="store_true", default=False)
+    parser.add_argument("--no-ref-symlinks", action="store_true", default=False)
+    parser.add_argument("--no-cache", action="store_true", default=False)
+    parser.add_argument(
+        "--json",
+        help="Print the report as JSON.",
+        action="store_true",
+        default=False
+    )
+    args = parser.parse_args()
+
+    fs = RepoFS(os.path.abspath(args.repo), os.path.abspath(args.mount),
+                args.hash_trees, args.no_ref_symlinks, args.no_cache)
+    fs.preload()
+    replayer = Replayer(fs, args.speed)
+    try:
+        replayer.replay(read_trace(args.trace))
+    finally:
+        fs.destroy("/")
+
+    report = replayer.report()
+    if args.json:
+        sys.stdout.write(json.dumps(report, indent=1, sort_keys=True) + "\n")
+    else:
+        sys.stdout.write(format_report(report))
+
+if __name__ == '__main__':
+    main()
@@ -19,20 +19,72 @@ import errno
 import datetime
 import os
 import sys
+import threading
 
-from time import time
+from collections import OrderedDict
+from time import time, perf_counter
 from stat import S_IFDIR, S_IFREG, S_IFLNK, S_IWUSR
 from fuse import FUSE, FuseOSError, Operations, fuse_get_context
 
+from repofs.cache_policy import CachePolicy, CACHE_TIMEOUT
 from repofs.gitoper import GitOperations, GitOperError
+from repofs.stats import Stats
+from repofs.memory import MemoryManager, ATTRIBUTES_ENTRY, IDLE_TIMEOUT
+from repofs.profiler import Profiler
+from repofs.control import Control
+from repofs.prefetch import Prefetcher
+from repofs.git_settings import GitSettings
+from repofs.diffstat import DIFFSTAT_JOBS
+from repofs.inodes import Inodes
+from repofs.handlers.diag import DiagHandler
 from repofs.handlers.ref import RefHandler
+from repofs.handlers.history import HistoryHandler
+from repofs.handlers.objects import ObjectHandler
 from repofs.handlers.commit_hash import CommitHashHandler
 from repofs.handlers.commit_date import CommitDateHandler
 from repofs.handlers.root import RootHandler
 
+# Links reported for files that are git objects, which other commits
+# may share, so that tools deduplicate them as hard links
+OBJECT_NLINK = 2
+
+# Extended attributes of the entries of commits
+XATTR_OID = 'user.git.oid'
+XATTR_TYPE = 'user.git.type'
+XATTR_MODE = 'user.git.mode'
+XATTR_TREE_SIZE = 'user.git.tree_size'
+XATTR_PREFIX = 'user.git.'
+# Reported for attributes an entry does not have
+ENOATTR = getattr(errno, 'ENOATTR', errno.ENODATA)
+
+# Operations between checks of the memory limit
+MEMORY_CHECK_INTERVAL = 100
+
+# Attributes of entries kept for getattr, with or without a memory limit
+ATTRIBUTES_CACHE_SIZE = 100000
+
+# Namespaces operations are accounted under; "/" stands for the root
+NAMESPACES = ['/', 'commits-by-hash', 'commits-by-date', 'branches', 'tags', 'history', 'objects',
+              '.repofs']
+
+
+
+def _object_key(oid, st_type):
+    """ Return the inode key of the object oid shown as st_type; a blob
+    that is the target of symbolic links is a different file. """
+    return "link:" + oid if st_type == S_IFLNK else oid
+
+
+def _is_object_key(key):
+    return key is not None and not key.startswith("/")
 
 class RepoFS(Operations):
-    def __init__(self, repo, mount, hash_trees, no_ref_symlinks, no_cache):
+    def __init__(self, repo, mount, hash_trees, no_ref_symlinks, no_cache,
+                 ref_ttl=None, cache_timeout=CACHE_TIMEOUT, profiler=None,
+                 slow_ops=None, trace=None, memory_limit=None,
+                 idle_timeout=IDLE_TIMEOUT, prefetch=True, git_settings=None,
+                 cache_dir=None, diffstat_jobs=DIFFSTAT_JOBS, file_mtimes=False,
+                 profile=False):
         self.repo = repo
         self.repo_mode = os.stat(repo).st_mode
         self.no_ref_symlinks = no_ref_symlinks
@@ -40,9 +92,61 @@ class RepoFS(Operations):
         self.mnt_mode = self.repo_mode & ~S_IWUSR & ~S_IFDIR
         self.mount = mount
         self.hash_trees = hash_trees
-        self._git = GitOperations(repo, no_cache)
+        # Give entries the time of the last commit that changed them,
+        # which walks the history on the first lookup in a directory
+        self.file_mtimes = file_mtimes
+        self.stats = Stats()
+        self.profiler = profiler or Profiler()
+        # Profile from the start of the mount
+        self.profile = profile
+        self.slow_ops = slow_ops
+        self.trace = trace
+        # Attributes of entries already seen through readdir, least
+        # recently used first
+        self._stats = OrderedDict()
+        self.attributes_cache_size = ATTRIBUTES_CACHE_SIZE
+        self.memory = MemoryManager(memory_limit, idle_timeout)
+        self.memory.register('attributes', lambda: len(self._stats) * ATTRIBUTES_ENTRY,
+                             self._evict_stats)
+        self._ops = 0
+        # Held while an operation is served or the caches are shrunk
+        self._lock = threading.Lock()
+        self.git_settings = git_settings or GitSettings()
+        self.git_settings.apply(os.path.join(repo, '.git'), memory_limit)
+        self.stats.add_gauges(self.git_settings.gauges)
+        self._git = GitOperations(repo, no_cache, self.stats, self.memory, cache_dir,
+                                  diffstat_jobs)
+        self.inodes = Inodes()
+        self.memory.register('inodes', self.inodes.nbytes, self.inodes.evict)
+        self.prefetcher = None
+        if prefetch and self._git.cache:
+            self.prefetcher = self._git.prefetcher = Prefetcher(self._git)
+        if slow_ops:
+            self._git = slow_ops.wrap(self._git)
         self._branch_refs = ['refs/heads/', 'refs/remotes/']
         self._tag_refs = ['refs/tags']
+        self.policy = CachePolicy(hash_trees, ref_ttl, cache_timeout, not no_cache)
+        self.control = Control(self)
+
+    def _evict_stats(self, nbytes):
+        self._stats = OrderedDict()
+
+    def _keep_stat(self, path, st):
+        self._stats[path] = st
+        self._stats.move_to_end(path)
+        while len(self._stats) > self.attributes_cache_size:
+            self._stats.popitem(last=False)
+
+    def init(self, path):
+        """ Called by FUSE once the mount is served, after it has forked
+        into the background, so that threads are started here. """
+        self.memory.start(self._lock)
+        if self.profile:
+            self.profiler.start()
+
+    def preload(self):
+        """ Load the metadata of all commits before serving requests. """
+        self._git.commit_table()
 
     def _hash_updir(self, c):
         if not self.hash_trees:
@@ -71,18 +175,59 @@ class RepoFS(Operations):
             return os.path.join(self.mount, "commits-by-hash", handler.get_symlink_target())
         elif path.startswith("/branches/") or path.startswith("/tags/"):
             return self._format_to_link(handler.get_commit())
+        elif path.startswith("/history/"):
+            return self._format_to_link(handler.get_symlink_target())
+        elif path.startswith("/objects/"):
+            return os.path.join(self.mount, "objects", handler.get_symlink_target())
         else:
             raise FuseOSError(errno.ENOENT)
 
+    def _check_refs(self):
+        """ Re-read refs once their TTL has expired. """
+        if self.policy.refs_expired():
+            self.refresh_refs()
+
+    def refresh_refs(self):
+        """ Re-read refs and forget the attributes seen under the ref
+        namespaces. """
+        self._git.refresh_refs()
+        for path in list(self._stats):
+            if self.policy.is_ref_path(path):
+                del self._stats[path]
+        self.policy.refreshed()
+
     def get_commit_time(self, commit):
         return self._git.get_commit_time(commit)
 
     def get_author_time(self, commit):
         return self._git.get_author_time(commit)
 
+    def _diag_files(self):
+        return {
+            'stats': self.stats.to_text,
+            'stats.json': self.stats.to_json,
+            'profile': self.profiler.status,
+            'slow-ops': self.slow_ops.text if self.slow_ops else (lambda: ""),
+            'memory': self.memory.text,
+            'control': self.control.status,
+        }
+
+    def _diag_writers(self):
+        return {
+            'control': self.control.write,
+        }
+
     def _get_handler(self, path):
+        handler = self._make_handler(path)
+        if self.slow_ops:
+            return self.slow_ops.wrap(handler)
+        return handler
+
+    def _make_handler(self, path):
         if path == "/":
             return RootHandler()
+        elif path == "/.repofs" or path.startswith("/.repofs/"):
+            return DiagHandler(path[9:], self._diag_files(), self._diag_writers())
         elif path.startswith("/commits-by-hash"):
             return CommitHashHandler(path[17:], self._git, self.hash_trees)
         elif path.startswith("/commits-by-date"):
@@ -91,52 +236,279 @@ class RepoFS(Operations):
             return RefHandler(path[10:], self._git, self._branch_refs, self.no_ref_symlinks)
         elif path.startswith("/tags"):
             return RefHandler(path[1:], self._git, self._tag_refs, self.no_ref_symlinks)
+        elif path == "/history" or path.startswith("/history/"):
+            return HistoryHandler(path[9:], self._git, self._branch_refs + self._tag_refs)
+        elif path == "/objects" or path.startswith("/objects/"):
+            return ObjectHandler(path[9:], self._git, self.hash_trees)
         else:
             raise FuseOSError(errno.ENOENT)
 
+    def _make_stat(self, st_type, size, times=None, key=None):
+        """ Return the attributes of an entry of the specified type and
+        size; times is the (commit time, author time) pair of the commit
+        the entry belongs to and key the name its inode is derived from. """
+        st = dict(st_mode=(st_type | self.mnt_mode))
+        if st_type == S_IFDIR:
+            # The number of subdirectories is not known
+            st['st_nlink'] = 1
+        else:
+            st['st_nlink'] = OBJECT_NLINK if _is_object_key(key) else 1
+            st['st_size'] = size
+        if key is not None:
+            st['st_ino'] = self.inodes.ino(key)
+
+        t = time()
+        st['st_atime'] = st['st_ctime'] = st['st_mtime'] = t
+
+        commit_time, author_time = times or (-1, -1)
+        if commit_time != -1:
+            st['st_mtime'] = commit_time
+
+        if author_time != -1:
+            st['st_ctime'] = author_time
+
+        return st
+
+    def __call__(self, op, path, *args):
+        """ Serve a FUSE operation, keeping the caches within the
+        memory limit. """
+        with self._lock:
+            self.memory.touch()
+            try:
+                return self._dispatch(op, path, *args)
+            finally:
+                self._ops += 1
+                if self._ops % MEMORY_CHECK_INTERVAL == 0:
+                    self.memory.enforce()
+
+    def _dispatch(self, op, path, *args):
+        """ Dispatch a FUSE operation, accounting for its latency and
+        profiling and tracing it when asked to. """
+        if self.trace:
+            self.trace.record_call(op, path, args)
+        profiling = self.profiler.enabled
+        if profiling:
+            self.profiler.enter()
+        if self.slow_ops:
+            self.slow_ops.begin()
+        start = perf_counter()
+        error = True
+        try:
+            result = super().__call__(op, path, *args)
+            if op == 'readdir':
+                result = list(result)
+            error = False
+            return result
+        finally:
+            duration = perf_counter() - start
+            if profiling:
+                self.profiler.exit()
+            if self.slow_ops:
+                self.slow_ops.end(op, path, duration)
+            namespace = (path or "/").split("/")[1] or "/"
+            if namespace not in NAMESPACES:
+                namespace = "other"
+            self.stats.record_op(op, namespace, duration, error)
+
     def getattr(self, path, fh=None):
+        self._check_refs()
         uid, gid, pid = fuse_get_context()
-        st = dict(st_uid=uid, st_gid=gid)
+        if path in self._stats:
+            self.stats.cache_hit('attributes')
+            self._stats.move_to_end(path)
+            return dict(self._stats[path], st_uid=uid, st_gid=gid, st_atime=time())
+        self.stats.cache_miss('attributes')
+
         handler = self._get_handler(path)
         try:
             if handler.is_dir():
-                st['st_mode'] = (S_IFDIR | self.mnt_mode)
-                st['st_nlink'] = 2
+                st_type, size = S_IFDIR, 0
             elif handler.is_symlink():
-                st['st_mode'] = (S_IFLNK | self.mnt_mode)
-                st['st_nlink'] = 1
-                st['st_size'] = len(self._target_from_symlink(path))
+                st_type, size = S_IFLNK, len(self._target_from_symlink(path))
             else:
-                st['st_mode'] = (S_IFREG | self.mnt_mode)
-                st['st_size'] = handler.file_size()
+                st_type, size = S_IFREG, handler.file_size()
         except GitOperError:
             raise FuseOSError(errno.ENOENT)
 
-        t = time()
-        st['st_atime'] = st['st_ctime'] = st['st_mtime'] = t
-
-        commit_time = -1
-        author_time = -1
+        times = None
         if handler and hasattr(handler, "get_commit") and handler.get_commit():
-            author_time = self.get_author_time(handler.get_commit())
-            commit_time = self.get_commit_time(handler.get_commit())
+            commit = handler.get_commit()
+            times = (self.get_commit_time(self._last_change(handler, commit)),
+                     self.get_author_time(commit))
 
-        if commit_time != -1:
-            st['st_mtime'] = commit_time
+        st = self._make_stat(st_type, size, times, self._inode_key(handler, path, st_type))
+        if self._is_writable(handler):
+            st['st_mode'] |= S_IWUSR
+        st['st_uid'] = uid
+        st['st_gid'] = gid
+        return st
 
-        if author_time != -1:
-            st['st_ctime'] = author_time
+    def _last_changes(self, handler):
+        """ Return the last commits that changed the entries of the
+        directory of the handler, or {} if it is not in a tree. """
+        if not self.file_mtimes or not hasattr(handler, "get_commit_path"):
+            return {}
+        path = handler.get_commit_path()
+        if path is None:
+            return {}
+        try:
+            return self._git.last_changes(handler.get_commit(), path)
+        except (GitOperError, KeyError, ValueError):
+            return {}
 
-        return st
+    def _last_change(self, handler, commit):
+        """ Return the last commit that changed the entry of the
+        handler's path, or commit if it is not in a tree. """
+        if not self.file_mtimes or not hasattr(handler, "get_commit_path"):
+            return commit
+        path = handler.get_commit_path()
+        if not path:
+            return commit
+        parent, _, name = path.rpartition("/")
+        try:
+            return self._git.last_changes(commit, parent).get(name, commit)
+        except (GitOperError, KeyError, ValueError):
+            return commit
+
+    def _inode_key(self, handler, path, st_type):
+        """ Return the name the inode of the handler's path is derived
+        from: the commit for its root directory, the object for an entry
+        of its tree or the object it names, and the path for anything
+        else. """
+        attributes = handler.get_object_attributes()
+        if attributes is not None:
+            return _object_key(attributes[0], st_type)
+        commit_path = handler.get_commit_path()
+        if commit_path is None:
+            return path
+        commit = handler.get_commit()
+        if not commit_path:
+            return commit
+        try:
+            return _object_key(self._git.entry_id(commit, commit_path), st_type)
+        except GitOperError:
+            return path
+
+    def _entry_ids(self, handler):
+        """ Return the ids of the entries of the directory of the
+        handler, or {} if it is not in a tree. """
+        attributes = handler.get_object_attributes()
+        if attributes is not None:
+            return self._git.tree_entry_ids(attributes[0])
+        path = handler.get_commit_path()
+        if path is None:
+            return {}
+        try:
+            return self._git.entry_ids(handler.get_commit(), path)
+        except (GitOperError, KeyError, ValueError):
+            return {}
+
+    def entry_stats(self, path):
+        """ Return (name, attributes) for each entry of directory path,
+        remembering the attributes for getattr.  The attributes are None
+        for entries whose attributes can't be computed in bulk. """
+        handler = self._get_handler(path)
+        entries = handler.readdir_entries()
+        typed = [e for e in entries if e[1] is not None]
+        commits = [e[3] for e in typed if e[3]]
+        changes = self._last_changes(handler) if commits else {}
+        times = self._git.commit_times(commits + list(changes.values())) if commits else {}
+        ids = self._entry_ids(handler) if typed else {}
+
+        result = []
+        for name, st_type, size, commit in entries:
+            st = None
+            if st_type is not None:
+                entry_times = times.get(commit)
+                if name in changes:
+                    # Modified when the entry was last changed
+                    entry_times = (times[changes[name]][0], entry_times[1])
+                if name in ids:
+                    key = _object_key(ids[name], st_type)
+                elif st_type == S_IFDIR and name == commit:
+                    key = commit
+                else:
+                    key = os.path.join(path, name)
+                st = self._make_stat(st_type, size, entry_times, key)
+                if self._git.cache:
+                    self._keep_stat(os.path.join(path, name), st)
+            result.append((name, st))
+        return result
 
     def readdir(self, path, fh):
-        dirents = ['.', '..']
+        self._check_refs()
+        entries = self.entry_stats(path)
+        uid, gid, pid = fuse_get_context()
+
+        yield '.'
+        yield '..'
+        for name, st in entries:
+            if st is None:
+                yield name
+            else:
+                yield (name, dict(st, st_uid=uid, st_gid=gid), 0)
+
+    def _object_attributes(self, path):
+        """ Return the id, type and filemode of the object path refers
+        to, or None if it is not an entry of a commit or an object. """
         handler = self._get_handler(path)
-        dirents.extend(handler.readdir())
+        attributes = handler.get_object_attributes()
+        if attributes is not None:
+            return attributes
+        commit_path = handler.get_commit_path()
+        if commit_path is None:
+            return None
+        try:
+            return self._git.object_attributes(handler.get_commit(), commit_path)
+        except GitOperError:
+            raise FuseOSError(errno.ENOENT)
 
-        for r in dirents:
-            yield r
+    @staticmethod
+    def _xattr_names(attributes):
+        if attributes is None:
+            return []
+        oid, obj_type, mode = attributes
+        names = [XATTR_OID, XATTR_TYPE]
+        if mode is not None:
+            names.append(XATTR_MODE)
+        if obj_type in ('tree', 'commit'):
+            names.append(XATTR_TREE_SIZE)
+        return names
 
+    def listxattr(self, path):
+        self._check_refs()
+        return self._xattr_names(self._object_attributes(path))
+
+    def getxattr(self, path, name, position=0):
+        # Tools such as ls probe for security and ACL attributes
+        if not name.startswith(XATTR_PREFIX):
+            raise FuseOSError(ENOATTR)
+        self._check_refs()
+        attributes = self._object_attributes(path)
+        if name not in self._xattr_names(attributes):
+            raise FuseOSError(ENOATTR)
+        oid, obj_type, mode = attributes
+        if name == XATTR_OID:
+            value = oid
+        elif name == XATTR_TYPE:
+            value = obj_type
+        elif name == XATTR_MODE:
+            value = "%06o" % mode
+        else:
+            try:
+                value = str(self._git.tree_size(oid))
+            except GitOperError:
+                raise FuseOSError(errno.EIO)
+        return value.encode('utf-8')
+
+    def open(self, path, fi):
+        """ Called with the raw fuse_file_info, so that the kernel can be
+        told to keep the pages of immutable files across opens. """
+        fi.keep_cache = self.policy.keep_cache(path)
+        # Diagnostic files and diffstats are generated when read; their
+        # size isn't known
+        fi.direct_io = self._get_handler(path).is_generated()
+        return 0
 
     def read(self, path, size, offset, fh):
         handler = self._get_handler(path)
@@ -147,10 +519,36 @@ class RepoFS(Operations):
 
         return contents[offset:offset + size]
 
+    def _is_writable(self, handler):
+        return hasattr(handler, "is_writable") and handler.is_writable()
+
+    def write(self, path, data, offset, fh):
+        handler = self._get_handler(path)
+        if not self._is_writable(handler):
+            raise FuseOSError(errno.EROFS)
+        try:
+            handler.write(data.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            raise FuseOSError(errno.EINVAL)
+        return len(data)
+
+    def truncate(self, path, length, fh=None):
+        # Writable files take each write as a whole command
+        if not self._is_writable(self._get_handler(path)):
+            raise FuseOSError(errno.EROFS)
+        return 0
+
     def readlink(self, path):
+        self._check_refs()
         return self._target_from_symlink(path)
 
 
+    def destroy(self, path):
+        self.profiler.stop()
+        if self.trace:
+            self.trace.close()
+        self._git.close()
+
     statfs=None
 
     access=None
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import threading
+
+from time import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+           0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # The last count holds the values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ Return (upper bound, count) pairs, counting all values up to
+        each bound, the last bound being infinite. """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """ Return the upper bound of the bucket holding quantile q. """
+        if not self.count:
+            return 0.0
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float('inf')
+
+
+class Stats(object):
+    """
+    Counters and latency histograms of the FUSE operations served, per
+    operation and namespace, of the git commands run, and of the hits
+    and misses of the caches.
+    """
+
+    def __init__(self):
+        self.started = time()
+        self._ops = {}
+        self._errors = {}
+        self._commands = {}
+        self._caches = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def record_op(self, op, namespace, duration, error=False):
+        with self._lock:
+            key = (op, namespace)
+            if key not in self._ops:
+                self._ops[key] = Histogram()
+                self._errors[key] = 0
+            self._ops[key].add(duration)
+            if error:
+                self._errors[key] += 1
+
+    def record_command(self, command, duration):
+        with self._lock:
+            if command not in self._commands:
+                self._commands[command] = Histogram()
+            self._commands[command].add(duration)
+
+    def _cache(self, cache):
+        if cache not in self._caches:
+            self._caches[cache] = [0, 0]
+        return self._caches[cache]
+
+    def cache_hit(self, cache):
+        with self._lock:
+            self._cache(cache)[0] += 1
+
+    def cache_miss(self, cache):
+        with self._lock:
+            self._cache(cache)[1] += 1
+
+    def add_gauges(self, gauges):
+        """ Report the values of the dict the function gauges returns. """
+        self._gauges.append(gauges)
+
+    def op_count(self, op, namespace=None):
+        with self._lock:
+            return sum(h.count for (o, ns), h in self._ops.items()
+                       if o == op and namespace in (None, ns))
+
+    def command_count(self, command=None):
+        with self._lock:
+            return sum(h.count for c, h in self._commands.items()
+                       if command in (None, c))
+
+    def snapshot(self):
+        """ Return all counters as a dict suitable for JSON. """
+        def histogram(h):
+            return {
+                'count': h.count,
+                'sum': h.sum,
+                'p50': h.quantile(0.5),
+                'p99': h.quantile(0.99),
+                'buckets': [[b if b != float('inf') else '+Inf', c]
+                            for b, c in h.cumulative()],
+            }
+
+        with self._lock:
+            ops = []
+            for (op, namespace), h in sorted(self._ops.items()):
+                entry = dict(op=op, namespace=namespace,
+                             errors=self._errors[(op, namespace)])
+                entry.update(histogram(h))
+                ops.append(entry)
+            commands = []
+            for command, h in sorted(self._commands.items()):
+                entry = dict(command=command)
+                entry.update(histogram(h))
+                commands.append(entry)
+            caches = []
+            for cache, (hits, misses) in sorted(self._caches.items()):
+                total = hits + misses
+                caches.append(dict(cache=cache, hits=hits, misses=misses,
+                                   hit_ratio=float(hits) / total if total else 0.0))
+        gauges = {}
+        for function in self._gauges:
+            gauges.update(function())
+        return dict(uptime=time() - self.started, ops=ops,
+                    commands=commands, caches=caches, gauges=gauges)
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=1, sort_keys=True) + "\n"
+
+    def to_text(self):
+        """ Return all counters in the Prometheus text exposition format. """
+        snap = self.snapshot()
+        lines = ['repofs_uptime_seconds %f' % snap['uptime']]
+        for e in snap['ops']:
+            labels = 'op="%s",namespace="%s"' % (e['op'], e['namespace'])
+            lines.append('repofs_op_errors_total{%s} %d' % (labels, e['errors']))
+            lines.extend(self._histogram_lines('repofs_op_duration_seconds', labels, e))
+        for e in snap['commands']:
+            labels = 'command="%s"' % e['command']
+            lines.extend(self._histogram_lines('repofs_git_command_duration_seconds',
+                                               labels, e))
+        for e in snap['caches']:
+            labels = 'cache="%s"' % e['cache']
+            lines.append('repofs_cache_hits_total{%s} %d' % (labels, e['hits']))
+            lines.append('repofs_cache_misses_total{%s} %d' % (labels, e['misses']))
+        for name, value in sorted(snap['gauges'].items()):
+            lines.append('repofs_%s %d' % (name, value))
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, name, labels, entry):
+        lines = []
+        for bound, count in entry['buckets']:
+            lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+        lines.append('%s_sum{%s} %f' % (name, labels, entry['sum']))
+        lines.append('%s_count{%s} %d' % (name, labels, entry['count']))
+        return lines
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from repofs.cache_policy import CachePolicy, CACHE_TIMEOUT
+
+COMMIT = "dfe437bdebebc3622d41956323785d23e7042ced"
+
+class CachePolicyTest(TestCase):
+    def test_is_immutable(self):
+        policy = CachePolicy(False)
+        self.assertTrue(policy.is_immutable("/commits-by-hash/" + COMMIT))
+        self.assertTrue(policy.is_immutable("/commits-by-hash/" + COMMIT + "/dir_a/file_aa"))
+        self.assertTrue(policy.is_immutable("/commits-by-date/2005/06/07/" + COMMIT + "/file_a"))
+        self.assertFalse(policy.is_immutable("/"))
+        self.assertFalse(policy.is_immutable("/commits-by-hash"))
+        self.assertFalse(policy.is_immutable("/commits-by-date/2005/06/07"))
+        self.assertFalse(policy.is_immutable("/branches/heads/master/file_a"))
+        self.assertFalse(policy.is_immutable("/tags/t20050607"))
+        self.assertTrue(policy.is_immutable("/objects/" + COMMIT))
+        self.assertFalse(policy.is_immutable("/objects"))
+
+        policy = CachePolicy(True)
+        self.assertFalse(policy.is_immutable("/commits-by-hash/df/e4/37"))
+        self.assertTrue(policy.is_immutable("/commits-by-hash/df/e4/37/" + COMMIT))
+        self.assertTrue(policy.is_immutable("/objects/df/e4/37/" + COMMIT))
+        self.assertFalse(policy.is_immutable("/objects/df/e4"))
+
+    def test_is_ref_path(self):
+        policy = CachePolicy(False)
+        self.assertTrue(policy.is_ref_path("/branches"))
+        self.assertTrue(policy.is_ref_path("/branches/heads/master"))
+        self.assertTrue(policy.is_ref_path("/tags/t20050607"))
+        self.assertTrue(policy.is_ref_path("/history/heads/master/file_a"))
+        self.assertFalse(policy.is_ref_path("/tagsfoo"))
+        self.assertFalse(policy.is_ref_path("/commits-by-hash/" + COMMIT))
+
+    def test_keep_cache(self):
+        policy = CachePolicy(False)
+        self.assertTrue(policy.keep_cache("/commits-by-hash/" + COMMIT + "/file_a"))
+        self.assertFalse(policy.keep_cache("/branches/heads/master/file_a"))
+
+    def test_refs_expired(self):
+        self.assertFalse(CachePolicy(False).refs_expired())
+        policy = CachePolicy(False, ref_ttl=0)
+        self.assertTrue(policy.refs_expired())
+        policy = CachePolicy(False, ref_ttl=60)
+        self.assertFalse(policy.refs_expired())
+
+    def test_fuse_options(self):
+        self.assertEqual(CachePolicy(False).fuse_options(),
+                dict(entry_timeout=CACHE_TIMEOUT, attr_timeout=CACHE_TIMEOUT))
+        self.assertEqual(CachePolicy(False, ref_ttl=2).fuse_options(),
+                dict(entry_timeout=2, attr_timeout=2))
+        self.assertEqual(CachePolicy(False, cache=False).fuse_options(), {})
+
+if __name__ == "__main__":
+    main()
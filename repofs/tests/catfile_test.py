@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from repofs.catfile import CatFile, CatFilePool, CatFileError, BATCH, \
+        BATCH_CHECK, BATCH_SIZE, BATCH_BYTES
+
+# Contents of file_a and the empty blob in test_repo
+FILE_A = "dfe437bdebebc3622d41956323785d23e7042ced"
+EMPTY = "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+MISSING = "0123456789012345678901234567890123456789"
+
+class CatFileTest(TestCase):
+    def setUp(self):
+        self.catfile = CatFile('test_repo/.git')
+
+    def tearDown(self):
+        self.catfile.close()
+
+    def test_headers(self):
+        self.assertEqual(self.catfile.headers([FILE_A, EMPTY, MISSING]),
+                [("blob", 9), ("blob", 0), None])
+
+    def test_sizes(self):
+        self.assertEqual(self.catfile.sizes([FILE_A, MISSING]), [9, None])
+        self.assertEqual(self.catfile.sizes([]), [])
+
+    def test_large_batch(self):
+        oids = [FILE_A, MISSING] * BATCH_SIZE
+        self.assertEqual(self.catfile.sizes(oids), [9, None] * BATCH_SIZE)
+
+    def test_long_names(self):
+        # Names long enough to fill the pipes unless batched by bytes
+        names = ["master:" + "x" * 1000, FILE_A] * BATCH_SIZE
+        self.assertEqual(self.catfile.sizes(names), [None, 9] * BATCH_SIZE)
+        for batch in CatFile._batches(names):
+            self.assertLessEqual(sum(len(line) for line in batch), BATCH_BYTES)
+
+    def test_missing_path_with_spaces(self):
+        self.assertEqual(self.catfile.sizes(["master:no file", "master:no such file 12", FILE_A]),
+                         [None, None, 9])
+
+    def test_contents(self):
+        catfile = CatFile('test_repo/.git', BATCH)
+        self.assertEqual(catfile.query([FILE_A, MISSING, "master:file_r"]),
+                [("blob", 9, b"Contents\n"), None, ("blob", 8, b"phantom\n")])
+        catfile.close()
+
+    def test_restart(self):
+        self.assertEqual(self.catfile.sizes([FILE_A]), [9])
+        self.assertTrue(self.catfile.is_alive())
+        self.catfile._proc.kill()
+        self.catfile._proc.wait()
+        self.assertFalse(self.catfile.is_alive())
+        self.assertEqual(self.catfile.sizes([FILE_A]), [9])
+        self.assertEqual(self.catfile.restarts, 1)
+
+    def test_failure(self):
+        catfile = CatFile('no_such_repo/.git')
+        with self.assertRaises(CatFileError):
+            catfile.sizes([FILE_A])
+        catfile.close()
+
+class CatFilePoolTest(TestCase):
+    def setUp(self):
+        self.pool = CatFilePool('test_repo/.git', size=1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_queries(self):
+        self.assertEqual(self.pool.headers([FILE_A]), [("blob", 9)])
+        self.assertEqual(self.pool.sizes([EMPTY, MISSING]), [0, None])
+        self.assertEqual(self.pool.contents([FILE_A, MISSING]), [b"Contents\n", None])
+
+    def test_reuse(self):
+        self.pool.sizes([FILE_A])
+        self.pool.sizes([FILE_A])
+        self.pool.contents([FILE_A])
+        self.assertEqual(sorted(self.pool.health()),
+                [(BATCH, True, 0), (BATCH_CHECK, True, 0)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+
+from subprocess import check_call, check_output
+from unittest import TestCase, main
+from pygit2 import Repository
+
+from repofs.commit_graph import CommitGraph, murmur3
+from repofs.gitoper import GitOperations
+
+
+def git(gitrepo, *args):
+    return check_output(['git', '--git-dir', gitrepo, '-c', 'user.name=a',
+                         '-c', 'user.email=a@example.com'] + list(args)).decode('utf-8').strip()
+
+
+class CommitGraphTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.workdir = os.path.join(self.tmpdir, 'repo')
+        self.gitrepo = os.path.join(self.workdir, '.git')
+        check_call(['git', 'clone', '-q', '--no-local', 'test_repo', self.workdir])
+        self.repo = Repository(self.gitrepo)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, graph):
+        """ Compare every commit of graph with its object. """
+        for pos in range(len(graph)):
+            commit = self.repo[graph.hex(pos)]
+            self.assertEqual(graph.index(graph.hex(pos)), pos)
+            self.assertEqual([graph.hex(p) for p in graph.parents(pos)],
+                             [str(p) for p in commit.parent_ids])
+            self.assertEqual(graph.commit_time(pos), commit.commit_time)
+            for p in graph.parents(pos):
+                self.assertGreater(graph.generation(pos), graph.generation(p))
+                self.assertTrue(graph.is_ancestor(p, pos))
+                self.assertFalse(graph.is_ancestor(pos, p))
+
+    def test_missing(self):
+        graph = CommitGraph(self.gitrepo)
+        self.assertEqual(len(graph), 0)
+        self.assertEqual(graph.index(git(self.gitrepo, 'rev-parse', 'master')), -1)
+
+    def test_graph(self):
+        git(self.gitrepo, 'commit-graph', 'write', '--reachable')
+        graph = CommitGraph(self.gitrepo)
+        self.assertEqual(len(graph), int(git(self.gitrepo, 'rev-list', '--all', '--count')))
+        self.check(graph)
+        master = graph.index(git(self.gitrepo, 'rev-parse', 'master'))
+        root = graph.index(git(self.gitrepo, 'rev-list', '--max-parents=0', 'master'))
+        self.assertEqual(graph.generation(root), 1)
+        self.assertTrue(graph.is_ancestor(root, master))
+        self.assertFalse(graph.is_ancestor(master, root))
+        self.assertTrue(graph.is_ancestor(master, master))
+        self.assertEqual(graph.index('0' * 40), -1)
+        self.assertEqual(graph.index('not a hash'), -1)
+        graph.close()
+
+    def test_chain(self):
+        git(self.gitrepo, 'commit-graph', 'write', '--reachable', '--split')
+        parents = []
+        for branch in ('master', 'master~1', 'master~2'):
+            parents += ['-p', branch]
+        octopus = git(self.gitrepo, 'commit-tree', 'master^{tree}', '-m', 'octopus', *parents)
+        git(self.gitrepo, 'update-ref', 'refs/heads/octopus', octopus)
+        git(self.gitrepo, 'commit-graph', 'write', '--reachable', '--split=no-merge')
+
+        graph = CommitGraph(self.gitrepo)
+        self.assertEqual(len(graph.layers), 2)
+        self.check(graph)
+        pos = graph.index(octopus)
+        self.assertGreaterEqual(pos, graph.layers[1].base)
+        self.assertEqual([graph.hex(p) for p in graph.parents(pos)],
+                         [git(self.gitrepo, 'rev-parse', b)
+                          for b in ('master', 'master~1', 'master~2')])
+
+    def test_murmur3(self):
+        self.assertEqual(murmur3(0, b''), 0)
+        self.assertEqual(murmur3(0, b'Hello world!'), 0x627b0c2c)
+        self.assertEqual(murmur3(0, b'\x99\xaa\xbb\xcc\xdd\xee\xff', 2), 0xa183ccfd)
+        self.assertEqual(murmur3(0, b'The quick brown fox jumps over the lazy dog'),
+                         0x2e4ff723)
+
+    def test_changed_paths(self):
+        git(self.gitrepo, 'commit-graph', 'write', '--reachable')
+        graph = CommitGraph(self.gitrepo)
+        self.assertIsNone(graph.path_keys('file_a'))
+        graph.close()
+
+        git(self.gitrepo, 'commit-graph', 'write', '--reachable', '--changed-paths')
+        graph = CommitGraph(self.gitrepo)
+        self.assertEqual(graph.bloom_settings[1:], (7, 10))
+        paths = git(self.gitrepo, 'ls-tree', '-r', '-t', '--name-only', 'master').split()
+        skipped = 0
+        for pos in range(len(graph)):
+            commit = graph.hex(pos)
+            self.assertEqual(graph.tree(pos), git(self.gitrepo, 'rev-parse', commit + '^{tree}'))
+            changed = git(self.gitrepo, 'diff-tree', '-r', '-t', '--root', '--name-only',
+                          '--no-commit-id', commit).split()
+            for path in paths + ['file_z', 'dir_a/file_z']:
+                if not graph.changed(pos, graph.path_keys(path)):
+                    self.assertNotIn(path, changed)
+                    skipped += 1
+        self.assertGreater(skipped, 0)
+        graph.close()
+
+    def test_path_history(self):
+        def work(*args):
+            check_call(['git', '-C', self.workdir, '-c', 'user.name=a',
+                        '-c', 'user.email=a@example.com'] + list(args))
+        # A merge of a side branch that changed file_a, keeping master's
+        work('checkout', '-q', '-b', 'side', 'master~3')
+        with open(os.path.join(self.workdir, 'file_a'), 'w') as f:
+            f.write('side\n')
+        work('commit', '-q', '-am', 'Change file a')
+        work('checkout', '-q', 'master')
+        work('merge', '-q', '-s', 'ours', '-m', 'Merge side', 'side')
+        # A change of mode only
+        work('update-index', '--chmod=+x', 'file_b')
+        work('commit', '-q', '-m', 'Make file b executable')
+        self.assertEqual(len(git(self.gitrepo, 'log', '--format=%H', 'master', '--',
+                                 'file_b').split()), 2)
+        paths = git(self.gitrepo, 'ls-tree', '-r', '-t', '--name-only', 'master').split()
+
+        for args in ([], ['--changed-paths']):
+            git(self.gitrepo, 'commit-graph', 'write', '--reachable', *args)
+            go = GitOperations(self.workdir)
+            master = go.commit_of_ref('master')
+            for path in paths + ['file_z']:
+                self.assertEqual(go.path_history(master, path),
+                                 git(self.gitrepo, 'log', '--format=%H', 'master',
+                                     '--', path).split())
+            self.assertEqual(go.path_history(go.commit_of_ref('side'), 'file_a'),
+                             git(self.gitrepo, 'log', '--format=%H', 'side', '--',
+                                 'file_a').split())
+            go.close()
+
+    def test_gitoper(self):
+        go = GitOperations(self.workdir)
+        master = go.commit_of_ref('master')
+        root = git(self.gitrepo, 'rev-list', '--max-parents=0', 'master')
+        self.assertTrue(go.is_ancestor(root, master))
+        self.assertFalse(go.is_ancestor(master, root))
+
+        go.write_commit_graph()
+        self.assertGreater(len(go.commit_graph()), 0)
+        self.assertEqual(go.stats.command_count('commit-graph'), 1)
+        self.assertTrue(go.is_ancestor(root, master))
+        self.assertFalse(go.is_ancestor(master, root))
+        self.assertEqual(go.commit_parents(master), [str(p) for p in self.repo[master].parent_ids])
+        self.assertEqual(go.get_commit_time(master), self.repo[master].commit_time)
+        self.assertTrue(os.path.exists(os.path.join(self.gitrepo, 'objects', 'info',
+                                                    'commit-graph')))
+        go.close()
+
+if __name__ == "__main__":
+    main()
@@ -123,6 +123,33 @@ class CommitHashHandlerTest(TestCase):
         self.assertEqual(self.generate(link_commit + "/link_a", False).get_symlink_target(), link_commit + "/file_a")
         self.assertEqual(self.generate(self.to_hash_path(link_commit) + "/" + link_commit + "/link_a", True).get_symlink_target(), self.to_hash_path(link_commit) + "/" + link_commit + "/file_a")
 
+    def test_abbreviated(self):
+        last_commit = list(self.repofs_htree._git.all_commits())[0]
+        short = last_commit[:7]
+        handler = self.generate(short, False)
+        self.assertFalse(handler.is_dir())
+        self.assertTrue(handler.is_symlink())
+        self.assertEqual(handler.get_symlink_target(), last_commit)
+        self.assertEqual(handler.get_commit(), last_commit)
+        self.assertIsNone(handler.get_commit_path())
+        self.assertEqual(self.generate(self.to_hash_path(last_commit) + "/" + short, True)
+                         .get_symlink_target(), self.to_hash_path(last_commit) + "/" + last_commit)
+        self.assertTrue(self.generate(last_commit[:4], False).is_symlink())
+
+        # Too short, not a prefix of any commit or under the wrong hash directories
+        for path, hash_trees in ((last_commit[:3], False), ("0000000", False),
+                                 ("aa/bb/cc/" + short, True)):
+            with self.assertRaises(FuseOSError):
+                self.generate(path, hash_trees).is_dir()
+            self.assertFalse(self.generate(path, hash_trees).is_symlink())
+
+        # Ambiguous abbreviations name no commit
+        oper = self.repofs_htree._git
+        oper.commits_with_prefix = lambda prefix, limit=None: [last_commit, last_commit]
+        with self.assertRaises(FuseOSError):
+            self.generate(short, False).is_dir()
+        self.assertFalse(self.generate(short, False).is_symlink())
+
 
 if __name__ == "__main__":
     main()
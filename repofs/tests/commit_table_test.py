@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from repofs.commit_table import CommitTable
+from repofs.gitoper import GitOperations
+
+A = "a" * 40
+B = "b" * 40
+C = "c" * 40
+LOG = "\n".join([
+    "\0".join([C, B + " " + A, "300", "30", "carol", "carol@example.com"]),
+    "\0".join([B, A, "200", "20", "bob", "bob@example.com"]),
+    "\0".join([A, "", "100", "10", "carol", "carol@example.com"]),
+])
+
+class CommitTableTest(TestCase):
+    def setUp(self):
+        self.table = CommitTable.parse(LOG)
+
+    def test_index(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.index(A), 0)
+        self.assertEqual(self.table.index(C), 2)
+        self.assertEqual(self.table.index("d" * 40), -1)
+        self.assertEqual(self.table.index("abc"), -1)
+        self.assertEqual(self.table.index("xyz"), -1)
+        self.assertEqual(self.table.hex(1), B)
+
+    def test_prefix_range(self):
+        self.assertEqual(self.table.prefix_range("aaaaaaa"), range(0, 1))
+        self.assertEqual(self.table.prefix_range("b"), range(1, 2))
+        self.assertEqual(self.table.prefix_range(C), range(2, 3))
+        self.assertEqual(self.table.prefix_range(""), range(0, 3))
+        self.assertEqual(len(self.table.prefix_range("ab")), 0)
+        self.assertEqual(len(self.table.prefix_range("d")), 0)
+        self.assertEqual(len(self.table.prefix_range("xyz")), 0)
+        self.assertEqual(len(self.table.prefix_range(A + "a")), 0)
+
+    def test_columns(self):
+        c = self.table.index(C)
+        self.assertEqual(self.table.commit_time[c], 300)
+        self.assertEqual(self.table.author_time[c], 30)
+        self.assertEqual([self.table.hex(p) for p in self.table.get_parents(c)], [B, A])
+        self.assertEqual(list(self.table.get_parents(self.table.index(A))), [])
+        self.assertEqual(self.table.get_author(c), "carol")
+        self.assertEqual(self.table.get_email(c), "carol@example.com")
+        self.assertEqual(self.table.names, ["carol", "bob"])
+
+    def test_missing_parent(self):
+        table = CommitTable.parse("\0".join([A, B, "1", "1", "n", "e"]))
+        self.assertEqual(list(table.get_parents(0)), [-1])
+
+    def test_nbytes(self):
+        self.assertLess(self.table.nbytes(), 100 * len(self.table))
+
+    def test_repository(self):
+        go = GitOperations('test_repo')
+        table = go.commit_table()
+        commits = list(go.all_commits())
+        self.assertEqual(len(table), len(commits))
+        for commit in commits:
+            i = table.index(commit)
+            entry = go._get_entry(commit)
+            self.assertEqual(table.commit_time[i], entry.commit_time)
+            self.assertEqual(table.author_time[i], entry.author.time)
+            self.assertEqual([table.hex(p) for p in table.get_parents(i)],
+                             [str(p.id) for p in entry.parents])
+            self.assertEqual(table.get_author(i), entry.author.name)
+
+if __name__ == "__main__":
+    main()
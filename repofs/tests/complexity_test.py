@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import datetime
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase, main
+
+from benchmarks.generate import RepoShape, generate
+from repofs.instrument import InstrumentedGitOperations, LOOKUPS, REVWALK, SPAWNS
+from repofs.repofs import RepoFS
+
+# Commits (and branches) of the repositories each operation is run on
+SIZES = [20, 400]
+
+# Object lookups allowed to a getattr of a path up to three levels deep
+# within a commit, including that of the object its inode is derived
+# from; the bound grows with the depth, not with the history
+GETATTR_LOOKUPS = 9
+
+
+class ComplexityTest(TestCase):
+    """ Check that the git work an operation does is bounded, whatever
+    the length of the history and the number of refs. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.repos = {}
+        for size in SIZES:
+            path = os.path.join(cls.tmpdir, "repo%d" % size)
+            generate(path, RepoShape(commits=size, branches=3, depth=2, width=2,
+                                     files=3, changes=2, max_blob=256,
+                                     large_files=0, refs=size))
+            cls.repos[size] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def _mount(self, size, **kwargs):
+        fs = RepoFS(self.repos[size], self.tmpdir, False, False, False, **kwargs)
+        fs._git.close()
+        fs._git = InstrumentedGitOperations(self.repos[size], stats=fs.stats)
+        fs.preload()
+        self.addCleanup(fs.destroy, "/")
+        # Work done once per mount: the ref listings and the first cat-file
+        table = fs._git.commit_table()
+        fs('readdir', '/branches/heads', None)
+        fs('getattr', '/commits-by-hash/%s/f0' % table.hex(0), None)
+        return fs
+
+    def _paths(self, fs):
+        """ Return the paths exercised, each within a commit in the
+        middle of the history """
+        table = fs._git.commit_table()
+        i = len(table) // 2
+        commit = table.hex(i)
+        parent = table.hex(table.get_parents(i)[0])
+        date = datetime.datetime.fromtimestamp(table.commit_time[i])
+        by_date = '/commits-by-date/%d/%d/%d/%s' % (date.year, date.month,
+                                                    date.day, commit)
+        return {
+            'commit': '/commits-by-hash/' + commit,
+            'dir': '/commits-by-hash/%s/d1' % commit,
+            'file': '/commits-by-hash/%s/d0/d1/f2' % commit,
+            'author': '/commits-by-hash/%s/.author' % commit,
+            'parent': '/commits-by-hash/%s/.git-parents/%s' % (commit, parent),
+            'date-file': by_date + '/d1/f0',
+            'branch': '/branches/heads/bench/b%05d' % (len(table) // 3),
+        }
+
+    def _work(self, op, name, *args, **kwargs):
+        """ Return the work of op on the named path for each size. """
+        works = []
+        for size in SIZES:
+            fs = self._mount(size, **kwargs)
+            git = fs._git
+            works.append(git.work(fs, op, self._paths(fs)[name], *args))
+        return works
+
+    def assertBounded(self, works, lookups):
+        for work in works:
+            self.assertEqual(work[REVWALK], 0)
+            self.assertEqual(work[SPAWNS], 0)
+            self.assertLessEqual(work[LOOKUPS], lookups)
+        self.assertEqual(works[0], works[-1])
+
+    def test_getattr_commit(self):
+        self.assertBounded(self._work('getattr', 'commit', None), GETATTR_LOOKUPS)
+
+    def test_getattr_dir(self):
+        self.assertBounded(self._work('getattr', 'dir', None), GETATTR_LOOKUPS)
+
+    def test_getattr_file(self):
+        self.assertBounded(self._work('getattr', 'file', None), GETATTR_LOOKUPS)
+
+    def test_getattr_file_mtime(self):
+        # Once the last changes of a directory are known, its files are free
+        works = []
+        for size in SIZES:
+            fs = self._mount(size, file_mtimes=True)
+            path = self._paths(fs)['file']
+            fs('getattr', path, None)
+            works.append(fs._git.work(fs, 'getattr', path[:-1] + '0', None))
+        self.assertBounded(works, GETATTR_LOOKUPS)
+
+    def test_getattr_file_by_date(self):
+        self.assertBounded(self._work('getattr', 'date-file', None), GETATTR_LOOKUPS)
+
+    def test_getattr_metadata(self):
+        self.assertBounded(self._work('getattr', 'author', None), GETATTR_LOOKUPS)
+        self.assertBounded(self._work('getattr', 'parent', None), GETATTR_LOOKUPS)
+
+    def test_getattr_branch(self):
+        self.assertBounded(self._work('getattr', 'branch', None), GETATTR_LOOKUPS)
+        self.assertBounded(self._work('readlink', 'branch'), GETATTR_LOOKUPS)
+
+    def test_readdir_commit(self):
+        # One lookup per directory, to be read once
+        self.assertBounded(self._work('readdir', 'commit', None), GETATTR_LOOKUPS)
+
+    def test_read_file(self):
+        self.assertBounded(self._work('read', 'file', 4096, 0, None), GETATTR_LOOKUPS)
+
+    def test_counts(self):
+        fs = self._mount(SIZES[0])
+        work = fs._git.work(list, fs._git.all_commits())
+        self.assertEqual(work[REVWALK], SIZES[0])
+        self.assertEqual(work[LOOKUPS], 0)
+        work = fs._git.work(fs._git.refresh_refs)
+        self.assertEqual(work[SPAWNS], 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import errno
+import os
+
+from unittest import TestCase, main
+from fuse import FuseOSError
+
+from repofs.repofs import RepoFS
+
+
+class ControlTest(TestCase):
+    def setUp(self):
+        self.mount = 'mnt'
+        try:
+            os.mkdir(self.mount)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise e
+        self.repofs = RepoFS('test_repo', self.mount, False, False, False)
+        self.master = self.repofs._git.commit_of_ref('heads/master')
+
+    def tearDown(self):
+        self.repofs.destroy('/')
+
+    def control(self, command):
+        data = command.encode('utf-8')
+        self.assertEqual(self.repofs('write', '/.repofs/control', data, 0, None), len(data))
+        return self.status()
+
+    def status(self):
+        text = self.repofs('read', '/.repofs/control', 100000, 0, None).decode('utf-8')
+        return dict(line.split(" ", 1) for line in text.split("\n\n")[0].splitlines())
+
+    def test_status(self):
+        status = self.status()
+        self.assertEqual(status['limit'], 'none')
+        self.assertEqual(status['profile'], 'off')
+        self.assertEqual(status['caches'].split(),
+                         ['attributes', 'blobs', 'commands', 'sizes', 'trees', 'histories',
+                          'changes', 'last-changes', 'tree-sizes', 'diffstats', 'refs', 'commits',
+                          'inodes'])
+        self.assertFalse('last' in status)
+
+    def test_drop(self):
+        self.repofs('readdir', '/commits-by-hash/' + self.master, None)
+        self.assertNotEqual(self.repofs._stats, {})
+        self.control("drop attributes commands")
+        usage = dict(self.repofs.memory.usage())
+        self.assertEqual(usage['attributes'], 0)
+        self.assertEqual(usage['commands'], 0)
+        self.control("drop all")
+        self.assertEqual(self.repofs.memory.total(), 0)
+        with self.assertRaises(FuseOSError):
+            self.control("drop nothing")
+
+    def test_settings(self):
+        status = self.control("limit 64M\nblob-cache 1k\nref-ttl 30\nidle-timeout none\n"
+                              "git-cache 1M")
+        self.assertEqual(status['git-cache'], str(1024 * 1024))
+        self.assertTrue(status['mapped-limit'].endswith(' auto'))
+        status = self.control("git-cache auto")
+        self.assertTrue(status['git-cache'].endswith(' auto'))
+        self.assertEqual(status['limit'], str(64 * 1024 * 1024))
+        self.assertEqual(status['blob-cache'], '1024')
+        self.assertEqual(status['ref-ttl'], '30.0')
+        self.assertEqual(status['idle-timeout'], 'none')
+        self.assertEqual(status['last'], 'git-cache auto')
+        self.assertEqual(self.control("prefetch off")['prefetch'], "off 0 scans, 0 chunks, 0 bytes")
+        self.assertFalse(self.repofs.prefetcher.enabled)
+        status = self.control("limit none\nref-ttl none\nidle-timeout 0")
+        self.assertEqual(status['limit'], 'none')
+        self.assertEqual(status['ref-ttl'], 'none')
+        self.assertEqual(status['idle-timeout'], 'none')
+        for command in ("limit", "limit lots", "ref-ttl", "frobnicate", "refresh now",
+                        "prefetch maybe", "git-cache lots"):
+            with self.assertRaises(FuseOSError):
+                self.control(command)
+
+    def test_refresh(self):
+        self.repofs('getattr', '/branches/heads/master', None)
+        self.repofs('readdir', '/branches/heads', None)
+        self.assertNotEqual(self.repofs._git._refs, {})
+        self.control("refresh")
+        self.assertEqual(self.repofs._git._refs, {})
+
+    def test_warm(self):
+        status = self.control("warm heads/master")
+        self.assertTrue(status['last'].startswith("heads/master %s: " % self.master))
+        path = '/commits-by-hash/%s/dir_a/dir_b' % self.master
+        self.assertTrue(path in self.repofs._stats)
+        self.assertFalse('/commits-by-hash/%s/.git-parents/' % self.master in
+                         " ".join(self.repofs._stats))
+
+        status = self.control("warm %s t20050607" % self.master)
+        self.assertEqual(len(status['last'].split("; ")), 2)
+        with self.assertRaises(FuseOSError):
+            self.control("warm heads/nothing")
+
+if __name__ == "__main__":
+    main()
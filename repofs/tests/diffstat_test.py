@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase, main
+
+from repofs.diffstat import Diffstats
+from repofs.gitoper import GitOperations
+
+
+class DiffstatsTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.go = GitOperations('test_repo')
+        self.master = self.go.commit_of_ref('master')
+        self.commits = self.go.cached_command(['rev-list', 'master']).split()
+
+    def tearDown(self):
+        self.go.close()
+        shutil.rmtree(self.tmpdir)
+
+    def diffstats(self, cache_dir=None):
+        return Diffstats(self.go._gitrepo, self.go.commit_parents, cache_dir, 2)
+
+    def expected(self, commit):
+        parents = self.go.commit_parents(commit)
+        out = self.go.cached_command(['diff-tree', '-r', '--numstat', '--no-renames', '--root'] +
+                                     parents[:1] + [commit])
+        # A root commit is preceded by its id
+        lines = out.splitlines(True)
+        return "".join(l for l in lines if '\t' in l).encode('utf-8')
+
+    def test_get(self):
+        diffstats = self.diffstats()
+        for commit in self.commits:
+            self.assertEqual(diffstats.get(commit), self.expected(commit))
+        self.assertEqual(diffstats.get(self.commits[-1]), b'0\t0\tfile_a\n0\t0\tfile_b\n')
+        self.assertEqual(diffstats.get(self.commits[-2]), b'1\t0\tfile_a\n')
+        diffstats.close()
+
+    def test_ahead(self):
+        diffstats = self.diffstats()
+        diffstats.get(self.master)
+        # The ancestors were diffed by the same git diff-tree
+        self.assertEqual(diffstats.stats.command_count('diff-tree'), 1)
+        self.assertEqual(sorted(diffstats._texts), sorted(self.commits))
+        for commit in self.commits:
+            diffstats.get(commit)
+        self.assertEqual(diffstats.stats.command_count('diff-tree'), 1)
+        self.assertGreater(diffstats.nbytes(), 0)
+        diffstats.evict(diffstats.nbytes())
+        self.assertEqual(diffstats.nbytes(), 0)
+        diffstats.close()
+
+    def test_cache_dir(self):
+        diffstats = self.diffstats(self.tmpdir)
+        text = diffstats.get(self.master)
+        diffstats.close()
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, 'diffstat', self.master[:2],
+                                                    self.master[2:])))
+
+        diffstats = self.diffstats(self.tmpdir)
+        self.assertEqual(diffstats.get(self.master), text)
+        for commit in self.commits:
+            self.assertEqual(diffstats.get(commit), self.expected(commit))
+        self.assertEqual(diffstats.stats.command_count('diff-tree'), 0)
+        diffstats.close()
+
+if __name__ == "__main__":
+    main()
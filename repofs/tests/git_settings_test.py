@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+from pygit2 import settings
+
+from repofs.git_settings import GitSettings, CACHE_MAX_SIZE, MWINDOW_MIN, \
+        MWINDOW_MAPPED_LIMIT, available_memory, pack_bytes
+
+
+class GitSettingsTest(TestCase):
+    def tearDown(self):
+        GitSettings().apply('test_repo/.git')
+
+    def test_auto(self):
+        git_settings = GitSettings()
+        git_settings.apply('test_repo/.git')
+        self.assertEqual(git_settings.packs, 0)
+        memory = available_memory()
+        self.assertEqual(git_settings.values['git-cache'],
+                         min(CACHE_MAX_SIZE, memory // 8) if memory else CACHE_MAX_SIZE)
+        self.assertEqual(git_settings.values['mwindow-size'], MWINDOW_MIN)
+        self.assertEqual(git_settings.values['mapped-limit'], MWINDOW_MAPPED_LIMIT)
+        self.assertEqual(settings.cached_memory[1], git_settings.values['git-cache'])
+        self.assertEqual(settings.mwindow_mapped_limit, MWINDOW_MAPPED_LIMIT)
+
+    def test_sizing(self):
+        git_settings = GitSettings()
+        git_settings.packs = 32 * 1024 ** 3
+        gib = 1024 ** 3
+        self.assertEqual(git_settings._auto('git-cache', None, None), 2 * gib)
+        self.assertEqual(git_settings._auto('git-cache', 8 * gib, None), gib)
+        self.assertEqual(git_settings._auto('git-cache', 64 * gib, 2 * gib), gib // 2)
+        git_settings.largest_pack = 3 * gib + 1
+        self.assertEqual(git_settings._auto('mwindow-size', None, None),
+                         3 * gib + 1024 * 1024)
+        self.assertEqual(git_settings._auto('mwindow-size', 8 * gib + 1, None), 2 * gib)
+        git_settings.largest_pack = 1024
+        self.assertEqual(git_settings._auto('mwindow-size', 8 * gib, None), MWINDOW_MIN)
+        self.assertEqual(git_settings._auto('mapped-limit', 64 * gib, None), 32 * gib)
+        self.assertEqual(git_settings._auto('mapped-limit', 16 * gib, None), 16 * gib)
+        self.assertEqual(git_settings._auto('mapped-limit', 4 * gib, None),
+                         MWINDOW_MAPPED_LIMIT)
+
+    def test_set(self):
+        git_settings = GitSettings(mwindow_size=32 * 1024 * 1024)
+        git_settings.apply('test_repo/.git')
+        self.assertEqual(settings.mwindow_size, 32 * 1024 * 1024)
+        git_settings.set('git-cache', 1024 * 1024, 'test_repo/.git')
+        self.assertEqual(settings.cached_memory[1], 1024 * 1024)
+        self.assertEqual(git_settings.status()[:2],
+                         ['git-cache 1048576', 'mwindow-size 33554432'])
+        self.assertTrue(git_settings.status()[2].endswith(' auto'))
+        self.assertEqual(git_settings.gauges()['libgit2_cache_max_bytes'], 1024 * 1024)
+        with self.assertRaises(ValueError):
+            git_settings.set('delta-cache', 1, 'test_repo/.git')
+
+    def test_pack_bytes(self):
+        self.assertEqual(pack_bytes('test_repo/.git'), 0)
+        self.assertEqual(pack_bytes('no_such_repo/.git'), 0)
+
+if __name__ == "__main__":
+    main()
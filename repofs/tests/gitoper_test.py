@@ -16,10 +16,13 @@
 #
 
 import datetime
+import shutil
+import tempfile
 
 from unittest import TestCase, main
 from repofs.gitoper import GitOperations, GitOperError
-from pygit2 import GIT_OBJ_TREE, GIT_OBJ_BLOB
+from pygit2 import GIT_OBJ_TREE, GIT_OBJ_BLOB, GIT_FILEMODE_TREE, GIT_FILEMODE_BLOB, \
+        GIT_FILEMODE_LINK
 
 
 class GitOperationsTestCase(TestCase):
@@ -51,13 +54,145 @@ class GitOperationsTestCase(TestCase):
     def test_all_commits(self):
         self.assertGreater(len(list(self.go.all_commits())), 3)
 
+    def test_commits_with_prefix(self):
+        commits = list(self.go.all_commits())
+        prefix = self.master_hash[:7]
+        self.assertEqual(self.go.commits_with_prefix(prefix), [self.master_hash])
+        self.assertEqual(list(self.go.all_commits(self.master_hash[:2])),
+                         sorted(c for c in commits if c.startswith(self.master_hash[:2])))
+        self.assertEqual(self.go.commits_with_prefix(""), sorted(commits))
+        self.assertEqual(len(self.go.commits_with_prefix("", 2)), 2)
+        self.assertEqual(self.go.commits_with_prefix("zzzz"), [])
+        go = GitOperations('test_repo', no_cache=True)
+        self.assertEqual(go.commits_with_prefix(prefix), [self.master_hash])
+        go.close()
+
     def test_file_size(self):
         self.assertTrue(self.go.file_size(self.master_hash, "file_a") > 0)
         self.assertEqual(self.go.file_size(self.master_hash, "file_b"), 0)
 
+    def test_object_sizes(self):
+        commit = self.go._get_entry(self.master_hash)
+        oids = [commit.tree['file_a'].id, commit.tree['file_b'].id]
+        self.assertEqual(self.go.object_sizes(oids), [9, 0])
+        self.assertEqual(self.go._object_sizes[oids[0]], 9)
+
+    def test_read_objects(self):
+        self.assertEqual(self.go.read_objects(["master:file_a", "master:file_z"]),
+                         [b'Contents\n', None])
+
     def test_file_contents(self):
         self.assertEqual(self.go.file_contents(self.master_hash, "file_a"), b'Contents\n')
 
+    def test_blob_cache(self):
+        self.go.file_contents(self.master_hash, "file_a")
+        self.assertEqual(self.go.file_contents(self.master_hash, "file_a"), b'Contents\n')
+        self.assertEqual(self.go.stats.snapshot()['caches'][0]['cache'], 'blobs')
+        self.assertEqual(self.go.stats.snapshot()['caches'][0]['hits'], 1)
+
+        self.go.blob_cache_size = 10
+        self.go.file_contents(self.master_hash, "dir_a/file_aa")
+        self.go.file_contents(self.master_hash, "file_r")
+        self.assertLessEqual(self.go._blob_bytes, 10)
+        self.assertEqual(list(self.go._blobs.values()), [b"", b"phantom\n"])
+
+    def test_prefetch_blobs(self):
+        blobs = dict(self.go.commit_blobs(self.master_hash))
+        file_a = self.go._get_entry(self.master_hash, "file_a", return_tree=True).id
+        self.assertEqual(blobs[file_a], 9)
+        self.assertEqual(self.go.prefetch_blobs(list(blobs)), sum(blobs.values()))
+        self.assertEqual(self.go.prefetch_blobs(list(blobs)), 0)
+        self.assertEqual(self.go.file_contents(self.master_hash, "file_a"), b'Contents\n')
+        self.assertEqual(self.go.stats.snapshot()['caches'][0]['hits'], 1)
+
+    def test_commits_in_range(self):
+        self.assertEqual(self.go.commits_in_range("master..master"), [])
+        commits = self.go.commits_in_range("t20091011aa..master")
+        self.assertEqual(commits[0], self.master_hash)
+        self.assertLess(len(commits), len(list(self.go.all_commits())))
+        self.assertEqual(self.go.commits_in_range("nothing..master"), [])
+
+    def test_path_history(self):
+        history = self.go.path_history(self.master_hash, "file_a")
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0], self.go.cached_command(
+            ['log', '-1', '--format=%H', 'master', '--', 'file_a']).strip())
+        self.assertEqual(self.go.path_history(self.master_hash, "dir_a/dir_b"), [self.master_hash])
+        self.assertEqual(self.go.path_history(self.master_hash, "file_z"), [])
+        self.go.path_history(self.master_hash, "file_a")
+        caches = dict((c['cache'], c) for c in self.go.stats.snapshot()['caches'])
+        self.assertEqual(caches['histories']['hits'], 1)
+
+    def test_commit_changes(self):
+        for line in self.go.cached_command(['rev-list', '--parents', 'master']).splitlines():
+            commit, parents = line.split()[0], line.split()[1:]
+            for parent in parents:
+                self.assertEqual(self.go.commit_changes(commit, parent).decode('utf-8'),
+                                 self.go.cached_command(['diff-tree', '-r', '--name-status',
+                                                         '--no-renames', parent, commit]))
+        first = self.go.cached_command(['rev-list', '--max-parents=0', 'master']).strip()
+        changes = self.go.commit_changes(self.master_hash, first)
+        self.assertIn(b'A\tdir_a/dir_b/dir_c/file_ca\n', changes)
+        self.assertEqual(self.go.commit_changes(self.master_hash, first), changes)
+        self.assertEqual(self.go.commit_changes(first, first), b'')
+        caches = dict((c['cache'], c) for c in self.go.stats.snapshot()['caches'])
+        self.assertEqual(caches['changes']['hits'], 1)
+
+    def test_last_changes(self):
+        def last_change(path):
+            return self.go.cached_command(['log', '-1', '--first-parent', '--format=%H',
+                                           'master', '--', path]).strip()
+        changes = self.go.last_changes(self.master_hash, "")
+        self.assertEqual(sorted(changes), sorted(self.go.directory_contents(self.master_hash, "")))
+        for name, commit in changes.items():
+            self.assertEqual(commit, last_change(name))
+        changes = self.go.last_changes(self.master_hash, "dir_a/dir_b")
+        self.assertEqual(changes['dir_c'], last_change("dir_a/dir_b/dir_c"))
+        self.assertEqual(self.go.last_changes(self.master_hash, "file_z"), {})
+        self.go.last_changes(self.master_hash, "")
+        caches = dict((c['cache'], c) for c in self.go.stats.snapshot()['caches'])
+        self.assertGreaterEqual(caches['last-changes']['hits'], 1)
+
+    def test_last_changes_disk(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            go = GitOperations('test_repo', cache_dir=cache_dir)
+            changes = go.last_changes(self.master_hash, "")
+            go.close()
+            go = GitOperations('test_repo', cache_dir=cache_dir)
+            self.assertEqual(go.last_changes(self.master_hash, ""), changes)
+            caches = dict((c['cache'], c) for c in go.stats.snapshot()['caches'])
+            self.assertEqual(caches['last-changes']['misses'], 0)
+            go.close()
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_tree_size(self):
+        sizes = self.go.cached_command(['ls-tree', '-r', '-l', 'master'])
+        total = sum(int(line.split()[3]) for line in sizes.splitlines())
+        self.assertEqual(self.go.tree_size(self.master_hash), total)
+        tree = self.go.object_attributes(self.master_hash, "dir_a")[0]
+        self.assertEqual(self.go.tree_size(tree), 0)
+        caches = dict((c['cache'], c) for c in self.go.stats.snapshot()['caches'])
+        self.assertEqual(caches['tree-sizes']['hits'], 1)
+
+    def test_memory(self):
+        self.go.is_dir(self.master_hash, "dir_a/dir_b")
+        self.go.file_size(self.master_hash, "file_a")
+        self.go.file_contents(self.master_hash, "file_a")
+        self.go.commit_table()
+        usage = dict(self.go.memory.usage())
+        for cache in ('blobs', 'commands', 'sizes', 'trees', 'commits'):
+            self.assertGreater(usage[cache], 0)
+
+        self.go.memory.limit = usage['commits']
+        self.go.memory.enforce()
+        usage = dict(self.go.memory.usage())
+        self.assertEqual(usage['blobs'], 0)
+        self.assertEqual(usage['trees'], 0)
+        self.assertGreater(usage['commits'], 0)
+        self.assertTrue(self.go.is_dir(self.master_hash, "dir_a/dir_b"))
+
     def test_is_dir(self):
         self.assertTrue(self.go.is_dir(self.master_hash, "dir_a"))
         self.assertTrue(self.go.is_dir(self.master_hash, "dir_a/dir_b"))
@@ -71,6 +206,35 @@ class GitOperationsTestCase(TestCase):
         self.assertEqual(self.go.directory_contents(self.master_hash, "dir_a"), ["dir_b", "file_aa"])
         self.assertEqual(self.go.directory_contents(self.master_hash, "dir_a/dir_b"), ["dir_c"])
 
+    def test_directory_entries(self):
+        self.assertEqual(self.go.directory_entries(self.master_hash, "dir_a"),
+                [("dir_b", GIT_FILEMODE_TREE, 0), ("file_aa", GIT_FILEMODE_BLOB, 0)])
+        entries = dict((e[0], e) for e in self.go.directory_entries(self.master_hash, ""))
+        self.assertEqual(entries["file_a"], ("file_a", GIT_FILEMODE_BLOB, 9))
+        self.assertEqual(entries["link_a"][1], GIT_FILEMODE_LINK)
+        self.assertEqual(self.go._sizes[self.master_hash]["file_a"], 9)
+
+    def test_directory_entries_evicted(self):
+        # The size cache may be evicted by another thread during a listing
+        object_sizes = self.go.object_sizes
+        def evicting(oids):
+            sizes = object_sizes(oids)
+            self.go._evict_sizes(0)
+            return sizes
+        self.go.object_sizes = evicting
+        entries = dict((e[0], e) for e in self.go.directory_entries(self.master_hash, ""))
+        self.assertEqual(entries["file_a"], ("file_a", GIT_FILEMODE_BLOB, 9))
+
+    def test_commit_times(self):
+        commits = list(self.go.all_commits())
+        times = self.go.commit_times(commits)
+        self.assertEqual(len(times), len(commits))
+        for commit in commits:
+            self.assertEqual(times[commit], (self.go.get_commit_time(commit),
+                                             self.go.get_author_time(commit)))
+        self.assertEqual(self.go.commit_times([self.master_hash]),
+                         {self.master_hash: times[self.master_hash]})
+
     def test_non_existent(self):
         with self.assertRaises(GitOperError):
             self.go.file_size(self.master_hash, "file_z")
@@ -108,6 +272,18 @@ class GitOperationsTestCase(TestCase):
     def test_author_time(self):
         self.assertEqual("2009-10-11", datetime.datetime.fromtimestamp(self.go.get_author_time(self.master_hash)).strftime("%Y-%m-%d"))
 
+    def test_commit_parents(self):
+        commits = list(self.go.all_commits())
+        self.assertEqual(self.go.commit_parents(commits[0]), [commits[1]])
+        self.assertEqual(self.go.commit_parents(commits[-1]), [])
+
+    def test_no_cache_metadata(self):
+        go = GitOperations('test_repo', no_cache=True)
+        self.assertEqual(go.commit_table(), None)
+        self.assertEqual(go.get_commit_time(self.master_hash),
+                         self.go.get_commit_time(self.master_hash))
+        self.assertEqual(go.author(self.master_hash), "repofs")
+
     def test_is_symlink(self):
         commit = self.go.commit_of_ref("refs/tags/t20070115la").split("/")[-1]
         self.assertTrue(self.go.is_symlink(commit, "link_a"))
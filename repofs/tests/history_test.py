@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import errno
+
+from unittest import TestCase, main
+from stat import S_ISDIR, S_ISLNK
+from fuse import FuseOSError
+
+from repofs.handlers.history import HistoryHandler
+from repofs.repofs import RepoFS
+
+class HistoryHandlerTest(TestCase):
+    def setUp(self):
+        self.mount = "mnt"
+        try:
+            os.mkdir(self.mount)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise e
+        self.repofs = RepoFS('test_repo', self.mount, False, False, False)
+        self.master = self.repofs._git.commit_of_ref('heads/master')
+        self.file_a = self.repofs._git.path_history(self.master, 'file_a')
+
+    def generate(self, path):
+        return HistoryHandler(path, self.repofs._git,
+                              self.repofs._branch_refs + self.repofs._tag_refs)
+
+    def test_is_dir(self):
+        self.assertTrue(self.generate("").is_dir())
+        self.assertTrue(self.generate("heads").is_dir())
+        self.assertTrue(self.generate("heads/private/john").is_dir())
+        self.assertTrue(self.generate("heads/master").is_dir())
+        self.assertTrue(self.generate("heads/master/file_a").is_dir())
+        self.assertTrue(self.generate("heads/master/dir_a/dir_b").is_dir())
+        self.assertTrue(self.generate("tags/t20091011ca/file_a").is_dir())
+        self.assertFalse(self.generate("heads/master/file_z").is_dir())
+        self.assertFalse(self.generate("heads/nothing").is_dir())
+        self.assertFalse(self.generate("heads/master/file_a/" + self.file_a[0]).is_dir())
+
+    def test_readdir(self):
+        self.assertEqual(sorted(self.generate("").readdir()), ['heads', 'tags'])
+        self.assertEqual(sorted(self.generate("heads/master").readdir()),
+                         sorted(self.repofs._git.directory_contents(self.master, '')))
+        self.assertEqual(self.generate("heads/master/file_a").readdir(), self.file_a)
+        self.assertEqual(self.generate("heads/master/dir_a/dir_b").readdir(),
+                         [self.master, 'dir_c'])
+        with self.assertRaises(FuseOSError):
+            self.generate("heads/master/file_z").readdir()
+        with self.assertRaises(FuseOSError):
+            self.generate("heads/nothing").readdir()
+
+    def test_symlink(self):
+        handler = self.generate("heads/master/file_a/" + self.file_a[1])
+        self.assertTrue(handler.is_symlink())
+        self.assertEqual(handler.get_symlink_target(), self.file_a[1])
+        self.assertEqual(handler.get_commit(), self.file_a[1])
+        self.assertFalse(self.generate("heads/master/file_a").is_symlink())
+        self.assertFalse(self.generate("heads/master/file_r/" + self.file_a[1]).is_symlink())
+        with self.assertRaises(FuseOSError):
+            self.generate("heads/master/file_a/file_z").get_symlink_target()
+
+    def test_get_commit(self):
+        self.assertEqual(self.generate("heads/master").get_commit(), self.master)
+        self.assertEqual(self.generate("heads/master/file_a").get_commit(), self.file_a[0])
+        self.assertEqual(self.generate("heads").get_commit(), "")
+
+    def test_repofs(self):
+        link = "/history/heads/master/file_a/" + self.file_a[0]
+        self.assertTrue(S_ISLNK(self.repofs.getattr(link)['st_mode']))
+        self.assertEqual(self.repofs.readlink(link),
+                         os.path.join(self.mount, "commits-by-hash", self.file_a[0], ""))
+        st = self.repofs.getattr("/history/heads/master/file_a")
+        self.assertTrue(S_ISDIR(st['st_mode']))
+        self.assertEqual(st['st_mtime'], self.repofs.get_commit_time(self.file_a[0]))
+        self.assertEqual(list(self.repofs.readdir("/history/tags/t20091011ca/file_a", None))[2:],
+                         self.file_a)
+        with self.assertRaises(FuseOSError):
+            self.repofs.getattr("/history/heads/master/file_z")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from repofs.inodes import Inodes, RESERVED
+from repofs.memory import INODE_ENTRY
+
+
+class InodesTest(TestCase):
+    def setUp(self):
+        self.inodes = Inodes()
+
+    def test_oid(self):
+        oid = 'dfe437bdebebc3622d41956323785d23e7042ced'
+        self.assertEqual(self.inodes.ino(oid), 0x5fe437bdebebc362)
+        self.assertEqual(self.inodes.ino(oid), Inodes().ino(oid))
+
+    def test_path(self):
+        ino = self.inodes.ino('/branches/heads/master')
+        self.assertEqual(ino, Inodes.derive('/branches/heads/master'))
+        self.assertNotEqual(ino, self.inodes.ino('/branches/heads'))
+        self.assertGreaterEqual(Inodes.derive('0' * 40), RESERVED)
+
+    def test_collision(self):
+        first = 'a' * 16 + '0' * 24
+        second = 'a' * 16 + '1' * 24
+        ino = self.inodes.ino(first)
+        self.assertEqual(self.inodes.ino(second), ino + 1)
+        self.assertEqual(self.inodes.ino(first), ino)
+        self.assertEqual(self.inodes.ino(second), ino + 1)
+
+    def test_evict(self):
+        self.inodes.ino('/tags')
+        self.assertGreater(self.inodes.nbytes(), 0)
+        self.inodes.evict(self.inodes.nbytes())
+        self.assertEqual(self.inodes.nbytes(), 0)
+        self.assertEqual(self.inodes.ino('/tags'), Inodes.derive('/tags'))
+
+    def test_evict_collision(self):
+        first = 'a' * 16 + '0' * 24
+        second = 'a' * 16 + '1' * 24
+        ino = self.inodes.ino(first)
+        self.inodes.ino(second)
+        self.inodes.ino('/tags')
+        self.inodes.evict(self.inodes.nbytes())
+        # Names that collided keep their numbers, whatever the order
+        # they are looked up again
+        self.assertEqual(self.inodes.nbytes(), 2 * INODE_ENTRY)
+        self.assertEqual(self.inodes.ino(second), ino + 1)
+        self.assertEqual(self.inodes.ino(first), ino)
+        third = 'a' * 16 + '2' * 24
+        self.assertEqual(self.inodes.ino(third), ino + 2)
+
+
+if __name__ == "__main__":
+    main()
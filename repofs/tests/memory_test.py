@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from repofs.memory import MemoryManager, parse_size
+
+
+class MemoryManagerTest(TestCase):
+    def setUp(self):
+        self.memory = MemoryManager(limit=100, idle_timeout=None)
+        self.caches = {'small': [10] * 3, 'large': [50] * 4, 'kept': [30]}
+        for name, idle in (('small', True), ('large', True), ('kept', False)):
+            self.memory.register(name, lambda name=name: sum(self.caches[name]),
+                                 lambda nbytes, name=name: self._evict(name, nbytes),
+                                 idle)
+
+    def _evict(self, name, nbytes):
+        entries = self.caches[name]
+        while nbytes > 0 and entries:
+            nbytes -= entries.pop()
+
+    def test_usage(self):
+        self.assertEqual(self.memory.usage(), [('small', 30), ('large', 200), ('kept', 30)])
+        self.assertEqual(self.memory.total(), 260)
+
+    def test_enforce(self):
+        self.memory.enforce()
+        self.assertLessEqual(self.memory.total(), 100)
+        # Caches are evicted in registration order
+        self.assertEqual(self.caches['small'], [])
+        self.assertEqual(self.caches['large'], [50])
+        self.assertEqual(self.caches['kept'], [30])
+
+        # Caches that aren't idle are kept even when the limit is unmet
+        self.assertEqual(self.memory.unmet, 0)
+        self.memory.limit = 20
+        self.memory.enforce()
+        self.assertEqual(self.caches['kept'], [30])
+        self.assertEqual(self.memory.unmet, 1)
+
+        self.memory.limit = None
+        self.caches['small'] = [1000]
+        self.memory.enforce()
+        self.assertEqual(self.caches['small'], [1000])
+
+    def test_shrink(self):
+        self.assertFalse(self.memory.is_idle())
+        self.memory.idle_timeout = 0
+        self.assertTrue(self.memory.is_idle())
+        self.memory.shrink()
+        self.assertEqual(self.memory.total(), 30)
+        self.assertEqual(self.memory.shrinks, 1)
+        self.memory.touch()
+        self.memory.idle_timeout = 3600
+        self.assertFalse(self.memory.is_idle())
+
+    def test_text(self):
+        lines = self.memory.text().splitlines()
+        self.assertEqual(lines[0].split(), ['small', '30', '0'])
+        self.assertEqual(lines[3].split(), ['total', '260'])
+        self.assertEqual(lines[4].split(), ['limit', '100'])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("100"), 100)
+        self.assertEqual(parse_size("2k"), 2048)
+        self.assertEqual(parse_size("1.5M"), 1536 * 1024)
+        self.assertEqual(parse_size("1G"), 1024 ** 3)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import errno
+
+from unittest import TestCase, main
+from fuse import FuseOSError
+
+from repofs.handlers.objects import ObjectHandler
+from repofs.repofs import RepoFS
+
+class ObjectHandlerTest(TestCase):
+    def setUp(self):
+        self.mount = "mnt"
+        try:
+            os.mkdir(self.mount)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise e
+        self.repofs = RepoFS('test_repo', self.mount, False, False, False)
+        git = self.repofs._git
+        self.master = git.commit_of_ref('heads/master').split("/")[-1]
+        self.tree = git.entry_id(self.master, '')
+        self.blob = git.entry_id(self.master, 'file_a')
+
+    def generate(self, path, hash_trees=False):
+        return ObjectHandler(path, self.repofs._git, hash_trees)
+
+    def test_is_dir(self):
+        self.assertTrue(self.generate("").is_dir())
+        self.assertTrue(self.generate(self.tree).is_dir())
+        self.assertTrue(self.generate(self.tree + "/dir_a/dir_b").is_dir())
+        self.assertFalse(self.generate(self.blob).is_dir())
+        self.assertFalse(self.generate(self.tree + "/file_a").is_dir())
+        self.assertTrue(self.generate("df/e4", True).is_dir())
+        with self.assertRaises(FuseOSError):
+            self.generate(self.master).is_dir()
+        with self.assertRaises(FuseOSError):
+            self.generate(self.blob.upper()).is_dir()
+        with self.assertRaises(FuseOSError):
+            self.generate("zz", True).is_dir()
+
+    def test_is_symlink(self):
+        self.assertTrue(self.generate(self.tree + "/link_a").is_symlink())
+        self.assertFalse(self.generate(self.tree + "/file_a").is_symlink())
+        self.assertFalse(self.generate(self.blob).is_symlink())
+        self.assertFalse(self.generate("").is_symlink())
+
+    def test_file_contents(self):
+        self.assertEqual(self.generate(self.blob).file_contents(), b"Contents\n")
+        self.assertEqual(self.generate(self.blob).file_size(), 9)
+        self.assertEqual(self.generate(self.tree + "/file_a").file_contents(), b"Contents\n")
+        path = os.path.join(self.blob[:2], self.blob[2:4], self.blob[4:6], self.blob)
+        self.assertEqual(self.generate(path, True).file_size(), 9)
+
+    def test_readdir(self):
+        self.assertEqual(self.generate("").readdir(), [])
+        self.assertEqual(len(self.generate("", True).readdir()), 256)
+        self.assertEqual(self.generate("df/e4/37", True).readdir(), [])
+        self.assertEqual(sorted(self.generate(self.tree).readdir()),
+                         sorted(self.repofs._git.directory_contents(self.master, '')))
+        self.assertEqual(self.generate(self.tree + "/dir_a").readdir(), ['dir_b', 'file_aa'])
+        with self.assertRaises(FuseOSError):
+            self.generate(self.blob).readdir()
+
+    def test_get_symlink_target(self):
+        self.assertEqual(self.generate(self.tree + "/link_a").get_symlink_target(),
+                         os.path.join(self.tree, self.generate(self.tree + "/link_a")
+                                      .file_contents().decode()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+
+from subprocess import check_call, check_output
+from unittest import TestCase, main
+from pygit2 import Oid
+
+from repofs.packs import PackIndex
+
+
+class PackIndexTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.gitrepo = os.path.join(self.tmpdir, 'repo.git')
+        check_call(['git', 'clone', '-q', '--mirror', '--no-local', 'test_repo', self.gitrepo])
+        self.packs = PackIndex(self.gitrepo)
+
+    def tearDown(self):
+        self.packs.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_position(self):
+        self.assertEqual(len(self.packs), 1)
+        packdir = os.path.join(self.gitrepo, 'objects', 'pack')
+        idx = [name for name in os.listdir(packdir) if name.endswith('.idx')][0]
+        with open(os.path.join(packdir, idx), 'rb') as f:
+            lines = check_output(['git', 'show-index'], stdin=f).decode('utf-8').splitlines()
+        self.assertGreater(len(lines), 10)
+        for line in lines:
+            offset, oid = line.split()[:2]
+            self.assertEqual(self.packs.position(Oid(hex=oid).raw), (0, int(offset)))
+        self.assertEqual(self.packs.position(b'\0' * 20), (1, 0))
+        self.assertEqual(self.packs.position(b'\xff' * 20), (1, 0))
+
+    def test_sort(self):
+        packdir = os.path.join(self.gitrepo, 'objects', 'pack')
+        idx = [name for name in os.listdir(packdir) if name.endswith('.idx')][0]
+        with open(os.path.join(packdir, idx), 'rb') as f:
+            lines = check_output(['git', 'show-index'], stdin=f).decode('utf-8').splitlines()
+        by_offset = [Oid(hex=oid) for offset, oid in
+                     sorted((int(l.split()[0]), l.split()[1]) for l in lines)]
+        self.assertEqual(self.packs.sort(sorted(by_offset)), by_offset)
+
+    def test_no_packs(self):
+        packs = PackIndex('test_repo/.git')
+        self.assertEqual(len(packs), 0)
+        self.assertEqual(packs.position(b'\0' * 20), (0, 0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from contextlib import redirect_stderr
+from io import StringIO
+from time import sleep
+from unittest import TestCase, main
+
+from repofs.gitoper import GitOperations
+from repofs.prefetch import Prefetcher, _Scan, CHUNK_FRACTION, SCAN_FILES
+
+
+class PrefetcherTest(TestCase):
+    def setUp(self):
+        self.go = GitOperations('test_repo')
+        self.prefetcher = self.go.prefetcher = Prefetcher(self.go)
+        self.master = self.go.commit_of_ref('master')
+
+    def tearDown(self):
+        self.go.close()
+
+    def wait(self, chunks):
+        for i in range(200):
+            if self.prefetcher.chunks >= chunks:
+                return
+            sleep(0.01)
+        self.fail("prefetching did not finish")
+
+    def walk(self):
+        """ Read files as a recursive reader would, starting a scan. """
+        paths = ['file_a', 'file_b', 'file_c', 'file_d', 'dir_a/file_aa',
+                 'dir_a/dir_b/dir_c/file_ca']
+        self.assertEqual(len(paths), SCAN_FILES)
+        for path in paths:
+            self.go.file_contents(self.master, path)
+
+    def oid(self, path):
+        return self.go._get_entry(self.master, path, return_tree=True).id
+
+    def test_scan(self):
+        self.walk()
+        self.wait(1)
+        self.assertEqual(self.prefetcher.scans, 1)
+        self.assertEqual(self.prefetcher._scan.root, '')
+        self.assertTrue(self.oid('file_r') in self.go._blobs)
+        self.assertTrue(self.prefetcher.status().startswith("on 1 scans, 1 chunks, "))
+
+        # Reads within the scanned subtree start no new scan
+        self.go.file_contents(self.master, 'file_r')
+        self.go.file_contents(self.master, 'dir_a/file_aa')
+        sleep(0.05)
+        self.assertEqual(self.prefetcher.scans, 1)
+
+    def test_few_reads(self):
+        # Opening files in a few directories, or reading one file in
+        # pieces, isn't taken for a recursive walk
+        for path in ('file_a', 'dir_a/file_aa', 'dir_a/file_aa', 'dir_a/file_aa',
+                     'dir_a/dir_b/dir_c/file_ca', 'file_a'):
+            self.go.file_contents(self.master, path)
+        self.assertIsNone(self.prefetcher._pending)
+        self.assertIsNone(self.prefetcher._thread)
+
+    def test_disabled(self):
+        self.prefetcher.enabled = False
+        self.walk()
+        self.assertIsNone(self.prefetcher._pending)
+        self.assertIsNone(self.prefetcher._thread)
+
+    def test_chunks(self):
+        self.go.blob_cache_size = 20 * CHUNK_FRACTION
+        scan = self.prefetcher._plan(self.master, '')
+        blobs = dict(self.go.commit_blobs(self.master))
+        self.assertEqual(sorted(scan.chunk_of), sorted(oid for oid, size in blobs.items()
+                                                       if size <= 20))
+        for chunk in scan.chunks:
+            self.assertLessEqual(sum(blobs[oid] for oid in chunk), 20)
+
+    def test_window(self):
+        oids = [self.oid(path) for path in ('file_a', 'file_d', 'file_r')]
+        scan = self.prefetcher._scan = _Scan(self.master, '', [[oid] for oid in oids])
+        self.assertTrue(self.prefetcher._work())
+        # Only the chunk being read and the next are read ahead
+        scan.next = 2
+        self.assertFalse(self.prefetcher._work())
+        self.go.file_contents(self.master, 'file_r')
+        self.assertEqual(scan.reader, 2)
+        self.assertTrue(self.prefetcher._work())
+        self.assertIsNone(self.prefetcher._pending)
+
+    def test_error(self):
+        def fail(oids):
+            raise RuntimeError("failed")
+        prefetch_blobs = self.go.prefetch_blobs
+        self.go.prefetch_blobs = fail
+        with redirect_stderr(StringIO()) as err:
+            self.walk()
+            for i in range(200):
+                if err.getvalue():
+                    break
+                sleep(0.01)
+        self.assertIn("failed", err.getvalue())
+        # The thread survives the error and prefetches the next scan
+        self.go.prefetch_blobs = prefetch_blobs
+        with self.prefetcher._cond:
+            self.prefetcher._scan = None
+        self.walk()
+        self.wait(1)
+        self.assertTrue(self.prefetcher._thread.is_alive())
+
+    def test_object_sizes_evicted(self):
+        oid = str(self.oid('file_a'))
+        self.go._evict_sizes(0)
+        self.assertEqual(self.go.object_sizes([oid, oid]),
+                         [len(self.go.file_contents(self.master, 'file_a'))] * 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import pstats
+import shutil
+import tempfile
+
+from time import sleep
+from unittest import TestCase, main
+
+from repofs.profiler import Profiler, SlowOpLog, SAMPLING
+
+def busy():
+    total = 0
+    for i in range(200000):
+        total += i
+    return total
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outdir)
+
+    def test_deterministic(self):
+        profiler = Profiler(self.outdir)
+        self.assertEqual(profiler.status(), "off deterministic %s\n" % self.outdir)
+        profiler.toggle("on\n")
+        self.assertTrue(profiler.enabled)
+        profiler.enter()
+        busy()
+        profiler.exit()
+        profiler.toggle("off")
+        self.assertFalse(profiler.enabled)
+
+        self.assertEqual(len(profiler.files), 1)
+        stats = pstats.Stats(profiler.files[0])
+        self.assertTrue(any(func[2] == 'busy' for func in stats.stats))
+
+    def test_stop_during_operation(self):
+        profiler = Profiler(self.outdir)
+        profiler.start()
+        profiler.enter()
+        profiler.stop()
+        self.assertEqual(profiler.files, [])
+        profiler.exit()
+        self.assertEqual(len(profiler.files), 1)
+
+    def test_window(self):
+        profiler = Profiler(self.outdir, window=0)
+        profiler.start()
+        profiler.enter()
+        profiler.exit()
+        self.assertEqual(len(profiler.files), 1)
+        profiler.stop()
+
+    def test_sampling(self):
+        profiler = Profiler(self.outdir, SAMPLING, interval=0.001)
+        profiler.start()
+        profiler.enter()
+        for i in range(20):
+            busy()
+        profiler.exit()
+        profiler.stop()
+        sleep(0.01)
+
+        with open(profiler.files[0]) as f:
+            lines = f.readlines()
+        self.assertTrue(any('profiler_test.py:busy' in l for l in lines))
+        for line in lines:
+            self.assertTrue(line.rsplit(" ", 1)[1].strip().isdigit())
+
+    def test_toggle_invalid(self):
+        with self.assertRaises(ValueError):
+            Profiler(self.outdir).toggle("maybe")
+
+class SlowOpLogTest(TestCase):
+    class Oper(object):
+        def fast(self, x):
+            return x
+
+        def slow(self, x):
+            sleep(0.01)
+            return self.fast(x)
+
+    def test_log(self):
+        logfile = os.path.join(tempfile.mkdtemp(), "slow.log")
+        log = SlowOpLog(0.005, logfile)
+        oper = log.wrap(self.Oper())
+        oper.slow(1)
+
+        log.begin()
+        self.assertEqual(oper.fast(2), 2)
+        log.end('getattr', '/fast', 0.001)
+        self.assertEqual(log.text(), "")
+
+        log.begin()
+        oper.slow(3)
+        log.end('read', '/slow', 0.01)
+        lines = log.text().splitlines()
+        self.assertTrue(lines[0].endswith(" read /slow 0.010000"))
+        self.assertTrue(lines[1].startswith("  Oper.slow(3,) "))
+        self.assertEqual(len(lines), 2)
+        with open(logfile) as f:
+            self.assertEqual(f.read(), log.text())
+        shutil.rmtree(os.path.dirname(logfile))
+
+if __name__ == "__main__":
+    main()
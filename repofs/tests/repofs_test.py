@@ -16,9 +16,13 @@
 #
 
 import os
+import json
+import shutil
+import tempfile
 
 from unittest import TestCase, main
 from os import mkdir, rmdir, path
+from stat import S_ISDIR, S_ISREG, S_ISLNK, S_IMODE, S_IWUSR
 from fuse import FuseOSError
 
 try:
@@ -26,7 +30,8 @@ try:
 except ImportError:
     import errno
 
-from repofs.repofs import RepoFS, RepoFSError
+from repofs.repofs import RepoFS, MEMORY_CHECK_INTERVAL, RepoFSError, ENOATTR
+from repofs.profiler import Profiler, SlowOpLog, SAMPLING
 from repofs.handlers.ref import RefHandler
 from repofs.handlers.commit_hash import CommitHashHandler
 from repofs.handlers.commit_date import CommitDateHandler
@@ -57,12 +62,73 @@ class RepoFSTestCase(TestCase):
     def hex_path(self, c):
         return os.path.join(c[:2], c[2:4], c[4:6])
 
+    def without_atime(self, st):
+        return dict((k, v) for k, v in st.items() if k != 'st_atime')
+
     def test_readdir(self):
-        self.assertEqual(sum(1 for _ in self.repofs.readdir('/', None)), 6)
+        self.assertEqual(sum(1 for _ in self.repofs.readdir('/', None)), 8)
         self.assertTrue('tags' in self.repofs.readdir('/', None))
         self.assertTrue('branches' in self.repofs.readdir('/', None))
         self.assertTrue('commits-by-date' in self.repofs.readdir('/', None))
         self.assertTrue('commits-by-hash' in self.repofs.readdir('/', None))
+        self.assertTrue('history' in self.repofs.readdir('/', None))
+        self.assertTrue('objects' in self.repofs.readdir('/', None))
+
+    def test_ancestors(self):
+        first_commit = self.first_commit.split("/")[-1]
+        recent = self.recent_commit_by_hash.split("/")[-1]
+        st = self.repofs.getattr(path.join(self.recent_commit_by_hash, '.git-ancestors',
+                                           first_commit))
+        self.assertTrue(S_ISLNK(st['st_mode']))
+        for metadir in ('.git-ancestors', '.git-parents'):
+            parent = first_commit if metadir == '.git-ancestors' else \
+                self.repofs._git.commit_parents(recent)[0]
+            self.assertEqual(self.repofs_nosym.readlink(path.join('/branches/heads/master',
+                                                                  metadir, parent)),
+                             path.join(self.repofs_nosym.mount, 'commits-by-hash', parent, ""))
+        with self.assertRaises(FuseOSError):
+            self.repofs.getattr(path.join('/commits-by-hash', first_commit,
+                                          '.git-ancestors', recent))
+        self.assertEqual(list(self.repofs.readdir(path.join(self.recent_commit_by_hash,
+                                                            '.git-ancestors'), None)),
+                         ['.', '..'])
+
+    def test_changes(self):
+        recent = self.recent_commit_by_hash.split("/")[-1]
+        parent = self.repofs._git.commit_parents(recent)[0]
+        changes = self.repofs._git.commit_changes(recent, parent)
+        self.assertIn(b'A\tdir_a/dir_b/dir_c/file_ca\n', changes)
+        for fs, commit_path in ((self.repofs, self.recent_commit_by_hash),
+                                (self.repofs, self.recent_commit),
+                                (self.repofs_nosym, '/branches/heads/master')):
+            changes_dir = path.join(commit_path, '.git-changes')
+            self.assertTrue(S_ISDIR(fs.getattr(changes_dir)['st_mode']))
+            self.assertEqual(list(fs.readdir(changes_dir, None))[2:], [parent])
+            st = fs.getattr(path.join(changes_dir, parent))
+            self.assertTrue(S_ISREG(st['st_mode']))
+            self.assertEqual(st['st_size'], len(changes))
+            self.assertEqual(fs.read(path.join(changes_dir, parent), 4096, 0, None), changes)
+            with self.assertRaises(FuseOSError):
+                fs.getattr(path.join(changes_dir, recent))
+
+    def test_diffstat(self):
+        recent = self.recent_commit_by_hash.split("/")[-1]
+        diffstat = self.repofs._git.diffstat(recent)
+        self.assertEqual(diffstat, b'0\t0\tdir_a/dir_b/dir_c/file_ca\n')
+        for fs, commit_path in ((self.repofs, self.recent_commit_by_hash),
+                                (self.repofs, self.recent_commit),
+                                (self.repofs_nosym, '/branches/heads/master')):
+            name = path.join(commit_path, '.git-diffstat')
+            # Computed only when read, so its size is reported as 0
+            self.assertEqual(fs.getattr(name)['st_size'], 0)
+            self.assertEqual(fs.read(name, 4096, 0, None), diffstat)
+
+        fs = RepoFS('test_repo', self.mount, False, False, False)
+        entries = dict((e[0], e[1]) for e in fs.readdir(self.recent_commit_by_hash, None)
+                       if isinstance(e, tuple))
+        self.assertTrue(S_ISREG(entries['.git-diffstat']['st_mode']))
+        fs.getattr(path.join(self.recent_commit_by_hash, '.git-diffstat'))
+        self.assertEqual(dict(fs.memory.usage())['diffstats'], 0)
 
     def test_target_from_symlink(self):
         first_commit = self.first_commit.split("/")[-1]
@@ -131,6 +197,313 @@ class RepoFSTestCase(TestCase):
         self.assertEqual(st['st_ctime'], ctime)
         self.assertNotEqual(st['st_atime'], ctime)
 
+    def test_file_mtimes(self):
+        ctime = self.repofs._git.get_commit_time(self.recent_commit_by_hash.split("/")[-1])
+        # Files are as old as the last commit that changed them
+        changed = self.repofs._git.cached_command(['log', '-1', '--format=%H', 'master', '--',
+                                                   'file_a']).strip()
+        fs = RepoFS('test_repo', self.mount, False, False, False, file_mtimes=True)
+        st = fs.getattr(self.recent_commit + "/file_a")
+        self.assertEqual(st['st_mtime'], self.repofs._git.get_commit_time(changed))
+        self.assertLess(st['st_mtime'], ctime)
+        self.assertEqual(st['st_ctime'], ctime)
+        self.assertEqual(fs.getattr(self.recent_commit + "/dir_a")['st_mtime'], ctime)
+
+        fs_nosym = RepoFS('test_repo', self.mount3, False, True, False, file_mtimes=True)
+        st = fs_nosym.getattr("/branches/heads/master/file_a")
+        self.assertEqual(st['st_mtime'], self.repofs._git.get_commit_time(changed))
+
+        entries = dict((e[0], e[1]) for e in fs.readdir(self.recent_commit, None)
+                       if isinstance(e, tuple))
+        self.assertLess(entries['file_a']['st_mtime'], ctime)
+        self.assertEqual(entries['dir_a']['st_mtime'], ctime)
+        self.assertEqual(entries['.git-parents']['st_mtime'], ctime)
+        self.assertEqual(self.without_atime(entries['file_a']),
+                         self.without_atime(fs.getattr(self.recent_commit + "/file_a")))
+
+    def test_readdir_attributes(self):
+        ctime = self.repofs._git.get_commit_time(self.recent_commit_by_hash.split("/")[-1])
+        entries = dict((e[0], e[1]) for e in self.repofs.readdir(self.recent_commit, None)
+                       if isinstance(e, tuple))
+        self.assertTrue(S_ISDIR(entries['dir_a']['st_mode']))
+        self.assertTrue(S_ISDIR(entries['.git-parents']['st_mode']))
+        self.assertTrue(S_ISREG(entries['file_a']['st_mode']))
+        self.assertEqual(entries['file_a']['st_size'], 9)
+        self.assertEqual(entries['file_a']['st_mtime'], ctime)
+        self.assertFalse('link_a' in entries)
+        self.assertEqual(self.without_atime(entries['file_a']),
+                self.without_atime(self.repofs.getattr(self.recent_commit + "/file_a")))
+
+        day = '/commits-by-date/2009/10/11'
+        for name, st, offset in list(self.repofs.readdir(day, None))[2:]:
+            self.assertTrue(S_ISDIR(st['st_mode']))
+            self.assertEqual(st['st_mtime'], self.repofs._git.get_commit_time(name))
+            self.assertEqual(self.without_atime(st),
+                    self.without_atime(self.repofs.getattr(path.join(day, name))))
+
+        self.assertEqual(list(self.repofs.readdir('/commits-by-date/2009', None))[2], '01')
+
+    def test_inodes(self):
+        # Files with the same contents are the same file in every commit
+        st = self.repofs.getattr(self.recent_commit + "/file_a")
+        self.assertEqual(st['st_nlink'], 2)
+        self.assertEqual(st['st_ino'], self.repofs.getattr(self.second_commit + "/file_a")['st_ino'])
+        self.assertNotEqual(st['st_ino'], self.repofs.getattr(self.first_commit + "/file_a")['st_ino'])
+        self.assertEqual(self.repofs.getattr(self.first_commit + "/file_a")['st_ino'],
+                         self.repofs.getattr(self.first_commit + "/file_b")['st_ino'])
+        self.assertEqual(st['st_ino'], self.repofs_nosym.getattr("/branches/heads/master/file_a")['st_ino'])
+
+        # A commit's directory is the same wherever it is reached
+        master = self.repofs._git.commit_of_ref("master").split("/")[-1]
+        st = self.repofs.getattr("/commits-by-hash/" + master)
+        self.assertEqual(st['st_nlink'], 1)
+        self.assertEqual(st['st_ino'], self.repofs_htree.getattr(
+            os.path.join("/commits-by-hash", self.hex_path(master), master))['st_ino'])
+        self.assertEqual(st['st_ino'], self.repofs_nosym.getattr("/branches/heads/master")['st_ino'])
+        entries = dict((e[0], e[1]) for e in self.repofs.readdir("/commits-by-hash", None)
+                       if isinstance(e, tuple))
+        self.assertEqual(entries[master]['st_ino'], st['st_ino'])
+
+        st = self.repofs.getattr("/commits-by-hash/" + master + "/.author")
+        self.assertEqual(st['st_nlink'], 1)
+        self.assertNotEqual(st['st_ino'], self.repofs.getattr(self.first_commit + "/.author")['st_ino'])
+        self.assertNotEqual(self.repofs.getattr("/branches")['st_ino'],
+                            self.repofs.getattr("/tags")['st_ino'])
+
+    def test_inodes_idle(self):
+        repofs = RepoFS('test_repo', self.mount, False, False, False, idle_timeout=None)
+        path = self.recent_commit + "/file_a"
+        ino = repofs('getattr', path)['st_ino']
+        self.assertGreater(dict(repofs.memory.usage())['inodes'], 0)
+        # Idle mounts forget inode numbers and hand out the same ones again
+        repofs.memory.shrink()
+        self.assertEqual(dict(repofs.memory.usage())['inodes'], 0)
+        self.assertEqual(repofs('getattr', path)['st_ino'], ino)
+
+    def test_xattrs(self):
+        master = self.repofs._git.commit_of_ref("master").split("/")[-1]
+        commit = "/commits-by-hash/" + master
+        self.assertEqual(self.repofs.listxattr(commit + "/file_a"),
+                         ['user.git.oid', 'user.git.type', 'user.git.mode'])
+        self.assertEqual(self.repofs.getxattr(commit + "/file_a", 'user.git.oid'),
+                         self.repofs._git.cached_command(['rev-parse', 'master:file_a']).strip().encode())
+        self.assertEqual(self.repofs.getxattr(commit + "/file_a", 'user.git.type'), b'blob')
+        self.assertEqual(self.repofs.getxattr(commit + "/file_a", 'user.git.mode'), b'100644')
+        self.assertEqual(self.repofs.getxattr(commit + "/link_a", 'user.git.mode'), b'120000')
+        self.assertEqual(self.repofs.getxattr(commit + "/dir_a", 'user.git.mode'), b'040000')
+        with self.assertRaises(FuseOSError):
+            self.repofs.getxattr(commit + "/file_a", 'user.git.tree_size')
+
+        # Sizes of trees add up those of the blobs under them
+        sizes = self.repofs._git.cached_command(['ls-tree', '-r', '-l', 'master'])
+        total = sum(int(line.split()[3]) for line in sizes.splitlines())
+        self.assertEqual(self.repofs.getxattr(commit, 'user.git.tree_size'), str(total).encode())
+        self.assertEqual(self.repofs.getxattr(commit, 'user.git.oid'), master.encode())
+        self.assertEqual(self.repofs.getxattr(commit, 'user.git.type'), b'commit')
+        self.assertNotIn('user.git.mode', self.repofs.listxattr(commit))
+        self.assertEqual(self.repofs.getxattr(commit + "/dir_a", 'user.git.tree_size'), b'0')
+        self.assertEqual(self.repofs_nosym.getxattr("/branches/heads/master", 'user.git.tree_size'),
+                         str(total).encode())
+
+        self.assertEqual(self.repofs.listxattr("/branches"), [])
+        self.assertEqual(self.repofs.listxattr(commit + "/.author"), [])
+        with self.assertRaises(FuseOSError):
+            self.repofs.getxattr("/branches", 'user.git.oid')
+        with self.assertRaises(FuseOSError):
+            self.repofs.listxattr(commit + "/file_z")
+
+        # Other attributes are refused without looking the path up
+        def fail(path):
+            self.fail("looked up " + path)
+        self.repofs._object_attributes = fail
+        with self.assertRaises(FuseOSError) as cm:
+            self.repofs.getxattr(commit + "/file_a", 'security.selinux')
+        self.assertEqual(cm.exception.errno, ENOATTR)
+
+    def test_abbreviated_hash(self):
+        commit = self.recent_commit_by_hash.split("/")[-1]
+        short = "/commits-by-hash/" + commit[:7]
+        self.assertTrue(S_ISLNK(self.repofs.getattr(short)['st_mode']))
+        self.assertEqual(self.repofs.readlink(short),
+                         path.join(self.mount, "commits-by-hash", commit))
+        names = [e[0] if isinstance(e, tuple) else e
+                 for e in self.repofs.readdir("/commits-by-hash", None)]
+        self.assertIn(commit, names)
+        self.assertNotIn(commit[:7], names)
+        short = path.join("/commits-by-hash", self.hex_path(commit), commit[:8])
+        self.assertEqual(self.repofs_htree.readlink(short),
+                         path.join(self.mount2, "commits-by-hash", self.hex_path(commit), commit))
+        with self.assertRaises(FuseOSError):
+            self.repofs.getattr("/commits-by-hash/" + commit[:3])
+
+    def test_objects(self):
+        master = "/commits-by-hash/" + self.repofs._git.commit_of_ref("master").split("/")[-1]
+        blob = self.repofs.getxattr(master + "/file_a", 'user.git.oid').decode()
+        tree = self.repofs.getxattr(master + "/dir_a", 'user.git.oid').decode()
+        st = self.repofs.getattr("/objects/" + blob)
+        self.assertTrue(S_ISREG(st['st_mode']))
+        self.assertEqual(st['st_size'], 9)
+        self.assertEqual(st['st_ino'], self.repofs.getattr(master + "/file_a")['st_ino'])
+        self.assertEqual(self.repofs.read("/objects/" + blob, 9, 0, None), b"Contents\n")
+        self.assertEqual(self.repofs.getxattr("/objects/" + blob, 'user.git.type'), b'blob')
+
+        self.assertTrue(S_ISDIR(self.repofs.getattr("/objects/" + tree)['st_mode']))
+        self.assertEqual(self.repofs.getattr("/objects/" + tree)['st_ino'],
+                         self.repofs.getattr(master + "/dir_a")['st_ino'])
+        entries = dict((e[0], e[1]) for e in self.repofs.readdir("/objects/" + tree, None)
+                       if isinstance(e, tuple))
+        self.assertEqual(sorted(entries), ['dir_b', 'file_aa'])
+        self.assertEqual(self.without_atime(entries['dir_b']),
+                         self.without_atime(self.repofs.getattr("/objects/%s/dir_b" % tree)))
+        self.assertTrue(S_ISREG(self.repofs.getattr("/objects/%s/dir_b/dir_c/file_ca" % tree)['st_mode']))
+
+        root = self.repofs.getxattr(master, 'user.git.oid').decode()
+        root_tree = self.repofs._git.entry_id(root, '')
+        link = "/objects/%s/link_a" % root_tree
+        self.assertTrue(S_ISLNK(self.repofs.getattr(link)['st_mode']))
+        self.assertEqual(self.repofs.readlink(link), path.join(self.mount, "objects", root_tree,
+                         self.repofs.read(master + "/link_a", 100, 0, None).decode()))
+        self.assertEqual(list(self.repofs.readdir("/objects", None)), ['.', '..'])
+        htree = os.path.join("/objects", self.hex_path(blob), blob)
+        self.assertEqual(self.repofs_htree.read(htree, 9, 0, None), b"Contents\n")
+        self.assertEqual(len(list(self.repofs_htree.readdir("/objects/ab", None))), 258)
+
+        for missing in ["0" * 40, "file_a", root, blob + "/file_a", tree + "/file_z"]:
+            with self.assertRaises(FuseOSError):
+                self.repofs.getattr("/objects/" + missing)
+        with self.assertRaises(FuseOSError):
+            self.repofs_htree.getattr(os.path.join("/objects/00/00/00", blob))
+
+    def test_ref_refresh(self):
+        repofs = RepoFS('test_repo', self.mount3, False, True, False, ref_ttl=3600)
+        list(repofs.readdir('/branches/heads/master', None))
+        list(repofs.readdir(self.recent_commit, None))
+        self.assertTrue('/branches/heads/master/file_a' in repofs._stats)
+        self.assertTrue(self.recent_commit + '/file_a' in repofs._stats)
+
+        repofs.policy.ref_ttl = 0
+        repofs.getattr('/branches/heads/master')
+        self.assertFalse('/branches/heads/master/file_a' in repofs._stats)
+        self.assertTrue(self.recent_commit + '/file_a' in repofs._stats)
+
+    def test_open(self):
+        class FileInfo(object):
+            keep_cache = 0
+            direct_io = 0
+        fi = FileInfo()
+        self.repofs.open(self.recent_commit_by_hash + '/file_a', fi)
+        self.assertTrue(fi.keep_cache)
+        self.assertFalse(fi.direct_io)
+        self.repofs_nosym.open('/branches/heads/master/file_a', fi)
+        self.assertFalse(fi.keep_cache)
+        for fs, name in ((self.repofs, self.recent_commit_by_hash + '/.git-diffstat'),
+                         (self.repofs_nosym, '/branches/heads/master/.git-diffstat'),
+                         (self.repofs, '/.repofs/stats')):
+            fs.open(name, fi)
+            self.assertTrue(fi.direct_io)
+        self.repofs.open(self.recent_commit_by_hash + '/.author', fi)
+        self.assertFalse(fi.direct_io)
+
+    def test_stats(self):
+        self.repofs('getattr', self.recent_commit + '/file_a')
+        self.repofs('readdir', '/tags', None)
+        with self.assertRaises(FuseOSError):
+            self.repofs('getattr', '/foobar')
+
+        stats = self.repofs.stats
+        self.assertEqual(stats.op_count('getattr', 'commits-by-date'), 1)
+        self.assertEqual(stats.op_count('readdir', 'tags'), 1)
+        self.assertEqual(stats.op_count('getattr', 'other'), 1)
+        self.assertGreater(stats.command_count(), 0)
+
+        text = self.repofs.read('/.repofs/stats', 100000, 0, None).decode('utf-8')
+        self.assertTrue('repofs_op_errors_total{op="getattr",namespace="other"} 1' in text)
+        self.assertTrue('\nrepofs_libgit2_cached_bytes ' in text)
+        snap = json.loads(self.repofs.read('/.repofs/stats.json', 100000, 0, None))
+        self.assertEqual(len(snap['ops']), 3)
+        self.assertEqual(snap['gauges']['libgit2_cache_max_bytes'],
+                         self.repofs.git_settings.values['git-cache'])
+
+        self.assertTrue(S_ISDIR(self.repofs.getattr('/.repofs')['st_mode']))
+        self.assertTrue(S_ISREG(self.repofs.getattr('/.repofs/stats')['st_mode']))
+        self.assertEqual(list(self.repofs.readdir('/.repofs', None)),
+                         ['.', '..', 'control', 'memory', 'profile', 'slow-ops', 'stats', 'stats.json'])
+        with self.assertRaises(FuseOSError):
+            self.repofs.getattr('/.repofs/foo')
+        self.assertFalse('.repofs' in self.repofs.readdir('/', None))
+
+    def test_attributes_cache_size(self):
+        repofs = RepoFS('test_repo', self.mount, False, False, False)
+        repofs.attributes_cache_size = 3
+        repofs('readdir', self.recent_commit, None)
+        self.assertEqual(len(repofs._stats), 3)
+        first = next(iter(repofs._stats))
+        repofs('getattr', first)
+        repofs('readdir', self.recent_commit + '/dir_a', None)
+        # The most recently used attributes are kept
+        self.assertEqual(len(repofs._stats), 3)
+        self.assertTrue(first in repofs._stats)
+        self.assertTrue(S_ISREG(repofs('getattr', self.recent_commit + '/file_a')['st_mode']))
+
+    def test_memory(self):
+        repofs = RepoFS('test_repo', self.mount, False, False, False,
+                        memory_limit=10 ** 9, idle_timeout=None)
+        repofs('readdir', self.recent_commit, None)
+        self.assertGreater(len(repofs._stats), 0)
+        text = repofs('read', '/.repofs/memory', 100000, 0, None).decode('utf-8')
+        usage = dict(line.split()[:2] for line in text.splitlines())
+        self.assertGreater(int(usage['attributes']), 0)
+        self.assertEqual(usage['limit'], str(10 ** 9))
+
+        repofs.memory.limit = 0
+        for i in range(MEMORY_CHECK_INTERVAL):
+            repofs('getattr', '/', None)
+        self.assertEqual(repofs._stats, {})
+        self.assertEqual(repofs._git._trees, {})
+        self.assertTrue(S_ISREG(repofs('getattr', self.recent_commit + '/file_a')['st_mode']))
+
+    def test_profile(self):
+        outdir = tempfile.mkdtemp()
+        repofs = RepoFS('test_repo', self.mount, False, False, False,
+                        profiler=Profiler(outdir), slow_ops=SlowOpLog(0))
+        self.assertFalse(S_IMODE(repofs.getattr('/.repofs/stats')['st_mode']) & S_IWUSR)
+        self.assertFalse(S_IMODE(repofs.getattr('/.repofs/profile')['st_mode']) & S_IWUSR)
+        self.assertTrue(S_IMODE(repofs.getattr('/.repofs/control')['st_mode']) & S_IWUSR)
+        with self.assertRaises(FuseOSError):
+            repofs('write', '/.repofs/stats', b'on', 0, None)
+        with self.assertRaises(FuseOSError):
+            repofs('write', self.recent_commit + '/file_a', b'on', 0, None)
+        with self.assertRaises(FuseOSError):
+            repofs('write', '/.repofs/profile', b'on', 0, None)
+        with self.assertRaises(FuseOSError):
+            repofs('write', '/.repofs/control', b'profile maybe', 0, None)
+
+        repofs('truncate', '/.repofs/control', 0)
+        self.assertEqual(repofs('write', '/.repofs/control', b'profile on\n', 0, None), 11)
+        self.assertTrue(repofs.read('/.repofs/profile', 100, 0, None).startswith(b'on '))
+        repofs('getattr', self.recent_commit + '/file_a')
+        repofs('write', '/.repofs/control', b'profile off', 0, None)
+        self.assertFalse(repofs.profiler.enabled)
+        self.assertEqual(len(repofs.profiler.files), 1)
+
+        slow = repofs.read('/.repofs/slow-ops', 100000, 0, None).decode('utf-8')
+        self.assertTrue(' getattr %s/file_a ' % self.recent_commit in slow)
+        self.assertTrue('CommitDateHandler.is_dir()' in slow)
+        self.assertTrue('GitOperations.is_dir(' in slow)
+        shutil.rmtree(outdir)
+
+    def test_profile_init(self):
+        outdir = tempfile.mkdtemp()
+        repofs = RepoFS('test_repo', self.mount, False, False, False,
+                        profiler=Profiler(outdir, SAMPLING), profile=True,
+                        idle_timeout=None)
+        # The sampler thread is started once FUSE serves the mount
+        self.assertFalse(repofs.profiler.enabled)
+        repofs.init('/')
+        self.assertTrue(repofs.profiler.enabled)
+        repofs.profiler.stop()
+        shutil.rmtree(outdir)
+
     def test_get_handler(self):
         self.assertTrue(isinstance(self.repofs._get_handler("/commits-by-hash"), CommitHashHandler))
         self.assertTrue(isinstance(self.repofs._get_handler("/commits-by-hash/foo"), CommitHashHandler))
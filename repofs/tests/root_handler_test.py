@@ -22,7 +22,7 @@ class RootHandlerTest(TestCase):
     def test_handler(self):
         handler = RootHandler()
         self.assertTrue(handler.is_dir())
-        self.assertEqual(handler.readdir(), ['commits-by-date', 'commits-by-hash', 'branches', 'tags'])
+        self.assertEqual(handler.readdir(), ['commits-by-date', 'commits-by-hash', 'branches', 'tags', 'history', 'objects'])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+
+from unittest import TestCase, main
+
+from repofs.stats import Histogram, Stats
+
+class HistogramTest(TestCase):
+    def test_add(self):
+        h = Histogram((1, 2))
+        for value in [0.5, 1, 1.5, 3]:
+            h.add(value)
+        self.assertEqual(h.counts, [2, 1, 1])
+        self.assertEqual(h.count, 4)
+        self.assertEqual(h.sum, 6)
+        self.assertEqual(h.cumulative(), [(1, 2), (2, 3), (float('inf'), 4)])
+
+    def test_quantile(self):
+        h = Histogram((1, 2))
+        self.assertEqual(h.quantile(0.5), 0)
+        for value in [0.5, 0.5, 1.5, 3]:
+            h.add(value)
+        self.assertEqual(h.quantile(0.5), 1)
+        self.assertEqual(h.quantile(0.75), 2)
+        self.assertEqual(h.quantile(1), float('inf'))
+
+class StatsTest(TestCase):
+    def setUp(self):
+        self.stats = Stats()
+        self.stats.record_op('getattr', 'tags', 0.001)
+        self.stats.record_op('getattr', 'tags', 0.002, error=True)
+        self.stats.record_op('read', 'commits-by-hash', 0.01)
+        self.stats.record_command('log', 0.1)
+        self.stats.cache_hit('commands')
+        self.stats.cache_hit('commands')
+        self.stats.cache_hit('commands')
+        self.stats.cache_miss('commands')
+
+    def test_counts(self):
+        self.assertEqual(self.stats.op_count('getattr'), 2)
+        self.assertEqual(self.stats.op_count('getattr', 'branches'), 0)
+        self.assertEqual(self.stats.op_count('read', 'commits-by-hash'), 1)
+        self.assertEqual(self.stats.command_count(), 1)
+        self.assertEqual(self.stats.command_count('for-each-ref'), 0)
+
+    def test_snapshot(self):
+        snap = json.loads(self.stats.to_json())
+        getattr_tags = snap['ops'][0]
+        self.assertEqual((getattr_tags['op'], getattr_tags['namespace']), ('getattr', 'tags'))
+        self.assertEqual(getattr_tags['count'], 2)
+        self.assertEqual(getattr_tags['errors'], 1)
+        self.assertEqual(getattr_tags['buckets'][-1], ['+Inf', 2])
+        self.assertEqual(snap['commands'][0]['command'], 'log')
+        self.assertEqual(snap['caches'], [dict(cache='commands', hits=3, misses=1, hit_ratio=0.75)])
+
+    def test_text(self):
+        text = self.stats.to_text()
+        self.assertTrue('repofs_op_errors_total{op="getattr",namespace="tags"} 1\n' in text)
+        self.assertTrue('repofs_op_duration_seconds_count{op="read",namespace="commits-by-hash"} 1\n' in text)
+        self.assertTrue('repofs_op_duration_seconds_bucket{op="getattr",namespace="tags",le="+Inf"} 2\n'
+                        in text)
+        self.assertTrue('repofs_git_command_duration_seconds_count{command="log"} 1\n' in text)
+        self.assertTrue('repofs_cache_hits_total{cache="commands"} 3\n' in text)
+
+    def test_gauges(self):
+        self.assertEqual(self.stats.snapshot()['gauges'], {})
+        self.stats.add_gauges(lambda: {'pack_bytes': 42})
+        self.assertEqual(self.stats.snapshot()['gauges'], {'pack_bytes': 42})
+        self.assertTrue(self.stats.to_text().endswith('repofs_pack_bytes 42\n'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase, main
+
+from repofs.repofs import RepoFS
+from repofs.replay import Replayer, format_report, quantile
+from repofs.trace import TraceRecorder, TraceEntry, read_trace
+
+
+class TraceTest(TestCase):
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outdir)
+
+    def _roundtrip(self, name):
+        filename = os.path.join(self.outdir, name)
+        recorder = TraceRecorder(filename)
+        recorder.record_call('getattr', '/branches', (None,))
+        recorder.record_call('read', '/a\tb\\c\n', (4096, 8192, None))
+        recorder.close()
+        entries = list(read_trace(filename))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0][2:], ('getattr', '/branches', 0, 0))
+        self.assertEqual(entries[1][2:], ('read', '/a\tb\\c\n', 8192, 4096))
+        self.assertLessEqual(entries[0].time, entries[1].time)
+
+    def test_roundtrip(self):
+        self._roundtrip('trace')
+
+    def test_compressed(self):
+        self._roundtrip('trace.gz')
+
+    def test_quantile(self):
+        self.assertEqual(quantile([], 0.5), 0.0)
+        values = list(range(100))
+        self.assertEqual(quantile(values, 0.5), 50)
+        self.assertEqual(quantile(values, 0.99), 99)
+        self.assertEqual(quantile(values, 0.999), 99)
+
+    def test_record_and_replay(self):
+        filename = os.path.join(self.outdir, 'trace')
+        fs = RepoFS('test_repo', 'mnt', False, False, False,
+                    trace=TraceRecorder(filename))
+        fs('readdir', '/branches/heads', None)
+        fs('getattr', '/branches/heads/master', None)
+        fs('readlink', '/branches/heads/master')
+        with self.assertRaises(Exception):
+            fs('getattr', '/no-such-entry', None)
+        fs.destroy('/')
+
+        entries = list(read_trace(filename))
+        self.assertEqual([e.op for e in entries],
+                         ['readdir', 'getattr', 'readlink', 'getattr'])
+
+        entries.append(TraceEntry(0, 0, 'statfs', '/', 0, 0))
+        fs = RepoFS('test_repo', 'mnt', False, False, False)
+        replayer = Replayer(fs)
+        replayer.replay(entries)
+        fs.destroy('/')
+
+        report = replayer.report()
+        self.assertEqual(report['count'], 4)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(report['skipped'], 1)
+        self.assertEqual(report['ops']['getattr']['count'], 2)
+        self.assertEqual(report['ops']['getattr']['errors'], 1)
+        self.assertGreater(report['ops_per_second'], 0)
+        self.assertLessEqual(report['p50'], report['max'])
+        self.assertIn("readlink", format_report(report))
+
+if __name__ == "__main__":
+    main()
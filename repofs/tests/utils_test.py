@@ -18,7 +18,8 @@
 from unittest import TestCase, main
 
 from repofs.utils import demux_ref_path, is_metadata_dir, is_metadata_symlink, \
-        demux_commits_by_hash_path, demux_commits_by_date_path, metadata_names
+        demux_commits_by_hash_path, demux_commits_by_date_path, metadata_names, \
+        is_metadata_file
 from repofs.handlers.ref import BRANCH_REFS, TAG_REFS
 from repofs.gitoper import GitOperations
 
@@ -72,6 +73,23 @@ class UtilsTest(TestCase):
                 'commit_path': "dir_a/dir_b"
             })
 
+    def test_demux_ref_path_index(self):
+        for refs in (BRANCH_REFS, TAG_REFS):
+            index = self.gitoper.ref_index(refs)
+            for path in ("heads/feature/a/dir_a/dir_b", "heads/master", "heads",
+                         "foo/bar/bar/foo", "foo", "", "tags/t20091011ca",
+                         "tags/tdir/tname/dir_a/dir_b", "tags/tdir"):
+                self.assertEqual(demux_ref_path(path, index),
+                                 demux_ref_path(path, self.gitoper.refs(refs)))
+
+        index = self.gitoper.ref_index(BRANCH_REFS)
+        self.assertTrue(index.is_prefix("heads/feature"))
+        self.assertFalse(index.is_prefix("heads/feature/a"))
+        self.assertFalse(index.is_prefix(""))
+        self.assertTrue(index.is_ref("heads/feature/a"))
+        self.assertFalse(index.is_ref("heads/feature"))
+        self.assertEqual(sorted(index.next_elements("")), ["heads"])
+
     def test_demux_commits_by_hash_path(self):
         # no hash trees
         self.assertEqual(demux_commits_by_hash_path("", False), {
@@ -160,11 +178,19 @@ class UtilsTest(TestCase):
 
     def test_metadata_names(self):
         self.assertEqual(metadata_names(),
-                    [".git-parents", ".git-descendants", ".git-names", ".author", ".author-email"])
+                    [".git-parents", ".git-descendants", ".git-names", ".git-ancestors",
+                     ".git-changes", ".author", ".author-email", ".git-diffstat"])
 
     def test_is_metadata_symlink(self):
         self.assertTrue(is_metadata_symlink(".git-parents/commit", ["commit"]))
         self.assertFalse(is_metadata_symlink(".git-parents/commit", ["anothercommit"]))
+        self.assertFalse(is_metadata_symlink(".git-changes/commit", ["commit"]))
+
+    def test_is_metadata_file(self):
+        self.assertTrue(is_metadata_file(".author"))
+        self.assertTrue(is_metadata_file(".git-changes/commit"))
+        self.assertFalse(is_metadata_file(".git-parents/commit"))
+        self.assertFalse(is_metadata_file(".git-changes"))
 
 if __name__ == "__main__":
     main()
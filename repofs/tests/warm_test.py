@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import errno
+import os
+import threading
+
+from unittest import TestCase, main
+
+from repofs.repofs import RepoFS
+from repofs.warm import Warmer
+
+
+class WarmerTest(TestCase):
+    def setUp(self):
+        self.mount = 'mnt'
+        try:
+            os.mkdir(self.mount)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise e
+        self.repofs = RepoFS('test_repo', self.mount, False, False, False)
+        self.master = self.repofs._git.commit_of_ref('heads/master')
+
+    def tearDown(self):
+        self.repofs.destroy('/')
+
+    def test_resolve(self):
+        warmer = Warmer(self.repofs)
+        self.assertEqual(warmer.resolve('heads/master'), [self.master])
+        self.assertEqual(warmer.resolve(self.master), [self.master])
+        self.assertGreater(len(warmer.resolve('tags/t20050607..heads/master')), 1)
+        for name in ('heads/nothing', 'heads/master..tags/t20050607'):
+            with self.assertRaises(ValueError):
+                warmer.resolve(name)
+
+    def test_warm(self):
+        report = Warmer(self.repofs, jobs=3).warm('heads/master')
+        self.assertEqual(report['commits'], [self.master])
+        self.assertEqual(report['dirs'], 4)
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['blobs'], 0)
+        root = '/commits-by-hash/' + self.master
+        self.assertTrue(root + '/dir_a/dir_b/dir_c/file_ca' in self.repofs._stats)
+        self.assertFalse(any(path.startswith(root + '/.git-parents/')
+                             for path in self.repofs._stats))
+        self.assertEqual(dict(self.repofs.memory.usage())['blobs'], 0)
+        self.assertTrue(Warmer.format(report).startswith(
+            'heads/master %s: 4 directories, ' % self.master))
+
+    def test_warm_attributes_full(self):
+        self.repofs.attributes_cache_size = 5
+        report = Warmer(self.repofs).warm('tags/t20050607..heads/master')
+        self.assertFalse(report['complete'])
+        self.assertEqual(report['dirs'], 1)
+        self.assertTrue(Warmer.format(report).endswith(", stopped once the caches were full"))
+
+    def test_warm_single_thread(self):
+        threads = set()
+        entry_stats = self.repofs.entry_stats
+        def record(path):
+            threads.add(threading.current_thread())
+            return entry_stats(path)
+        self.repofs.entry_stats = record
+        Warmer(self.repofs, jobs=3).warm('heads/master')
+        self.assertEqual(threads, set([threading.current_thread()]))
+
+    def test_warm_range(self):
+        warmer = Warmer(self.repofs)
+        commits = warmer.resolve('tags/t20050607..heads/master')
+        report = warmer.warm('tags/t20050607..heads/master')
+        self.assertEqual(report['commits'], commits)
+        self.assertTrue(Warmer.format(report).startswith(
+            'tags/t20050607..heads/master %d commits: ' % len(commits)))
+        for commit in commits:
+            self.assertTrue('/commits-by-hash/%s/file_a' % commit in self.repofs._stats)
+
+    def test_warm_blobs(self):
+        report = Warmer(self.repofs, jobs=2, blobs=True).warm('heads/master')
+        self.assertGreater(report['blobs'], 0)
+        self.assertEqual(dict(self.repofs.memory.usage())['blobs'] > 0, True)
+        self.assertTrue(Warmer.format(report).endswith(
+            ', %d blobs of %d bytes' % (report['blobs'], report['blob_bytes'])))
+        self.assertEqual(self.repofs('read', '/commits-by-hash/%s/file_a' % self.master,
+                                     100, 0, None), b'Contents\n')
+        self.assertEqual(self.repofs.stats.snapshot()['caches'][0]['hits'], 1)
+
+    def test_memory_limit(self):
+        self.repofs.memory.limit = 1
+        report = Warmer(self.repofs, blobs=True).warm('tags/t20050607..heads/master')
+        self.assertFalse(report['complete'])
+        self.assertEqual(report['dirs'], 1)
+        self.assertEqual(report['blobs'], 0)
+        self.assertTrue(Warmer.format(report).endswith(', stopped once the caches were full'))
+
+if __name__ == "__main__":
+    main()
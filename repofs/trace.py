@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import gzip
+import threading
+
+from collections import namedtuple
+from time import perf_counter
+
+# A recorded operation; time is in seconds since recording started
+TraceEntry = namedtuple('TraceEntry', ['time', 'thread', 'op', 'path', 'offset', 'size'])
+
+# Records written between flushes of the trace file
+FLUSH_EVERY = 1000
+
+
+def _open(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't', encoding='utf-8')
+    return open(filename, mode, encoding='utf-8')
+
+
+class TraceRecorder(object):
+    """
+    Writes every FUSE operation to a trace file, one tab-separated line
+    per operation: time in microseconds since recording started, thread,
+    operation, path, offset and size.  Paths have their tabs, newlines
+    and backslashes escaped.  Files named *.gz are compressed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = _open(filename, 'w')
+        self._start = perf_counter()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, op, path, offset=0, size=0):
+        t = int((perf_counter() - self._start) * 1000000)
+        path = (path or "").replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+        line = "%d\t%d\t%s\t%s\t%d\t%d\n" % (t, threading.get_ident(), op, path,
+                                             offset, size)
+        with self._lock:
+            self._file.write(line)
+            self._count += 1
+            if self._count % FLUSH_EVERY == 0:
+                self._file.flush()
+
+    def record_call(self, op, path, args):
+        """ Record an operation given its FUSE arguments. """
+        if op == 'read':
+            self.record(op, path, args[1], args[0])
+        elif op == 'write':
+            self.record(op, path, args[1], len(args[0]))
+        else:
+            self.record(op, path)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def _unescape(path):
+    result = []
+    i = 0
+    while i < len(path):
+        c = path[i]
+        if c == "\\" and i + 1 < len(path):
+            i += 1
+            c = {"t": "\t", "n": "\n"}.get(path[i], path[i])
+        result.append(c)
+        i += 1
+    return "".join(result)
+
+
+def read_trace(filename):
+    """ Yield the TraceEntry records of a trace file. """
+    with _open(filename, 'r') as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 6:
+                continue
+            yield TraceEntry(int(fields[0]) / 1000000.0, int(fields[1]), fields[2],
+                             _unescape(fields[3]), int(fields[4]), int(fields[5]))
@@ -15,8 +15,19 @@
 # limitations under the License.
 #
 
-metadata_dirs = ['.git-parents', '.git-descendants', '.git-names']
-metadata_files = ['.author', '.author-email']
+import re
+
+from repofs.ref_index import RefIndex
+
+metadata_dirs = ['.git-parents', '.git-descendants', '.git-names', '.git-ancestors',
+                 '.git-changes']
+metadata_files = ['.author', '.author-email', '.git-diffstat']
+# Metadata directories that hold files rather than symbolic links
+metadata_file_dirs = ['.git-changes']
+# Metadata files computed only when read; their size is reported as 0
+generated_files = ['.git-diffstat']
+# A full SHA-1 or SHA-256 object id
+OBJECT_ID = re.compile('^([0-9a-f]{40}|[0-9a-f]{64})$')
 
 def get_full_ref(path, refs):
     elements = path.split("/")
@@ -29,10 +40,15 @@ def get_full_ref(path, refs):
     return ""
 
 def demux_ref_path(path, refs):
+    """ Split a path under a ref namespace; refs is the list of refs
+    or their RefIndex. """
     elements = path.split("/")
     ref_type = elements[0]
 
-    full_ref = get_full_ref(path, refs)
+    if isinstance(refs, RefIndex):
+        full_ref = refs.full_ref(path)
+    else:
+        full_ref = get_full_ref(path, refs)
 
     if full_ref:
         commit_path = "/".join(elements[len(full_ref.split("/")):])
@@ -88,6 +104,7 @@ def is_metadata_symlink(path, commits):
     elements = path.split("/")
     if (len(elements) != 2 or
             elements[0] not in metadata_dirs or
+            elements[0] in metadata_file_dirs or
             elements[1] not in commits):
         return False
     return True
@@ -100,9 +117,14 @@ def is_metadata_dir(path):
 
 def is_metadata_file(path):
     elements = path.split("/")
+    if len(elements) == 2 and elements[0] in metadata_file_dirs:
+        return True
     if len(elements) != 1 or elements[0] not in metadata_files:
         return False
     return True
 
+def is_generated_file(path):
+    return path in generated_files
+
 def metadata_names():
     return metadata_dirs + metadata_files
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#
+# Copyright 2017-2021 Vitalis Salis and Diomidis Spinellis
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from stat import S_ISDIR
+
+from repofs import utils
+from repofs.catfile import POOL_SIZE
+
+# Directories listed between checks of the memory limit
+MEMORY_CHECK_INTERVAL = 100
+
+# Blobs read from git cat-file by each worker at a time
+BLOB_BATCH = 100
+
+# Worker threads reading blobs for repofs --warm-blobs; as many as
+# cat-file processes
+WARM_JOBS = POOL_SIZE
+
+
+class Warmer(object):
+    """
+    Fills the caches of a RepoFS instance with the trees of commits,
+    listing every directory of a commit as readdir would, so that the
+    trees, sizes and attributes of its entries are cached.  With blobs
+    set the contents of the files are also read, as far as the blob
+    cache holds them.  Directories are listed by the calling thread, as
+    the caches of RepoFS are not safe for concurrent use; blobs are read
+    by jobs worker threads from the git cat-file pool.  Warming stops
+    once the caches reach the memory limit, or once more attributes have
+    been listed than the attribute cache holds, as the later ones would
+    push the earlier ones out.
+    """
+
+    def __init__(self, fs, jobs=1, blobs=False):
+        self.fs = fs
+        self.jobs = max(1, jobs)
+        self.blobs = blobs
+        # Attributes cached by the current warm
+        self._attributes = 0
+
+    def resolve(self, name):
+        """ Return the commits a ref, such as heads/master, a commit
+        hash or a range, such as tags/v1.0..heads/master, refers to. """
+        git = self.fs._git
+        if ".." in name:
+            commits = git.commits_in_range(name)
+            if not commits:
+                raise ValueError("no commits in range: %s" % name)
+            return commits
+        if git.is_commit(name):
+            return [name]
+        try:
+            commit = git.commit_of_ref(name)
+        except (KeyError, ValueError):
+            commit = ""
+        if not commit:
+            raise ValueError("no such ref or commit: %s" % name)
+        return [commit]
+
+    def _full(self):
+        memory = self.fs.memory
+        return ((memory.limit is not None and memory.total() >= memory.limit) or
+                self._attributes > self.fs.attributes_cache_size)
+
+    def _walk(self, commit):
+        """ List the directories of commit; return the directories and
+        entries listed and whether the memory limit stopped the walk. """
+        root = os.path.join("/commits-by-hash", self.fs._hash_updir(commit), commit)
+        dirs = entries = 0
+        pending = [root]
+        while pending:
+            batch = pending[:MEMORY_CHECK_INTERVAL]
+            del pending[:MEMORY_CHECK_INTERVAL]
+            for path in batch:
+                for entry, st in self.fs.entry_stats(path):
+                    entries += 1
+                    if st is not None and self.fs._git.cache:
+                        self._attributes += 1
+                    if (st is not None and S_ISDIR(st['st_mode']) and
+                            not (path == root and entry in utils.metadata_dirs)):
+                        pending.append(os.path.join(path, entry))
+            dirs += len(batch)
+            if self._full():
+                return dirs, entries, True
+        return dirs, entries, False
+
+    def _read_blobs(self, commit, executor):
+        """ Read the blobs of commit that fit in the blob cache; return
+        the blobs and bytes read and whether some were left out. """
+        git = self.fs._git
+        budget = git.blob_cache_size
+        oids = []
+        truncated = False
+        for oid, size in git.commit_blobs(commit):
+            if size > budget:
+                truncated = True
+                continue
+            budget -= size
+            oids.append(oid)
+        batches = [oids[i:i + BLOB_BATCH] for i in range(0, len(oids), BLOB_BATCH)]
+        nbytes = 0
+        for n in executor.map(git.prefetch_blobs, batches):
+            nbytes += n
+            if self._full():
+                truncated = True
+        return len(oids), nbytes, truncated
+
+    def warm(self, name):
+        """ Cache the trees of the commits name refers to and return
+        a report of what was cached. """
+        commits = self.resolve(name)
+        report = dict(name=name, commits=commits, dirs=0, entries=0,
+                      blobs=0, blob_bytes=0, complete=True)
+        self._attributes = 0
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for commit in commits:
+                dirs, entries, full = self._walk(commit)
+                report['dirs'] += dirs
+                report['entries'] += entries
+                if not full and self.blobs:
+                    blobs, nbytes, full = self._read_blobs(commit, executor)
+                    report['blobs'] += blobs
+                    report['blob_bytes'] += nbytes
+                if full:
+                    report['complete'] = False
+                    break
+        return report
+
+    @staticmethod
+    def format(report):
+        commits = report['commits']
+        text = "%s %s: %d directories, %d entries" % (
+            report['name'],
+            commits[0] if len(commits) == 1 else "%d commits" % len(commits),
+            report['dirs'], report['entries'])
+        if report['blobs']:
+            text += ", %d blobs of %d bytes" % (report['blobs'], report['blob_bytes'])
+        if not report['complete']:
+            text += ", stopped once the caches were full"
+        return text
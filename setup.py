@@ -20,12 +20,13 @@ def setup_package():
         long_description_content_type="text/markdown",
         url='https://github.com/AUEB-BALab/RepoFS',
         license='Apache Software License',
-        packages=find_packages(),
+        packages=find_packages(exclude=['benchmarks']),
         #data_files=[('man/man1', ['repofs.1'])],
         install_requires=['fusepy', 'pygit2'],
         entry_points = {
             'console_scripts': [
                 'repofs=repofs.__main__:main',
+                'repofs-replay=repofs.replay:main',
             ],
         },
         author = 'Vitalis Salis',